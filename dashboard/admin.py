@@ -1,10 +1,31 @@
 """Admin page access to DB."""
 from django.contrib import admin
 
-from .models import AntennaStatus, Antenna
+from .models import AntennaConfiguration, AntennaMeasurement, AntennaStatus, Antenna
 
 # Register your models here.
 
 
-admin.site.register(AntennaStatus)
+@admin.register(AntennaStatus)
+class AntennaStatusAdmin(admin.ModelAdmin):
+    """Read only access to the view combining measurements and configurations.
+
+    Edit the AntennaMeasurement and AntennaConfiguration rows instead.
+    """
+
+    def has_add_permission(self, request):
+        """Rows of the view cannot be added."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Rows of the view cannot be changed."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Rows of the view cannot be deleted."""
+        return False
+
+
 admin.site.register(Antenna)
+admin.site.register(AntennaMeasurement)
+admin.site.register(AntennaConfiguration)
@@ -0,0 +1,338 @@
+"""HTTP endpoints serving data to scripts and external tools."""
+
+import base64
+import hashlib
+import json
+from functools import lru_cache, wraps
+
+from django.contrib.auth import authenticate
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import export, metrics, rollups
+from .models import (
+    AntennaStatus,
+    AntToSnap,
+    AprioriStatus,
+    CorrMapping,
+    SnapStatus,
+    SnapToAnt,
+    XengChannels,
+)
+from .store import (
+    format_data_version,
+    get_data_version_times,
+    get_data_versions,
+    single_flight,
+)
+
+# scalar antenna status fields served by the latest status endpoint
+STATUS_FIELDS = [name for name, _ in export.STATUS_COLUMNS if name != "adc_hist_counts"]
+
+
+def _request_user(request):
+    """Return the user of a session or of HTTP basic credentials, or None."""
+    if request.user.is_authenticated:
+        return request.user
+    scheme, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if scheme.lower() != "basic":
+        return None
+    try:
+        username, _, password = (
+            base64.b64decode(credentials).decode("utf-8").partition(":")
+        )
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+def login_or_basic_auth(view):
+    """Allow logged in users and scripts sending HTTP basic credentials."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user = _request_user(request)
+        if user is None:
+            response = HttpResponse("Authentication required.", status=401)
+            response["WWW-Authenticate"] = 'Basic realm="heranow"'
+            return response
+        request.user = user
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@require_GET
+@login_or_basic_auth
+def export_history(request, table):
+    """Stream the history of a table as Arrow IPC record batches or Parquet.
+
+    Served over ASGI the response is an async iterator, so the export is
+    sent batch by batch there as well.
+
+    Query parameters are ``start`` and ``end`` (ISO times, the last day by
+    default), ``ants`` (comma separated antenna numbers, all by default),
+    ``format`` ("arrow" or "parquet") and for autospectra ``nchan``.
+    """
+    if table not in export.TABLES:
+        raise Http404(f"Unknown table {table}.")
+    fmt = request.GET.get("format", "arrow")
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest(f"Unknown format {fmt}.")
+    try:
+        start, end = export.parse_time_range(
+            request.GET.get("start"), request.GET.get("end")
+        )
+        options = {}
+        if request.GET.get("ants"):
+            options["antennas"] = [
+                int(ant) for ant in request.GET["ants"].split(",") if ant
+            ]
+        if table == "autospectra" and request.GET.get("nchan"):
+            options["nchan"] = int(request.GET["nchan"])
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+
+    schema, batches = export.TABLES[table](start, end, **options)
+    if isinstance(request, ASGIRequest):
+        content = export.astream_export(schema, batches, fmt)
+    else:
+        content = export.stream_export(schema, batches, fmt)
+    response = StreamingHttpResponse(content, content_type=export.FORMATS[fmt])
+    extension = "arrows" if fmt == "arrow" else "parquet"
+    response["Content-Disposition"] = (
+        f'attachment; filename="{table}_{start:%Y%m%dT%H%M%S}_'
+        f'{end:%Y%m%dT%H%M%S}.{extension}"'
+    )
+    return response
+
+
+def latest_json(name, sources):
+    """Serve the JSON built by a function from the latest ingested data.
+
+    The encoded JSON is cached per data version of the sources, in the
+    process and in the shared redis store, so it is rebuilt once after
+    every update of the sources however many clients poll. Responses
+    carry an ETag derived from the data version and the Last-Modified time
+    of the latest update, conditional requests are answered with 304.
+
+    Parameters
+    ----------
+    name : str
+        Key of the built data in the response, also names the shared cache.
+    sources : list of str
+        Ingest sources the data is built from.
+
+    """
+
+    def decorator(build):
+        @lru_cache(maxsize=4)
+        @single_flight(f"api_{name}", share=True)
+        def content(data_version):
+            return json.dumps(
+                {"data_version": data_version, name: build()}, cls=DjangoJSONEncoder
+            ).encode()
+
+        @require_GET
+        @wraps(build)
+        def view(request):
+            data_version = format_data_version(sources, get_data_versions())
+            etag = quote_etag(hashlib.sha1(data_version.encode()).hexdigest())
+            times = get_data_version_times()
+            updates = [times[source] for source in sources if source in times]
+            last_modified = int(max(updates)) if updates else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = HttpResponse(
+                    content(data_version), content_type="application/json"
+                )
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            # clients revalidate every time, which is cheap
+            response["Cache-Control"] = "no-cache"
+            return response
+
+        return view
+
+    return decorator
+
+
+@latest_json("antenna_status", ["antennas", "antenna_status"])
+def latest_antenna_status():
+    """Return the latest status of every antpol."""
+    rows = AntennaStatus.snapshot().values(
+        "antenna__ant_number",
+        "antenna__polarization",
+        "antenna__constructed",
+        "time",
+        *STATUS_FIELDS,
+    )
+    return [
+        {
+            "ant": row.pop("antenna__ant_number"),
+            "pol": row.pop("antenna__polarization"),
+            "constructed": row.pop("antenna__constructed"),
+            **row,
+        }
+        for row in rows
+    ]
+
+
+@latest_json("apriori", ["antennas", "apriori"])
+def latest_apriori():
+    """Return the latest apriori status of every antenna."""
+    rows = AprioriStatus.snapshot().values(
+        "antenna__ant_number", "antenna__polarization", "time", "apriori_status"
+    )
+    return [
+        {
+            "ant": row["antenna__ant_number"],
+            "pol": row["antenna__polarization"],
+            "time": row["time"],
+            "status": row["apriori_status"],
+            "label": AprioriStatus.AprioriStatusList(row["apriori_status"]).label,
+        }
+        for row in rows
+    ]
+
+
+@latest_json("snap_status", ["snap_status"])
+def latest_snap_status():
+    """Return the latest status of every SNAP."""
+    return list(
+        SnapStatus.snapshot().values(
+            *[field.attname for field in SnapStatus._meta.fields if field.name != "id"]
+        )
+    )
+
+
+@latest_json("mappings", ["antennas", "corr_map"])
+def latest_mappings():
+    """Return the current version of every correlator mapping."""
+    rows = {
+        CorrMapping.Kinds.XENG_CHANS.value: XengChannels.current()
+        .order_by("number")
+        .values("number", "chans"),
+        CorrMapping.Kinds.ANT_TO_SNAP.value: [
+            {
+                "ant": row.pop("antenna__ant_number"),
+                "pol": row.pop("antenna__polarization"),
+                **row,
+            }
+            for row in AntToSnap.current()
+            .order_by("antenna__ant_number", "antenna__polarization")
+            .values(
+                "antenna__ant_number", "antenna__polarization", "snap_hostname", "chan"
+            )
+        ],
+        CorrMapping.Kinds.SNAP_TO_ANT.value: SnapToAnt.current()
+        .order_by("snap_hostname")
+        .values("snap_hostname", "node", "snap", "ants", "inds"),
+    }
+    return {
+        mapping.kind: {
+            "valid_from": mapping.valid_from,
+            "update_time": mapping.update_time,
+            "content_hash": mapping.content_hash,
+            "rows": list(rows[mapping.kind]),
+        }
+        for mapping in CorrMapping.objects.filter(valid_to__isnull=True)
+    }
+
+
+# most targets a Grafana search returns
+GRAFANA_SEARCH_LIMIT = 1000
+
+
+def grafana_targets():
+    """Return every "source.series.metric" target of the Grafana datasource."""
+    return [
+        f"{source}.{series}.{metric}"
+        for source, spec in rollups.SOURCES.items()
+        for series in rollups.list_series(source)
+        for metric in spec.metrics
+    ]
+
+
+@csrf_exempt
+@login_or_basic_auth
+def grafana_test(request):
+    """Answer the connection test of a Grafana JSON datasource."""
+    return HttpResponse("OK")
+
+
+@csrf_exempt
+@require_POST
+@login_or_basic_auth
+def grafana_search(request):
+    """List the targets containing the searched text, case insensitive."""
+    try:
+        text = json.loads(request.body or "{}").get("target") or ""
+    except (ValueError, AttributeError):
+        return HttpResponseBadRequest("Invalid search.")
+    targets = [target for target in grafana_targets() if text.lower() in target.lower()]
+    return JsonResponse(targets[:GRAFANA_SEARCH_LIMIT], safe=False)
+
+
+@csrf_exempt
+@require_POST
+@login_or_basic_auth
+def grafana_query(request):
+    """Return the time series of the queried targets.
+
+    The rollup bucket of each series is chosen from the time range and the
+    ``maxDataPoints`` of the panel, so long ranges are read from the hourly
+    or daily rollups instead of the status rows.
+    """
+    try:
+        query = json.loads(request.body)
+        start, end = export.parse_time_range(
+            query["range"]["from"], query["range"]["to"]
+        )
+        max_points = int(query.get("maxDataPoints") or 1000)
+        response = []
+        for target in query.get("targets", []):
+            if target.get("hide") or not target.get("target"):
+                continue
+            source, _, rest = target["target"].partition(".")
+            series, _, metric = rest.rpartition(".")
+            if source not in rollups.SOURCES:
+                raise ValueError(f"Unknown target {target['target']}.")
+            values = rollups.series_values(
+                source, series, metric, start, end, max_points
+            )
+            response.append(
+                {
+                    "target": target["target"],
+                    "datapoints": [
+                        [value, int(time.timestamp() * 1000)] for time, value in values
+                    ],
+                }
+            )
+    except (ValueError, KeyError, TypeError) as err:
+        return HttpResponseBadRequest(f"Invalid query. {err}")
+    return JsonResponse(response, safe=False)
+
+
+@require_GET
+@login_or_basic_auth
+def task_metrics(request):
+    """Serve the metrics of the celery tasks in the Prometheus text format."""
+    return HttpResponse(
+        metrics.render_metrics(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,76 @@
+"""Dash applications of the dashboard."""
+
+from astropy.time import Time
+from django.templatetags.static import static
+
+# lines of the antenna status hover text which change with every data
+# version, filled in client side with the values of status_hover_values
+STATUS_HOVER_LINES = [
+    "Auto  [dB]: {}",
+    "PAM [dB]: {}",
+    "ADC [dB]: {}",
+    "ADC RMS: {}",
+    "FEM IMU THETA: {}",
+    "FEM IMU PHI: {}",
+    "EQ COEF: {}",
+    "Antenna Status {} hours old",
+]
+
+
+def add_scripts(dash_app, *scripts):
+    """Load static scripts of the dashboard with a Dash app.
+
+    The scripts are served with the app itself, so its clientside callbacks
+    work both on the pages embedding it directly and in iframes of
+    ``/django_plotly_dash/app/``.
+
+    Parameters
+    ----------
+    dash_app : DjangoDash
+        The app the scripts are loaded with.
+    scripts : str
+        Paths of the scripts under ``dashboard/static/dashboard/js``.
+
+    """
+    for script in scripts:
+        dash_app.scripts.append_script(
+            {"external_url": static(f"dashboard/js/{script}")}
+        )
+
+
+def status_hover_values(stat, spectra, adc_power, eq_coeffs):
+    """Format the values of the STATUS_HOVER_LINES of an antenna status.
+
+    Parameters
+    ----------
+    stat : AntennaStatus
+        The latest status of the antpol.
+    spectra : float or None
+        Mean power of the autospectrum in dB.
+    adc_power : float or None
+        ADC power in dB.
+    eq_coeffs : float or None
+        Median of the equalization coefficients.
+
+    Returns
+    -------
+    list of str
+        One value for each of the STATUS_HOVER_LINES.
+
+    """
+    NA = "Unknown"
+    values = [
+        f"{value or NA:{'.2f' if value else 's'}}"
+        for value in [
+            spectra,
+            stat.pam_power,
+            adc_power,
+            stat.adc_rms,
+            stat.fem_imu[0],
+            stat.fem_imu[1],
+        ]
+    ]
+    values.append(f"{eq_coeffs or NA}")
+    age = (Time.now() - Time(stat.time, format="datetime")).to_value("hour")
+    values.append(f"{age:.2f}")
+    return values
@@ -1,8 +1,6 @@
 """A dash application to plot adchistograms."""
-import re
 
 import copy
-import uuid
 import numpy as np
 import pandas as pd
 
@@ -14,44 +12,23 @@ import dash_daq as daq
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
-
-import plotly.graph_objs as go
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 
 from django_plotly_dash import DjangoDash
 
-from ..models import Antenna, AntennaStatus, AprioriStatus
-
+from . import add_scripts
+from ..models import ADC_HIST_BINS, AntennaStatus, AprioriStatus
+from ..store import format_data_version, get_precomputed, single_flight
 
-def plot_df(df, nodes=None, apriori=None):
-    """Plot input dataframe for adc histograms.
+# ingest sources which trigger a data refresh
+data_sources = ["antenna_status", "apriori"]
 
-    Parameters
-    ----------
-    df : Pandas DataFrame
-        data from hosting adc histogram data from get_data
-    nodes : List of int or int
-        Specific nodes to plot
-    apriori: List of str or str
-        Specific apriori statuses to plot.
+hovertemplate = "(%{x:.1},\t%{y})<br>%{fullData.text}<extra>%{fullData.name}<br>Node: %{meta[0]}<br>Status: %{meta[1]}</extra>"
 
-    Returns
-    -------
-    plotly Figure object
 
-    """
-    hovertemplate = "(%{x:.1},\t%{y})<br>%{fullData.text}<extra>%{fullData.name}<br>Node: %{meta[0]}<br>Status: %{meta[1]}</extra>"
-    if nodes is not None and isinstance(nodes, str):
-        nodes = [nodes]
-    elif nodes is None or len(nodes) == 0:
-        nodes = df.node.unique()
-
-    if apriori is not None and isinstance(apriori, str):
-        apriori = [apriori]
-    elif apriori is None or len(apriori) == 0:
-        apriori = df.apriori.unique()
-
-    layout = {
+def _layout():
+    return {
         "xaxis": {"title": "ADC value"},
         "yaxis": {"title": "Occurance", "type": "linear"},
         "title": {
@@ -68,95 +45,143 @@ def plot_df(df, nodes=None, apriori=None):
         "showlegend": True,
     }
 
-    fig = go.Figure()
-
-    if "bins" not in df and "adchist" not in df:
-        return fig
-
-    fig["layout"] = layout
-    fig["layout"]["uirevision"] = f"{nodes} {apriori}"
-    for ant in df.ant.unique():
-        _df_ant = df[df.ant == ant]
-
-        for pol in _df_ant.pol.unique():
-            antpol = f"{ant}{pol}"
-            _df1 = _df_ant[_df_ant.pol == pol]
-            if _df1.node.iloc[0] not in nodes or _df1.apriori.iloc[0] not in apriori:
-                continue
-            timestamp = Time(_df1.time.iloc[0], format="datetime")
-            trace = go.Scattergl(
-                x=_df1.bins,
-                y=_df1.adchist,
-                name=antpol,
-                mode="lines",
-                hovertemplate=hovertemplate,
-                text=f"observed at {timestamp.iso}<br>(JD {timestamp.jd:.3f})",
-                meta=[_df1.node.iloc[0], _df1.apriori.iloc[0]],
-            )
-            fig.add_trace(trace)
-    return fig
+
+def compact_df(data):
+    """Pack the adc histograms into a compact form for the browser.
+
+    Filtering by node and apriori status is done client side by the
+    ``heranow.filter_traces`` function, so every antpol is included.
+    The bins are shared by every antpol and only sent once.
+
+    Parameters
+    ----------
+    data : tuple
+        The DataFrame, bins and histogram matrix from get_data
+
+    Returns
+    -------
+    dict
+        layout and hovertemplate of the figure, the shared x axis
+        and a list of traces with their name, y values, text and meta.
+
+    """
+    df, bins, hists = data
+    compact = {
+        "layout": _layout(),
+        "hovertemplate": hovertemplate,
+        "x": bins.tolist(),
+        "traces": [],
+    }
+    text = _observed_text(df.time)
+    for row, counts, _text in zip(df.itertuples(), hists.tolist(), text):
+        compact["traces"].append(
+            {
+                "name": f"{row.ant}{row.pol}",
+                "y": counts,
+                "text": _text,
+                "meta": [row.node, row.apriori],
+            }
+        )
+    return compact
+
+
+def _observed_text(times):
+    """Build the hover text of the observation times of the histograms."""
+    if len(times) == 0:
+        return []
+    timestamps = Time(list(times), format="datetime")
+    return [
+        f"observed at {iso}<br>(JD {jd:.3f})"
+        for iso, jd in zip(timestamps.iso, timestamps.jd)
+    ]
 
 
 @lru_cache(maxsize=32)
-def get_data(session_id, interval):
-    """Query Database and prepare data as DataFrame.
+@single_flight("adchists")
+def get_data(data_version):
+    """Query Database and prepare the histograms as columns.
+
+    The latest status of every antpol is read in a single query and the
+    histogram counts are packed into one integer matrix on ADC_HIST_BINS.
 
     Parameters
     ----------
-    session_id : str
-        unique session id hex used for caching.
-    interval : int
-        update interval from counter used for updating data.
+    data_version : str
+        version of the ingested data used for caching.
 
     Returns
     -------
-    pandas DataFrame of most recent ADC Histograms for each antpol.
+    df : pandas DataFrame
+        ant, pol, node, apriori and time of each antpol, sorted by antpol.
+    bins : numpy array
+        ADC histogram bin centers shared by every antpol.
+    hists : numpy array
+        (n_antpol, n_bins) integer histogram counts, one row per row of df.
 
     """
-    df = []
+    apriori_names = dict(AprioriStatus.AprioriStatusList.choices)
+    apriori_stats = dict(
+        AprioriStatus.objects.order_by("antenna", "-time")
+        .distinct("antenna")
+        .values_list("antenna", "apriori_status")
+    )
 
-    for antenna in Antenna.objects.all().iterator():
-        try:
-            stat = AntennaStatus.objects.filter(antenna=antenna).latest("time")
-        except AntennaStatus.DoesNotExist:
-            stat = None
+    stats = (
+        AntennaStatus.objects.order_by("antenna", "-time")
+        .distinct("antenna")
+        .values_list(
+            "antenna",
+            "antenna__ant_number",
+            "antenna__polarization",
+            "node",
+            "time",
+            "adc_hist_counts",
+        )
+    )
 
-        if stat is not None:
+    rows = []
+    counts = []
+    for antenna, ant, pol, node, time, adc_hist_counts in stats.iterator():
+        if adc_hist_counts is None:
+            continue
+        if node is None:
             node = "Unknown"
-            match = re.search(r"heraNode(?P<node>\d+)Snap", stat.snap_hostname)
-            if match is not None:
-                node = int(match.group("node"))
-
-            apriori = "Unknown"
-            try:
-                apriori_stat = AprioriStatus.objects.filter(
-                    antenna=stat.antenna
-                ).latest("time")
-            except AprioriStatus.DoesNotExist:
-                apriori_stat = None
-            if apriori_stat is not None:
-                apriori = apriori_stat.get_apriori_status_display()
-            if stat.adc_hist is not None:
-                df.extend(
-                    {
-                        "bins": b,
-                        "adchist": h,
-                        "ant": stat.antenna.ant_number,
-                        "pol": f"{stat.antenna.polarization}",
-                        "node": node,
-                        "apriori": apriori,
-                        "time": stat.time,
-                    }
-                    for b, h in zip(*stat.adc_hist)
-                )
-
-    df = pd.DataFrame(df)
-    # Sort according to increasing bins and antpols
-    if not df.empty:
-        df.sort_values(["ant", "pol"], inplace=True)
-        df.reset_index(drop=True, inplace=True)
-
-    return df
+
+        apriori = apriori_stats.get(antenna)
+        apriori = str(apriori_names[apriori]) if apriori is not None else "Unknown"
+        rows.append(
+            {
+                "ant": ant,
+                "pol": f"{pol}",
+                "node": node,
+                "apriori": apriori,
+                "time": time,
+            }
+        )
+        counts.append(adc_hist_counts)
+
+    df = pd.DataFrame.from_records(
+        rows, columns=["ant", "pol", "node", "apriori", "time"]
+    )
+    hists = np.asarray(counts, dtype=np.int64).reshape(-1, ADC_HIST_BINS.size)
+
+    # Sort according to increasing antpols
+    order = df.sort_values(["ant", "pol"]).index.to_numpy()
+    df = df.iloc[order].reset_index(drop=True)
+    hists = hists[order]
+
+    return df, ADC_HIST_BINS, hists
+
+
+def _node_options(df):
+    """Build the options of the node dropdown."""
+    if "node" not in df:
+        return [{"label": "Unknown Node", "value": "Unknown"}]
+    node_labels = [
+        {"label": f"Node {node}", "value": node}
+        for node in sorted([node for node in df.node.unique() if node != "Unknown"])
+    ] + [{"label": "Unknown Node", "value": "Unknown"}]
+    return node_labels
 
 
 def serve_layout():
@@ -167,11 +192,17 @@ def serve_layout():
     Div of application used in web rendering.
 
     """
-    session_id = str(uuid.uuid4())
+    precomputed = get_precomputed(app_name) or {}
+    node_options = precomputed.get(
+        "node_options", [{"label": "Unknown Node", "value": "Unknown"}]
+    )
 
     return html.Div(
         [
-            html.Div(session_id, id="session-id", style={"display": "none"}),
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=format_data_version(data_sources)),
+            # data version of the precomputed view embedded below
+            dcc.Store(id="layout-version", data=precomputed.get("data_version")),
             dbc.Row(
                 [
                     dbc.Col(
@@ -189,7 +220,7 @@ def serve_layout():
                             "Node(s):",
                             dcc.Dropdown(
                                 id="node-dropdown",
-                                options=[{"label": "Unknown Node", "value": "Unknown"}],
+                                options=node_options,
                                 multi=True,
                                 style={"width": "100%"},
                             ),
@@ -224,9 +255,13 @@ def serve_layout():
                 config={"doubleClick": "reset"},
                 style={"height": "72.5vh"},
             ),
+            # every antpol in compact form, filtered client side
+            dcc.Store(id="adchist-store", data=precomputed.get("adchists")),
+            # A timer to check for new data every few seconds
+            # interval value is milliseconds
             dcc.Interval(
                 id="interval-component",
-                interval=60 * 1000,
+                interval=5 * 1000,
                 n_intervals=0,
                 disabled=True,
             ),
@@ -247,6 +282,7 @@ dash_app = DjangoDash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     add_bootstrap_links=True,
 )
+add_scripts(dash_app, "data_version.js", "dash_filters.js")
 
 dash_app.layout = serve_layout
 
@@ -260,33 +296,75 @@ def start_reload_counter(reload_box):
     return not reload_box
 
 
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
 @dash_app.callback(
     Output("node-dropdown", "options"),
-    [Input("session-id", "children"), Input("interval-component", "n_intervals")],
+    [Input("data-version", "data")],
+    [State("layout-version", "data")],
 )
-def update_node_selection(session_id, n_intervals):
+def update_node_selection(data_version, layout_version):
     """Update node selection button."""
-    df = get_data(session_id, n_intervals)
-    node_labels = [
-        {"label": f"Node {node}", "value": node}
-        for node in sorted([node for node in df.node.unique() if node != "Unknown"])
-    ] + [{"label": "Unknown Node", "value": "Unknown"}]
-    return node_labels
+    if data_version == layout_version:
+        raise PreventUpdate
+    df, bins, hists = get_data(data_version)
+    return _node_options(df)
+
+
+@lru_cache(maxsize=8)
+def get_compact_data(data_version):
+    """Cache the compact histograms shared by every session."""
+    return compact_df(get_data(data_version))
 
 
 @dash_app.callback(
+    Output("adchist-store", "data"),
+    [Input("data-version", "data")],
+    [State("layout-version", "data")],
+)
+def reload_histograms(data_version, layout_version):
+    """Reload the histograms when new data is available."""
+    if data_version == layout_version:
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    return get_compact_data(data_version)
+
+
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="filter_traces"),
     Output("dash_app", "figure"),
     [
-        Input("dash_app", "relayoutData"),
+        Input("adchist-store", "data"),
         Input("node-dropdown", "value"),
         Input("apriori-dropdown", "value"),
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
     ],
 )
-def draw_undecimated_data(
-    selection, node_value, apriori_value, session_id, n_intervals
-):
-    """Redraw data based on user input."""
-    df = get_data(session_id, n_intervals)
-    return plot_df(df, node_value, apriori_value)
+
+
+def precompute(data_version):
+    """Build the default view of the app embedded in the layout.
+
+    Parameters
+    ----------
+    data_version : str
+        version of the ingested data used for caching.
+
+    Returns
+    -------
+    dict
+        The data version, node dropdown options and the histograms as
+        returned by compact_df.
+
+    """
+    df, bins, hists = get_data(data_version)
+    return {
+        "data_version": data_version,
+        "node_options": _node_options(df),
+        "adchists": get_compact_data(data_version),
+    }
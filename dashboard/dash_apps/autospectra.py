@@ -1,7 +1,5 @@
 """A dash application to plot autospectra."""
-import re
 
-import uuid
 import copy
 import numpy as np
 import pandas as pd
@@ -17,27 +15,114 @@ import dash_daq as daq
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
-
-import plotly.graph_objs as go
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 
+from django.utils import dateparse
 from django_plotly_dash import DjangoDash
 
+from . import add_scripts
 from ..models import AutoSpectra, AntennaStatus, AprioriStatus
+from ..snapshots import (
+    as_of_label,
+    parse_as_of,
+    slider_as_of,
+    slider_range,
+    snapshot_time,
+    snapshot_version,
+    STEP,
+)
+from ..shared_snapshot import open_snapshot
+from ..store import format_data_version, get_precomputed, single_flight
 
 max_points = 4000
 
+# ingest sources which trigger a data refresh
+data_sources = ["autospectra", "antenna_status", "apriori"]
+
+
+def power_rms(spectra):
+    """Convert autocorrelations to power in dB and the 4-bit RMS.
+
+    Works on a single spectrum or a matrix of spectra. Also used by the
+    ingest to publish the converted shared snapshot.
+    """
+    # divide by 4 because of uhm something for now
+    spectra = np.asarray(spectra) / 4
+    # the 4 bit RMS is defined as rms = sqrt(re**2 + im**2 / ( 2 * N)) / 16
+    # the auto correlations out of redis already have N divided out
+    # ARP doesn't really care about the 16 because that deals with the
+    # fixed vs floating point in the FPGA-land but we're beyond that now
+    rms = np.sqrt(spectra / 2)  # / 16
+
+    # need to add this back as an option
+    # if stat.eq_coeffs is not None:
+    #     spectra /= np.median(stat.eq_coeffs) ** 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        power = (10 * np.log10(np.ma.masked_invalid(spectra))).filled(-100)
+    return power, rms
+
+
+def _database_rows(time):
+    """Yield the autospectra at time from the database.
+
+    Yields
+    ------
+    tuple
+        antenna id, antenna number, polarization and the (freqs [MHz],
+        power [dB], rms) of the full and downsampled spectra.
+
+    """
+    if time is None:
+        return
+    for stat in (
+        AutoSpectra.objects.filter(time=time).select_related("antenna").iterator()
+    ):
+        power, rms = power_rms(stat.spectra)
+        d_power, d_rms = power_rms(stat.spectra_downsampled)
+        yield (
+            stat.antenna_id,
+            stat.antenna.ant_number,
+            stat.antenna.polarization,
+            (np.asarray(stat.frequencies) / 1e6, power, rms),
+            (np.asarray(stat.frequencies_downsampled) / 1e6, d_power, d_rms),
+        )
+
+
+def _shared_rows(meta, arrays):
+    """Yield the autospectra of the shared snapshot, see _database_rows.
+
+    The ingest publishes the spectra already converted, so every row is a
+    view of the mapped matrices.
+    """
+    for ind, (antenna_id, ant, pol) in enumerate(meta["antennas"]):
+        yield (
+            antenna_id,
+            ant,
+            pol,
+            (arrays["freqs_mhz"], arrays["power"][ind], arrays["rms"][ind]),
+            (
+                arrays["freqs_downsampled_mhz"][ind],
+                arrays["power_downsampled"][ind],
+                arrays["rms_downsampled"][ind],
+            ),
+        )
+
 
 @lru_cache(maxsize=32)
-def get_data(session_id, interval):
+def get_data(data_version):
     """Query Database and prepare data as DataFrame.
 
+    The latest spectra are read from the shared snapshot mapped by every
+    worker, only the database fallback and past times go through
+    single_flight.
+
     Parameters
     ----------
-    session_id : str
-        unique session id hex used for caching.
-    interval : int
-        update interval from counter used for updating data.
+    data_version : str
+        version of the ingested data used for caching, or a snapshot
+        version to show the data as of a past time.
 
     Returns
     -------
@@ -49,89 +134,77 @@ def get_data(session_id, interval):
         The timestamp associated with Autocorrelations.
 
     """
-    df_full = []
-    df_down = []
-    ant_stats = AntennaStatus.objects.order_by("-time").distinct("antenna", "time")
-    apriori_stats = AprioriStatus.objects.order_by("-time").distinct("antenna", "time")
+    as_of = snapshot_time(data_version)
+    meta, arrays = open_snapshot("autospectra") if as_of is None else (None, {})
+    if meta is not None and "power" in arrays:
+        # the latest spectra published by the ingest, shared by every worker
+        return _build_data(
+            dateparse.parse_datetime(meta["time"]), _shared_rows(meta, arrays), as_of
+        )
+    return _get_database_data(data_version)
+
+
+@single_flight("autospectra", ttl=120)
+def _get_database_data(data_version):
+    """Prepare the data of get_data from the database."""
+    as_of = snapshot_time(data_version)
+    spectra = AutoSpectra.objects.all()
+    if as_of is not None:
+        spectra = spectra.filter(time__lte=as_of)
     try:
-        last_spectra = AutoSpectra.objects.latest("time")
+        last_time = spectra.latest("time").time
     except AutoSpectra.DoesNotExist:
-        last_spectra = None
-    if last_spectra is not None:
-        auto_time = Time(last_spectra.time, format="datetime")
-
-        for stat in AutoSpectra.objects.filter(time=last_spectra.time).iterator():
-            try:
-                ant_stat = ant_stats.filter(antenna=stat.antenna).latest("time")
-            except AntennaStatus.DoesNotExist:
-                ant_stat = None
+        last_time = None
+    return _build_data(last_time, _database_rows(last_time), as_of)
+
+
+def _build_data(last_time, rows, as_of):
+    """Combine the autospectra rows with the antenna statuses, see get_data."""
+    df_full = []
+    df_down = []
+    if last_time is not None:
+        auto_time = Time(last_time, format="datetime")
+        ant_stats = {
+            stat.antenna_id: stat
+            for stat in AntennaStatus.snapshot(as_of).only(
+                "antenna", "time", "node", "fem_switch"
+            )
+        }
+        apriori_stats = {
+            stat.antenna_id: stat for stat in AprioriStatus.snapshot(as_of)
+        }
+
+        for antenna_id, ant, pol, full, down in rows:
+            ant_stat = ant_stats.get(antenna_id)
             node = "Unknown"
             fem_switch = "Unknown"
             if ant_stat is not None:
-                match = re.search(r"heraNode(?P<node>\d+)Snap", ant_stat.snap_hostname)
-                if match is not None:
-                    node = int(match.group("node"))
+                if ant_stat.node is not None:
+                    node = ant_stat.node
 
                 fem_switch = ant_stat.get_fem_switch_display() or "Unknown"
 
             apriori = "Unknown"
-            try:
-                apriori_stat = apriori_stats.filter(antenna=stat.antenna).latest("time")
-            except AprioriStatus.DoesNotExist:
-                apriori_stat = None
-
+            apriori_stat = apriori_stats.get(antenna_id)
             if apriori_stat is not None:
                 apriori = apriori_stat.get_apriori_status_display()
 
-            # divide by 4 because of uhm something for now
-            _spectra = np.asarray(stat.spectra) / 4
-            # the 4 bit RMS is defined as rms = sqrt(re**2 + im**2 / ( 2 * N)) / 16
-            # the auto correlations out of redis already have N divided out
-            # ARP doesn't really care about the 16 because that deals with the
-            # fixed vs floating point in the FPGA-land but we're beyond that now
-            _rms = np.sqrt(_spectra / 2)  # / 16
-
-            # need to add this back as an option
-            # if stat.eq_coeffs is not None:
-            #     _spectra /= np.median(stat.eq_coeffs) ** 2
-
-            _freqs = np.asarray(stat.frequencies) / 1e6
-            _spectra = (10 * np.log10(np.ma.masked_invalid(_spectra))).filled(-100)
-
-            df_full.append(
-                {
-                    "freqs": _freqs,
-                    "spectra": _spectra,
-                    "ant": stat.antenna.ant_number,
-                    "pol": f"{stat.antenna.polarization}",
-                    "node": node,
-                    "apriori": apriori,
-                    "fem_switch": fem_switch,
-                    "rms": _rms,
-                }
-            )
-
-            _d_spectra = np.asarray(stat.spectra_downsampled) / 4
-            _d_rms = np.sqrt(_d_spectra / 2)  # / 16
-
-            # if stat.eq_coeffs is not None:
-            #     _d_spectra /= np.median(stat.eq_coeffs) ** 2
-
-            _d_freqs = np.asarray(stat.frequencies_downsampled) / 1e6
-            _d_spectra = (10 * np.log10(np.ma.masked_invalid(_d_spectra))).filled(-100)
-
-            df_down.append(
-                {
-                    "freqs": _d_freqs,
-                    "spectra": _d_spectra,
-                    "ant": stat.antenna.ant_number,
-                    "pol": f"{stat.antenna.polarization}",
-                    "node": node,
-                    "apriori": apriori,
-                    "fem_switch": fem_switch,
-                    "rms": _d_rms,
-                }
-            )
+            for records, (_freqs, _spectra, _rms) in [
+                (df_full, full),
+                (df_down, down),
+            ]:
+                records.append(
+                    {
+                        "freqs": _freqs,
+                        "spectra": _spectra,
+                        "ant": ant,
+                        "pol": f"{pol}",
+                        "node": node,
+                        "apriori": apriori,
+                        "fem_switch": fem_switch,
+                        "rms": _rms,
+                    }
+                )
 
     else:
         auto_time = Time(0, format="jd")
@@ -147,47 +220,23 @@ def get_data(session_id, interval):
     return df_full, df_down, auto_time
 
 
-def plot_df(df, nodes=None, apriori=None, rms=False):
-    """Plot input dataframe for autospectra.
-
-    Parameters
-    ----------
-    df : Pandas DataFrame
-        A dataframe of autospectra from get_data
-    nodes : List of int or int
-        Specific nodes to plot
-    apriori: List of str or str
-        Specific apriori statuses to plot.
-
-    Returns
-    -------
-    plotly Figure object
-
-    """
-    if nodes is not None and isinstance(nodes, str):
-        nodes = [nodes]
-    elif nodes is None or len(nodes) == 0:
-        nodes = df.node.unique()
-
-    if apriori is not None and isinstance(apriori, str):
-        apriori = [apriori]
-    elif apriori is None or len(apriori) == 0:
-        apriori = df.apriori.unique()
+def _hovertemplate(rms=False):
     if rms:
-        hovertemplate = (
+        return (
             "%{fullData.name}<br>"
             "%{x:.1f}\tMHz<br>%{y:.3e}\t<br>"
             "Node: %{meta[0]}<br>"
             "Status: %{meta[1]}<br>Fem Switch: %{meta[2]}<extra></extra>"
         )
-    else:
-        hovertemplate = (
-            "%{fullData.name}<br>"
-            "%{x:.1f}\tMHz<br>%{y:.3f}\t[dB]<br>"
-            "Node: %{meta[0]}<br>"
-            "Status: %{meta[1]}<br>Fem Switch: %{meta[2]}<extra></extra>"
-        )
+    return (
+        "%{fullData.name}<br>"
+        "%{x:.1f}\tMHz<br>%{y:.3f}\t[dB]<br>"
+        "Node: %{meta[0]}<br>"
+        "Status: %{meta[1]}<br>Fem Switch: %{meta[2]}<extra></extra>"
+    )
+
 
+def _layout(rms=False):
     layout = {
         "xaxis": {"title": "Frequency [MHz]"},
         "yaxis": {"title": "Power [dB]"},
@@ -205,36 +254,111 @@ def plot_df(df, nodes=None, apriori=None, rms=False):
     }
     if rms:
         layout["yaxis"]["title"] = "4-Bit RMS"
+    return layout
+
+
+def _round_significant(values, digits=4):
+    """Round an array to a number of significant digits of its largest value."""
+    values = np.asarray(values, dtype=np.float64)
+    scale = np.nanmax(np.abs(values)) if values.size else 0
+    if not np.isfinite(scale) or scale == 0:
+        return values
+    return np.round(values, digits - 1 - int(np.floor(np.log10(scale))))
+
+
+def _time_display(auto_time):
+    """Build the line describing the age of the autocorrelations."""
+    time_ago = (Time.now() - auto_time).to("s")
+
+    if time_ago.to_value("s") > 600:
+        time_color = "red"
+    else:
+        time_color = "black"
+
+    if time_ago.to_value("s") > 300:
+        time_ago = time_ago.to("min")
+    if time_ago.to_value("min") > 60:
+        time_ago = time_ago.to("hour")
+    if time_ago.to_value("hour") > 24:
+        time_ago = time_ago.to("day")
+
+    return [
+        html.Span("Autocorrelations from ", style={"font-weight": "bold"}),
+        html.Span(
+            f"{time_ago.value:.0f} {time_ago.unit.long_names[0]}s ago ",
+            style={
+                "font-weight": "bold",
+                "color": time_color,
+            },
+        ),
+        html.Span(
+            f"({auto_time.iso} JD:{auto_time.jd:.3f})",
+            style={"font-weight": "bold"},
+        ),
+    ]
+
 
-    fig = go.Figure()
+def _node_options(df):
+    """Build the options of the node dropdown."""
+    if "node" not in df:
+        return [{"label": "Unknown Node", "value": "Unknown"}]
+    node_labels = [
+        {"label": f"Node {node}", "value": node}
+        for node in sorted([node for node in df.node.unique() if node != "Unknown"])
+    ] + [{"label": "Unknown Node", "value": "Unknown"}]
+    return node_labels
+
+
+def compact_df(df, rms=False):
+    """Pack input dataframe for autospectra into a compact form for the browser.
+
+    Filtering by node and apriori status is done client side by the
+    ``heranow.filter_traces`` function, so every antpol is included.
+    The frequency axis is only sent once when all antpols share it and
+    values are rounded to keep the JSON payload small.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        A dataframe of autospectra from get_data
+    rms : bool
+        Pack the 4-bit RMS instead of the power spectra.
 
+    Returns
+    -------
+    dict
+        layout and hovertemplate of the figure, the shared x axis (or None)
+        and a list of traces with their name, y values, meta and optional x.
+
+    """
+    data = {
+        "layout": _layout(rms),
+        "hovertemplate": _hovertemplate(rms),
+        "x": None,
+        "traces": [],
+    }
     if "freqs" not in df and "spectra" not in df:
-        return fig
-
-    fig["layout"] = layout
-    fig["layout"]["uirevision"] = f"{nodes}-{apriori}"
-    for ant in df.ant.unique():
-        _df_ant = df[df.ant == ant]
-
-        for pol in _df_ant.pol.unique():
-            antpol = f"{ant}{pol}"
-            _df1 = _df_ant[_df_ant.pol == pol]
-            if _df1.node.iloc[0] not in nodes or _df1.apriori.iloc[0] not in apriori:
-                continue
-            if rms:
-                _y = _df1.rms.values[0]
-            else:
-                _y = _df1.spectra.values[0]
-            trace = go.Scattergl(
-                x=_df1.freqs.values[0],
-                y=_y,
-                name=antpol,
-                mode="lines",
-                meta=[_df1.node.iloc[0], _df1.apriori.iloc[0], _df1.fem_switch.iloc[0]],
-                hovertemplate=hovertemplate,
-            )
-            fig.add_trace(trace)
-    return fig
+        return data
+
+    freqs = [np.round(f, 4) for f in df.freqs.values]
+    shared_x = all(np.array_equal(freqs[0], f) for f in freqs[1:])
+    if shared_x:
+        data["x"] = freqs[0].tolist()
+
+    for ind, row in enumerate(df.itertuples()):
+        if rms:
+            _y = _round_significant(row.rms)
+        else:
+            _y = np.round(row.spectra, 3)
+        trace = {
+            "name": f"{row.ant}{row.pol}",
+            "y": _y.tolist(),
+            "meta": [row.node, row.apriori, row.fem_switch],
+        }
+        if not shared_x:
+            trace["x"] = freqs[ind].tolist()
+        data["traces"].append(trace)
+    return data
 
 
 def serve_layout():
@@ -245,37 +369,32 @@ def serve_layout():
     Div of application used in web rendering.
 
     """
-    timestamp = Time(0, format="jd")
-    init_time_ago = (Time.now() - timestamp).to("min")
-    init_time_color = "red"
-    session_id = str(uuid.uuid4())
+    precomputed = get_precomputed(app_name) or {}
+    if precomputed:
+        timestamp = Time(precomputed["auto_time"], format="jd")
+        node_options = precomputed["node_options"]
+    else:
+        timestamp = Time(0, format="jd")
+        node_options = [{"label": "Unknown Node", "value": "Unknown"}]
+    data_version = format_data_version(data_sources)
+    slider_start, slider_end, slider_marks = slider_range()
 
     return html.Div(
         [
-            html.Div(session_id, id="session-id", style={"display": "none"}),
+            dcc.Location(id="url", refresh=False),
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=data_version),
+            # the data version, or a snapshot version when viewing a past time
+            dcc.Store(id="view-version", data=data_version),
+            # data version of the precomputed view embedded below
+            dcc.Store(id="layout-version", data=precomputed.get("data_version")),
             dbc.Row(
                 [
                     dbc.Col(
                         html.Small(
                             html.Div(
                                 id="auto-time",
-                                children=[
-                                    html.Span(
-                                        "Autocorrelations from ",
-                                        style={"font-weight": "bold"},
-                                    ),
-                                    html.Span(
-                                        f"{init_time_ago.value:.0f} {init_time_ago.unit.long_names[0]}s ago ",
-                                        style={
-                                            "font-weight": "bold",
-                                            "color": init_time_color,
-                                        },
-                                    ),
-                                    html.Span(
-                                        f"({timestamp.iso} JD:{timestamp.jd:.3f})",
-                                        style={"font-weight": "bold"},
-                                    ),
-                                ],
+                                children=_time_display(timestamp),
                                 style={"text-align": "center"},
                             ),
                         ),
@@ -285,6 +404,31 @@ def serve_layout():
                 justify="center",
                 align="center",
             ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Small(
+                                    id="as-of-label", children=as_of_label(None)
+                                ),
+                                dcc.Slider(
+                                    id="as-of-slider",
+                                    min=slider_start,
+                                    max=slider_end,
+                                    step=int(STEP.total_seconds()),
+                                    value=slider_end,
+                                    marks=slider_marks,
+                                ),
+                            ],
+                            style={"text-align": "center"},
+                        ),
+                        width=10,
+                    ),
+                ],
+                justify="center",
+                align="center",
+            ),
             dbc.Row(
                 [
                     dbc.Col(
@@ -322,7 +466,7 @@ def serve_layout():
                             "Node(s):",
                             dcc.Dropdown(
                                 id="node-dropdown",
-                                options=[{"label": "Unknown Node", "value": "Unknown"}],
+                                options=node_options,
                                 multi=True,
                                 style={"width": "100%"},
                             ),
@@ -357,11 +501,13 @@ def serve_layout():
                 config={"doubleClick": "reset"},
                 style={"height": "72.5vh"},
             ),
-            # A timer to re-load data every minute
+            # every antpol in compact form, filtered client side
+            dcc.Store(id="spectra-store", data=precomputed.get("spectra")),
+            # A timer to check for new data every few seconds
             # interval value is milliseconds
             dcc.Interval(
                 id="interval-component",
-                interval=60 * 1000,
+                interval=5 * 1000,
                 n_intervals=0,
                 disabled=True,
             ),
@@ -388,6 +534,7 @@ dash_app = DjangoDash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     add_bootstrap_links=True,
 )
+add_scripts(dash_app, "data_version.js", "dash_filters.js")
 
 dash_app.layout = serve_layout
 
@@ -401,120 +548,144 @@ def start_reload_counter(reload_box):
     return not reload_box
 
 
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
+@dash_app.callback(
+    Output("as-of-slider", "value"),
+    [Input("url", "search")],
+    [State("as-of-slider", "min"), State("as-of-slider", "max")],
+)
+def select_url_time(search, slider_start, slider_end):
+    """Move the time slider to the as_of time requested in the page URL."""
+    as_of = parse_as_of(search)
+    if as_of is None:
+        raise PreventUpdate
+    return min(max(int(as_of.timestamp()), slider_start), slider_end)
+
+
+@dash_app.callback(
+    [Output("view-version", "data"), Output("as-of-label", "children")],
+    [Input("data-version", "data"), Input("as-of-slider", "value")],
+    [State("as-of-slider", "max"), State("view-version", "data")],
+)
+def update_view_version(data_version, slider_value, slider_end, current):
+    """Switch between the latest data and a snapshot of a past time."""
+    version = snapshot_version(data_version, slider_as_of(slider_value, slider_end))
+    if version == current:
+        raise PreventUpdate
+    return version, as_of_label(version)
+
+
 @dash_app.callback(
     Output("auto-time", "children"),
     [
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+        Input("view-version", "data"),
         Input("time-display-interval-component", "n_intervals"),
     ],
+    [State("layout-version", "data")],
 )
-def update_time_data(session_id, n_intervals, n_intervals_time_display):
+def update_time_data(data_version, n_intervals_time_display, layout_version):
     """Re-calculate and update data time on webpage."""
-    df_full, df_down, auto_time = get_data(session_id, n_intervals)
-
-    time_ago = (Time.now() - auto_time).to("s")
-
-    if time_ago.to_value("s") > 600:
-        time_color = "red"
-    else:
-        time_color = "black"
-
-    if time_ago.to_value("s") > 300:
-        time_ago = time_ago.to("min")
-    if time_ago.to_value("min") > 60:
-        time_ago = time_ago.to("hour")
-    if time_ago.to_value("hour") > 24:
-        time_ago = time_ago.to("day")
-
-    time_data = [
-        html.Span("Autocorrelations from ", style={"font-weight": "bold"}),
-        html.Span(
-            f"{time_ago.value:.0f} {time_ago.unit.long_names[0]}s ago ",
-            style={
-                "font-weight": "bold",
-                "color": time_color,
-            },
-        ),
-        html.Span(
-            f"({auto_time.iso} JD:{auto_time.jd:.3f})",
-            style={"font-weight": "bold"},
-        ),
-    ]
-    return time_data
+    if n_intervals_time_display == 0 and data_version == layout_version:
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    df_full, df_down, auto_time = get_data(data_version)
+    return _time_display(auto_time)
 
 
 @dash_app.callback(
     Output("node-dropdown", "options"),
-    [Input("session-id", "children"), Input("interval-component", "n_intervals")],
+    [Input("view-version", "data")],
+    [State("layout-version", "data")],
 )
-def update_node_selection(session_id, n_intervals):
+def update_node_selection(data_version, layout_version):
     """Update node selection button."""
-    df_full, df_down, auto_time = get_data(session_id, n_intervals)
-    node_labels = [
-        {"label": f"Node {node}", "value": node}
-        for node in sorted(
-            [node for node in df_full.node.unique() if node != "Unknown"]
-        )
-    ] + [{"label": "Unknown Node", "value": "Unknown"}]
-    return node_labels
+    if data_version == layout_version:
+        raise PreventUpdate
+    df_full, df_down, auto_time = get_data(data_version)
+    return _node_options(df_full)
 
 
-@dash_app.callback(
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="filter_traces"),
     Output("dash_app", "figure"),
     [
-        Input("dash_app", "relayoutData"),
+        Input("spectra-store", "data"),
         Input("node-dropdown", "value"),
         Input("apriori-dropdown", "value"),
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+    ],
+)
+
+
+@lru_cache(maxsize=8)
+def get_compact_data(data_version, full_resolution, rms):
+    """Cache the compact spectra shared by every session.
+
+    Parameters
+    ----------
+    data_version : str
+        version of the ingested data used for caching.
+    full_resolution : bool
+        Pack the full resolution spectra instead of the downsampled ones.
+    rms : bool
+        Pack the 4-bit RMS instead of the power spectra.
+
+    Returns
+    -------
+    dict
+        output of compact_df
+
+    """
+    df_full, df_down, auto_time = get_data(data_version)
+    return compact_df(df_full if full_resolution else df_down, rms)
+
+
+@dash_app.callback(
+    Output("spectra-store", "data"),
+    [
+        Input("dash_app", "relayoutData"),
+        Input("view-version", "data"),
         Input("resolution-box", "on"),
         Input("rms-box", "on"),
     ],
+    [State("layout-version", "data")],
 )
 def draw_undecimated_data(
     selection,
-    nodes,
-    apriori,
-    session_id,
-    n_intervals,
+    data_version,
     resolution,
     rms,
+    layout_version,
 ):
-    """Redraw data based on user input."""
-    df_full, df_down, auto_time = get_data(session_id, n_intervals)
+    """Reload spectra based on user zoom and resolution choices."""
+    if (
+        selection is None
+        and not resolution
+        and not rms
+        and data_version == layout_version
+    ):
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    df_full, df_down, auto_time = get_data(data_version)
     if resolution:
-        df_down = df_full
+        return get_compact_data(data_version, True, rms)
 
     df_ant = df_full[df_full.ant == df_full.ant.unique()[0]]
     df_ant = df_ant[df_ant.pol == df_ant.pol.unique()[0]]
 
-    if nodes is not None and isinstance(nodes, str):
-        nodes = [nodes]
-    elif nodes is None or len(nodes) == 0:
-        nodes = df_down.node.unique()
-
-    if apriori is not None and isinstance(apriori, str):
-        apriori = [apriori]
-    elif apriori is None or len(apriori) == 0:
-        apriori = df_down.apriori.unique()
-
-    # use context to tell if selection was made
-    ctx = dash.callback_context
-
-    if not ctx.triggered:
-        dropdown = False
-    else:
-        dropdown = "dropdown" in ctx.triggered[0]["prop_id"].split(".")[0]
-    if dropdown:
-        return plot_df(df_down, nodes, apriori, rms)
-    elif (
+    if (
         selection is not None
         and "xaxis.range[0]" in selection
         and "xaxis.range[1]" in selection
     ):
         try:
-            if (
+            full_resolution = (
                 np.sum(
                     np.logical_and(
                         df_ant.freqs.values[0] >= selection["xaxis.range[0]"],
@@ -522,12 +693,34 @@ def draw_undecimated_data(
                     )
                 )
                 < max_points
-            ):
-                return plot_df(df_full, nodes, apriori, rms)
-            else:
-                return plot_df(df_down, nodes, apriori, rms)
+            )
         except:  # noqa
             print(df_ant.freqs, selection)
             raise
+        return get_compact_data(data_version, bool(full_resolution), rms)
     else:
-        return plot_df(df_down, nodes, apriori, rms)
+        return get_compact_data(data_version, False, rms)
+
+
+def precompute(data_version):
+    """Build the default view of the app embedded in the layout.
+
+    Parameters
+    ----------
+    data_version : str
+        version of the ingested data used for caching.
+
+    Returns
+    -------
+    dict
+        The data version, time of the autocorrelations (JD), node dropdown
+        options and the downsampled spectra as returned by compact_df.
+
+    """
+    df_full, df_down, auto_time = get_data(data_version)
+    return {
+        "data_version": data_version,
+        "auto_time": auto_time.jd,
+        "node_options": _node_options(df_down),
+        "spectra": get_compact_data(data_version, False, False),
+    }
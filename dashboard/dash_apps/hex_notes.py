@@ -1,6 +1,4 @@
 """Dash App to create Table of hookup notes."""
-import re
-import uuid
 import numpy as np
 import pandas as pd
 from functools import lru_cache
@@ -11,13 +9,18 @@ import dash_daq as daq
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 
 import plotly.graph_objs as go
 
 from django_plotly_dash import DjangoDash
 
+from dashboard.dash_apps import add_scripts
 from dashboard.models import HookupNotes, Antenna, AntennaStatus, AprioriStatus
+from dashboard.store import format_data_version, single_flight
+
+# ingest sources which trigger a data refresh
+data_sources = ["antennas", "hookup_notes", "antenna_status", "apriori"]
 
 
 def process_string(input_str, offset=37):
@@ -52,15 +55,14 @@ def process_string(input_str, offset=37):
 
 
 @lru_cache(maxsize=32)
-def get_data(session_id, interval):
+@single_flight("hex_notes")
+def get_data(data_version):
     """Query Database and prepare data as DataFrame.
 
     Parameters
     ----------
-    session_id : str
-        unique session id hex used for caching.
-    interval : int
-        update interval from counter used for updating data.
+    data_version : str
+        version of the ingested data used for caching.
 
     Returns
     -------
@@ -83,9 +85,8 @@ def get_data(session_id, interval):
         node = "Unknown"
         apriori = "Unknown"
         if stat is not None:
-            match = re.search(r"heraNode(?P<node>\d+)Snap", stat.snap_hostname)
-            if match is not None:
-                node = int(match.group("node"))
+            if stat.node is not None:
+                node = stat.node
 
             apriori_stat = (
                 AprioriStatus.objects.filter(antenna=stat.antenna)
@@ -135,10 +136,10 @@ def serve_layout():
     Div of application used in web rendering.
 
     """
-    session_id = str(uuid.uuid4())
     return html.Div(
         [
-            html.Div(session_id, id="session-id", style={"display": "none"}),
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=format_data_version(data_sources)),
             html.Div(
                 [
                     dbc.Row(
@@ -198,9 +199,11 @@ def serve_layout():
                         config={"doubleClick": "reset"},
                         style={"height": "72.5vh"},
                     ),
+                    # A timer to check for new data every few seconds
+                    # interval value is milliseconds
                     dcc.Interval(
                         id="interval-component",
-                        interval=60 * 1000,
+                        interval=5 * 1000,
                         n_intervals=0,
                         disabled=True,
                     ),
@@ -224,17 +227,35 @@ dash_app = DjangoDash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     add_bootstrap_links=True,
 )
+add_scripts(dash_app, "data_version.js")
 
 dash_app.layout = serve_layout
 
 
+@dash_app.callback(
+    Output("interval-component", "disabled"),
+    [Input("reload-box", "on")],
+)
+def start_reload_counter(reload_box):
+    """Track the reload status for data."""
+    return not reload_box
+
+
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
 @dash_app.callback(
     Output("node-dropdown", "options"),
-    [Input("session-id", "children"), Input("interval-component", "n_intervals")],
+    [Input("data-version", "data")],
 )
-def update_node_selection(session_id, n_intervals):
+def update_node_selection(data_version):
     """Update node selection button."""
-    df = get_data(session_id, n_intervals)
+    df = get_data(data_version)
     node_labels = [
         {"label": f"Node {node}", "value": node}
         for node in sorted([node for node in df.node.unique() if node != "Unknown"])
@@ -247,13 +268,12 @@ def update_node_selection(session_id, n_intervals):
     [
         Input("node-dropdown", "value"),
         Input("apriori-dropdown", "value"),
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+        Input("data-version", "data"),
     ],
 )
-def reload_notes(nodes, apriori, session_id, n_intervals):
-    """Reload HookupNotes after time interval has passed."""
-    df = get_data(session_id, n_intervals)
+def reload_notes(nodes, apriori, data_version):
+    """Reload HookupNotes when new data is available."""
+    df = get_data(data_version)
 
     if nodes is None or len(nodes) == 0:
         nodes = df.node.unique()
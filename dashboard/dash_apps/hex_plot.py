@@ -1,8 +1,8 @@
 """A dash application to plot statistics versus hex position."""
-import re
 
 import copy
-import uuid
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 
@@ -15,53 +15,32 @@ import dash_daq as daq
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
-
-import plotly.graph_objs as go
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 
 from django_plotly_dash import DjangoDash
 
-from ..models import Antenna, AntennaStatus, AprioriStatus, AutoSpectra
+from . import STATUS_HOVER_LINES, add_scripts, status_hover_values
+from ..models import Antenna, AntennaStatus, AprioriStatus, AutoSpectra, SpectraMetrics
+from ..snapshots import (
+    as_of_label,
+    parse_as_of,
+    slider_as_of,
+    slider_range,
+    snapshot_time,
+    snapshot_version,
+    STEP,
+)
+from ..store import format_data_version, get_precomputed, single_flight
 
+# ingest sources which trigger a data refresh
+data_sources = ["antennas", "autospectra", "antenna_status", "apriori"]
 
-def plot_df(
-    df,
-    mode="spectra",
-    cbar_title="dB",
-    vmax=None,
-    vmin=None,
-    colorscale="viridis",
-    nodes=None,
-):
-    """Plot input dataframe for Hex position statistics.
 
-    Parameters
-    ----------
-    df : Pandas DataFrame
-        data from hosting adc histogram data from get_data
-    mode : string
-        The column of the dataFrame to plot
-    cbar_title : string
-        Title used for colorbar
-    vmax : float
-        colorscale maximum
-    vmin : float
-        colorscale minimum
-    colorscale : string or list
-        String name of a built in plotly colorscale or list of [%, R, G, B] values for defining a coloscale
-    nodes : List of int or int
-        Specific nodes to plot
-
-    Returns
-    -------
-    plotly Figure object
-
-    """
-    if nodes is None or len(nodes) == 0:
-        nodes = df.node.unique()
+hovertemplate = "%{text}<extra></extra>"
 
-    hovertemplate = "%{text}<extra></extra>"
 
+def _layout(df, mode="spectra", vmax=None, vmin=None, colorscale="viridis"):
     layout = {
         "xaxis": {
             "title": "East-West Position [m]",
@@ -88,19 +67,23 @@ def plot_df(
         "pam_power": "dB",
         "adc_power": "dB",
         "adc_rms": "RMS Linear",
+        "adc_clip_fraction": "fraction",
+        "adc_effective_bits": "bits",
+        "adc_kurtosis": "excess kurtosis",
+        "adc_asymmetry": "skewness",
         "fem_imu_theta": "degrees",
         "fem_imu_phi": "degrees",
         "eq_coeffs": "median coefficient",
     }
-
-    fig = go.Figure()
+    if mode.startswith("band_power"):
+        cbar_titles[mode] = "dB"
 
     # df1 = df.fillna(-1)
     # drop rows with None
     if vmin is None:
-        vmin = getattr(df, mode).min()
+        vmin = df[mode].min()
     if vmax is None:
-        vmax = getattr(df, mode).max()
+        vmax = df[mode].max()
 
     if mode == "adc_rms":
         colorscale = [
@@ -136,71 +119,89 @@ def plot_df(
             },
         }
     )
+    return layout
 
-    fig["layout"] = layout
-    trace = go.Scattergl(
-        x=df[~df.constructed].antpos_x,
-        y=df[~df.constructed].antpos_y,
-        mode="markers",
-        marker={
-            "color": df[~df.constructed].color,
-            "size": 14,
-            "symbol": "hexagon",
-            "coloraxis": "coloraxis2",
-            "opacity": df[~df.constructed].opacity,
-        },
-        text=df[~df.constructed].text,
-        hovertemplate=hovertemplate,
-    )
-    fig.add_trace(trace)
-
-    df1 = df[df.node.isin(nodes)]
-    trace = go.Scattergl(
-        x=df1[df1.constructed].antpos_x,
-        y=df1[df1.constructed].antpos_y,
-        mode="markers",
-        marker={
-            "color": getattr(df1[df1.constructed], mode).fillna("orange"),
-            "size": 14,
-            "coloraxis": "coloraxis",
-            "symbol": "hexagon",
-            "opacity": df1[df1.constructed].opacity,
-        },
-        text=df1[df1.constructed].text,
-        hovertemplate=hovertemplate,
-    )
-    fig.add_trace(trace)
-
-    df2 = df[~df.node.isin(nodes)]
-    trace = go.Scattergl(
-        x=df2[df2.constructed].antpos_x,
-        y=df2[df2.constructed].antpos_y,
-        mode="markers",
-        marker={
-            "color": "grey",
-            "size": 14,
-            "coloraxis": "coloraxis",
-            "symbol": "hexagon",
-            "opacity": 0.5,
-        },
-        text=df2[df2.constructed].text,
-        hovertemplate=hovertemplate,
-    )
-    fig.add_trace(trace)
 
-    return fig
+def compact_geometry(df):
+    """Pack the static per-antpol data of the hex plot for the browser.
+
+    Positions, nodes, construction state and the static part of the hover
+    text only change with the antennas and their hookup, so they are sent
+    once and merged client side with the values from compact_df by the
+    ``heranow.hex_figure`` function.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        data from get_data
+
+    Returns
+    -------
+    dict
+        Columns of every antpol: x and y positions, node, constructed,
+        opacity and text; the hover lines filled in with the values from
+        compact_df and a key identifying all of it.
+
+    """
+    geometry = {
+        "x": df.antpos_x.tolist(),
+        "y": df.antpos_y.tolist(),
+        "node": df.node.tolist(),
+        "constructed": df.constructed.astype(bool).tolist(),
+        "opacity": df.opacity.tolist(),
+        "text": df.text.tolist(),
+        "lines": STATUS_HOVER_LINES,
+    }
+    geometry["key"] = hashlib.sha1(json.dumps(geometry).encode()).hexdigest()
+    return geometry
+
+
+def compact_df(df, mode="spectra"):
+    """Pack the values of a Hex position statistic for the browser.
+
+    The node selection is applied client side by the ``heranow.hex_figure``
+    function, so every antpol is included. Only the values which change
+    with the data version or statistic are included, see compact_geometry.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        data from hosting adc histogram data from get_data
+    mode : string
+        The column of the dataFrame to plot
+
+    Returns
+    -------
+    dict
+        layout and hovertemplate of the figure, the key of the static data
+        from compact_geometry and a dictionary of per-antpol columns: the
+        color and the values of the hover lines (None without a status).
+
+    """
+    constructed = df.constructed.astype(bool)
+    # unconstructed antennas use a fixed colour, the rest the chosen statistic
+    color = df[mode].astype(object).where(constructed, df.color)
+    return {
+        "layout": _layout(df, mode),
+        "hovertemplate": hovertemplate,
+        "geometry": compact_geometry(df)["key"],
+        "antennas": {
+            "color": color.fillna("orange").tolist(),
+            "hover": df.hover.tolist(),
+        },
+    }
 
 
 @lru_cache(maxsize=32)
-def get_data(session_id, n_intervals):
+@single_flight("hex_plot")
+def get_data(data_version):
     """Query Database and prepare data as DataFrame.
 
     Parameters
     ----------
-    session_id : str
-        unique session id hex used for caching.
-    interval : int
-        update interval from counter used for updating data.
+    data_version : str
+        version of the ingested data used for caching, or a snapshot
+        version to show the data as of a past time.
 
     Returns
     -------
@@ -214,12 +215,25 @@ def get_data(session_id, n_intervals):
 
     # a shorter variable to help with the text section
     NA = "Unknown"
-    last_spectra = AutoSpectra.objects.last()
-    auto_time = Time(last_spectra.time, format="datetime")
+    as_of = snapshot_time(data_version)
+    spectra = AutoSpectra.objects.all()
+    if as_of is not None:
+        spectra = spectra.filter(time__lte=as_of)
+    last_spectra = spectra.order_by("time").last()
     if last_spectra is not None:
-        all_spectra = AutoSpectra.objects.filter(time=last_spectra.time)
+        auto_time = Time(last_spectra.time, format="datetime")
+        all_metrics = {
+            metrics.antenna_id: metrics
+            for metrics in SpectraMetrics.objects.filter(time=last_spectra.time)
+        }
     else:
-        all_spectra = None
+        auto_time = Time(0, format="jd")
+        all_metrics = {}
+    all_stats = {
+        stat.antenna_id: stat
+        for stat in AntennaStatus.snapshot(as_of).select_related("eq_coeff_set")
+    }
+    all_apriori = {stat.antenna_id: stat for stat in AprioriStatus.snapshot(as_of)}
 
     pol_list = sorted(Antenna.objects.order_by().values_list("polarization").distinct())
     pol_y_val = {val[0]: cnt for cnt, val in enumerate(pol_list)}
@@ -231,6 +245,7 @@ def get_data(session_id, n_intervals):
             "ant": antenna.ant_number,
             "pol": f"{antenna.polarization}",
             "text": f"{antenna.ant_number}{antenna.polarization}<br>Not Constructed",
+            "hover": None,
             "opacity": 0.2,
             "constructed": antenna.constructed,
             "color": "black",
@@ -238,7 +253,7 @@ def get_data(session_id, n_intervals):
             "fem_switch": "Unknown",
             "apriori": "Unknown",
         }
-        stat = AntennaStatus.objects.filter(antenna=antenna).order_by("time").last()
+        stat = all_stats.get(antenna.id)
         if stat is None:
             if antenna.constructed:
                 # They are actually constructed but with no status they are OFFLINE
@@ -250,41 +265,16 @@ def get_data(session_id, n_intervals):
                 )
 
         else:
-            node = "Unknown"
-            match = re.search(r"heraNode(?P<node>\d+)Snap", stat.snap_hostname)
-            if match is not None:
-                node = int(match.group("node"))
+            node = stat.node if stat.node is not None else "Unknown"
 
             apriori = "Unknown"
-            apriori_stat = (
-                AprioriStatus.objects.filter(antenna=stat.antenna)
-                .order_by("time")
-                .last()
-            )
+            apriori_stat = all_apriori.get(antenna.id)
             if apriori_stat is not None:
                 apriori = apriori_stat.get_apriori_status_display()
-            if all_spectra is not None:
-                try:
-                    auto = all_spectra.get(antenna=antenna)
-                except AutoSpectra.DoesNotExist:
-                    auto = None
-                if auto is not None:
-
-                    if auto.eq_coeffs is not None:
-                        spectra = (
-                            np.array(auto.spectra) / np.median(auto.eq_coeffs) ** 2
-                        )
-                    else:
-                        spectra = auto.spectra
-                    spectra = (
-                        (10 * np.log10(np.ma.masked_invalid(spectra)))
-                        .filled(-100)
-                        .mean()
-                    )
-                else:
-                    spectra = None
-            else:
-                spectra = None
+            metrics = all_metrics.get(antenna.id)
+            spectra = metrics.mean_db if metrics is not None else None
+            if metrics is not None:
+                data.update(_band_columns(metrics))
 
             adc_power = (
                 10 * np.log10(stat.adc_power) if stat.adc_power is not None else None
@@ -297,6 +287,10 @@ def get_data(session_id, n_intervals):
                     "pam_power": stat.pam_power,
                     "adc_power": adc_power,
                     "adc_rms": stat.adc_rms,
+                    "adc_clip_fraction": stat.adc_clip_fraction,
+                    "adc_effective_bits": stat.adc_effective_bits,
+                    "adc_kurtosis": stat.adc_kurtosis,
+                    "adc_asymmetry": stat.adc_asymmetry,
                     "fem_imu_theta": stat.fem_imu[0],
                     "fem_imu_phi": stat.fem_imu[1],
                     "eq_coeffs": np.median(stat.eq_coeffs)
@@ -314,18 +308,11 @@ def get_data(session_id, n_intervals):
                         f"Snap: {stat.snap_hostname or NA}<br>"
                         f"PAM: {stat.pam_id or NA}<br>"
                         f"Status: {apriori}<br>"
-                        f"Fem Switch: {stat.get_fem_switch_display() or NA}<br>"
-                        f"Auto  [dB]: {spectra or NA:{'.2f' if spectra else 's'}}<br>"
-                        f"PAM [dB]: {stat.pam_power or NA:{'.2f' if stat.pam_power else 's'}}<br>"
-                        f"ADC [dB]: {adc_power or NA:{'.2f' if adc_power else 's'}}<br>"
-                        f"ADC RMS: {stat.adc_rms or NA:{'.2f' if stat.adc_rms else 's'}}<br>"
-                        f"FEM IMU THETA: {stat.fem_imu[0] or NA:{'.2f' if stat.fem_imu[0] else 's'}}<br>"
-                        f"FEM IMU PHI: {stat.fem_imu[1] or NA:{'.2f' if stat.fem_imu[1] else 's'}}<br>"
-                        f"EQ COEF: {data['eq_coeffs'] or NA}<br>"
-                        "Antenna Status "
-                        f"{(Time.now() - Time(stat.time, format='datetime')).to_value('hour'):.2f}"
-                        " hours old"
-                    )
+                        f"Fem Switch: {stat.get_fem_switch_display() or NA}"
+                    ),
+                    "hover": status_hover_values(
+                        stat, spectra, adc_power, data["eq_coeffs"]
+                    ),
                 }
             )
         df.append(data)
@@ -339,6 +326,67 @@ def get_data(session_id, n_intervals):
     return df, auto_time
 
 
+def _band_columns(metrics):
+    """Map the band power of a SpectraMetrics row to one column per band."""
+    return {
+        f"band_power_{low:g}_{low + metrics.band_width:g}": power
+        for low, power in zip(metrics.band_edges, metrics.band_power)
+    }
+
+
+def _band_options(df):
+    """Build the options of the band dropdown from the band power columns."""
+    options = []
+    for column in df.columns:
+        if column.startswith("band_power_"):
+            low, high = column[len("band_power_") :].split("_")
+            options.append({"label": f"{low}-{high} MHz", "value": column})
+    return sorted(options, key=lambda option: float(option["label"].split("-")[0]))
+
+
+def _time_display(auto_time):
+    """Build the line describing the age of the autocorrelations."""
+    time_ago = (Time.now() - auto_time).to("s")
+
+    if time_ago.to_value("s") > 600:
+        time_color = "red"
+    else:
+        time_color = "black"
+
+    if time_ago.to_value("s") > 300:
+        time_ago = time_ago.to("min")
+    if time_ago.to_value("min") > 60:
+        time_ago = time_ago.to("hour")
+    if time_ago.to_value("hour") > 24:
+        time_ago = time_ago.to("day")
+
+    return [
+        html.Span("Autocorrelations from ", style={"font-weight": "bold"}),
+        html.Span(
+            f"{time_ago.value:.0f} {time_ago.unit.long_names[0]}s ago ",
+            style={
+                "font-weight": "bold",
+                "color": time_color,
+            },
+        ),
+        html.Span(
+            f"({auto_time.iso} JD:{auto_time.jd:.3f})",
+            style={"font-weight": "bold"},
+        ),
+    ]
+
+
+def _node_options(df):
+    """Build the options of the node dropdown."""
+    if "node" not in df:
+        return [{"label": "Unknown Node", "value": "Unknown"}]
+    node_labels = [
+        {"label": f"Node {node}", "value": node}
+        for node in sorted([node for node in df.node.unique() if node != "Unknown"])
+    ] + [{"label": "Unknown Node", "value": "Unknown"}]
+    return node_labels
+
+
 def serve_layout():
     """Render layout of webpage.
 
@@ -347,37 +395,34 @@ def serve_layout():
     Div of application used in web rendering.
 
     """
-    timestamp = Time(0, format="jd")
-    init_time_ago = (Time.now() - timestamp).to("min")
-    init_time_color = "red"
-    session_id = str(uuid.uuid4())
+    precomputed = get_precomputed(app_name) or {}
+    if precomputed:
+        timestamp = Time(precomputed["auto_time"], format="jd")
+        node_options = precomputed["node_options"]
+        band_options = precomputed.get("band_options", [])
+    else:
+        timestamp = Time(0, format="jd")
+        node_options = [{"label": "Unknown Node", "value": "Unknown"}]
+        band_options = []
+    data_version = format_data_version(data_sources)
+    slider_start, slider_end, slider_marks = slider_range()
 
     return html.Div(
         [
-            html.Div(session_id, id="session-id", style={"display": "none"}),
+            dcc.Location(id="url", refresh=False),
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=data_version),
+            # the data version, or a snapshot version when viewing a past time
+            dcc.Store(id="view-version", data=data_version),
+            # data version of the precomputed view embedded below
+            dcc.Store(id="layout-version", data=precomputed.get("data_version")),
             dbc.Row(
                 [
                     dbc.Col(
                         html.Small(
                             html.Div(
                                 id="auto-time",
-                                children=[
-                                    html.Span(
-                                        "Autocorrelations from ",
-                                        style={"font-weight": "bold"},
-                                    ),
-                                    html.Span(
-                                        f"{init_time_ago.value:.0f} {init_time_ago.unit.long_names[0]}s ago ",
-                                        style={
-                                            "font-weight": "bold",
-                                            "color": init_time_color,
-                                        },
-                                    ),
-                                    html.Span(
-                                        f"({timestamp.iso} JD:{timestamp.jd:.3f})",
-                                        style={"font-weight": "bold"},
-                                    ),
-                                ],
+                                children=_time_display(timestamp),
                                 style={"text-align": "center"},
                             ),
                         ),
@@ -387,6 +432,31 @@ def serve_layout():
                 justify="center",
                 align="center",
             ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Small(
+                                    id="as-of-label", children=as_of_label(None)
+                                ),
+                                dcc.Slider(
+                                    id="as-of-slider",
+                                    min=slider_start,
+                                    max=slider_end,
+                                    step=int(STEP.total_seconds()),
+                                    value=slider_end,
+                                    marks=slider_marks,
+                                ),
+                            ],
+                            style={"text-align": "center"},
+                        ),
+                        width=10,
+                    ),
+                ],
+                justify="center",
+                align="center",
+            ),
             dbc.Row(
                 [
                     dbc.Col(
@@ -409,12 +479,26 @@ def serve_layout():
                                     {"label": "PAM Power", "value": "pam_power"},
                                     {"label": "ADC Power", "value": "adc_power"},
                                     {"label": "ADC RMS", "value": "adc_rms"},
+                                    {
+                                        "label": "ADC Clipping",
+                                        "value": "adc_clip_fraction",
+                                    },
+                                    {
+                                        "label": "ADC Effective Bits",
+                                        "value": "adc_effective_bits",
+                                    },
+                                    {"label": "ADC Kurtosis", "value": "adc_kurtosis"},
+                                    {
+                                        "label": "ADC Asymmetry",
+                                        "value": "adc_asymmetry",
+                                    },
                                     {
                                         "label": "FEM IMU THETA",
                                         "value": "fem_imu_theta",
                                     },
                                     {"label": "FEM IMU PHI", "value": "fem_imu_phi"},
                                     {"label": "EQ COEFFS", "value": "eq_coeffs"},
+                                    {"label": "Band Power", "value": "band_power"},
                                 ],
                                 multi=False,
                                 value="spectra",
@@ -424,12 +508,28 @@ def serve_layout():
                         ],
                         style={"width": "30%"},
                     ),
+                    html.Label(
+                        [
+                            "Band:",
+                            dcc.Dropdown(
+                                id="band-dropdown",
+                                options=band_options,
+                                value=band_options[0]["value"]
+                                if band_options
+                                else None,
+                                multi=False,
+                                clearable=False,
+                                style={"width": "100%"},
+                            ),
+                        ],
+                        style={"width": "15%"},
+                    ),
                     html.Label(
                         [
                             "Node(s):",
                             dcc.Dropdown(
                                 id="node-dropdown",
-                                options=[{"label": "Unknown Node", "value": "Unknown"}],
+                                options=node_options,
                                 multi=True,
                                 style={"width": "100%"},
                             ),
@@ -445,11 +545,16 @@ def serve_layout():
                 config={"doubleClick": "reset+autosize"},
                 style={"height": "72.5vh"},
             ),
-            # A timer to re-load data every minute
+            # antenna positions are sent once, later updates only carry the
+            # marker colours and text which are merged client side
+            dcc.Store(id="hex-geometry", data=precomputed.get("geometry")),
+            # every antpol in compact form, node selection applied client side
+            dcc.Store(id="hex-store", data=precomputed.get("hex")),
+            # A timer to check for new data every few seconds
             # interval value is milliseconds
             dcc.Interval(
                 id="interval-component",
-                interval=60 * 1000,
+                interval=5 * 1000,
                 n_intervals=0,
                 disabled=True,
             ),
@@ -476,6 +581,7 @@ dash_app = DjangoDash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     add_bootstrap_links=True,
 )
+add_scripts(dash_app, "data_version.js", "dash_filters.js")
 
 dash_app.layout = serve_layout
 
@@ -489,73 +595,167 @@ def start_reload_counter(reload_box):
     return not reload_box
 
 
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
+@dash_app.callback(
+    Output("as-of-slider", "value"),
+    [Input("url", "search")],
+    [State("as-of-slider", "min"), State("as-of-slider", "max")],
+)
+def select_url_time(search, slider_start, slider_end):
+    """Move the time slider to the as_of time requested in the page URL."""
+    as_of = parse_as_of(search)
+    if as_of is None:
+        raise PreventUpdate
+    return min(max(int(as_of.timestamp()), slider_start), slider_end)
+
+
+@dash_app.callback(
+    [Output("view-version", "data"), Output("as-of-label", "children")],
+    [Input("data-version", "data"), Input("as-of-slider", "value")],
+    [State("as-of-slider", "max"), State("view-version", "data")],
+)
+def update_view_version(data_version, slider_value, slider_end, current):
+    """Switch between the latest data and a snapshot of a past time."""
+    version = snapshot_version(data_version, slider_as_of(slider_value, slider_end))
+    if version == current:
+        raise PreventUpdate
+    return version, as_of_label(version)
+
+
 @dash_app.callback(
     Output("auto-time", "children"),
     [
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+        Input("view-version", "data"),
         Input("time-display-interval-component", "n_intervals"),
     ],
+    [State("layout-version", "data")],
 )
-def update_time_data(session_id, n_intervals, n_intervals_time_display):
+def update_time_data(data_version, n_intervals_time_display, layout_version):
     """Re-calculate and update data time on webpage."""
-    df, auto_time = get_data(session_id, n_intervals)
+    if n_intervals_time_display == 0 and data_version == layout_version:
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    df, auto_time = get_data(data_version)
+    return _time_display(auto_time)
 
-    time_ago = (Time.now() - auto_time).to("s")
 
-    if time_ago.to_value("s") > 600:
-        time_color = "red"
-    else:
-        time_color = "black"
+@dash_app.callback(
+    Output("node-dropdown", "options"),
+    [Input("view-version", "data")],
+    [State("layout-version", "data")],
+)
+def update_node_selection(data_version, layout_version):
+    """Update node selection button."""
+    if data_version == layout_version:
+        raise PreventUpdate
+    df, auto_time = get_data(data_version)
+    return _node_options(df)
 
-    if time_ago.to_value("s") > 300:
-        time_ago = time_ago.to("min")
-    if time_ago.to_value("min") > 60:
-        time_ago = time_ago.to("hour")
-    if time_ago.to_value("hour") > 24:
-        time_ago = time_ago.to("day")
 
-    time_data = [
-        html.Span("Autocorrelations from ", style={"font-weight": "bold"}),
-        html.Span(
-            f"{time_ago.value:.0f} {time_ago.unit.long_names[0]}s ago ",
-            style={
-                "font-weight": "bold",
-                "color": time_color,
-            },
-        ),
-        html.Span(
-            f"({auto_time.iso} JD:{auto_time.jd:.3f})",
-            style={"font-weight": "bold"},
-        ),
-    ]
-    return time_data
+@dash_app.callback(
+    Output("band-dropdown", "options"),
+    [Input("view-version", "data")],
+    [State("layout-version", "data")],
+)
+def update_band_selection(data_version, layout_version):
+    """Update the frequency bands of the band power statistic."""
+    if data_version == layout_version:
+        raise PreventUpdate
+    df, auto_time = get_data(data_version)
+    return _band_options(df)
+
+
+@lru_cache(maxsize=32)
+def get_geometry(data_version):
+    """Cache the antenna positions shared by every session."""
+    df, auto_time = get_data(data_version)
+    return compact_geometry(df)
 
 
 @dash_app.callback(
-    Output("node-dropdown", "options"),
-    [Input("session-id", "children"), Input("interval-component", "n_intervals")],
+    Output("hex-geometry", "data"),
+    [Input("view-version", "data")],
+    [State("layout-version", "data"), State("hex-geometry", "data")],
 )
-def update_node_selection(session_id, n_intervals):
-    """Update node selection button."""
-    df, auto_time = get_data(session_id, n_intervals)
-    node_labels = [
-        {"label": f"Node {node}", "value": node}
-        for node in sorted([node for node in df.node.unique() if node != "Unknown"])
-    ] + [{"label": "Unknown Node", "value": "Unknown"}]
-    return node_labels
+def update_geometry(data_version, layout_version, current):
+    """Send the antenna positions only when they have changed."""
+    if data_version == layout_version:
+        raise PreventUpdate
+    geometry = get_geometry(data_version)
+    if current is not None and current["key"] == geometry["key"]:
+        raise PreventUpdate
+    return geometry
+
+
+@lru_cache(maxsize=32)
+def get_compact_data(data_version, stat_value):
+    """Cache the compact statistics shared by every session."""
+    df, auto_time = get_data(data_version)
+    return compact_df(df, mode=stat_value)
 
 
 @dash_app.callback(
-    Output("graph", "figure"),
+    Output("hex-store", "data"),
     [
         Input("stat-dropdown", "value"),
-        Input("node-dropdown", "value"),
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+        Input("band-dropdown", "value"),
+        Input("view-version", "data"),
     ],
+    [State("layout-version", "data")],
 )
-def redraw_statistic(stat_value, nodes, session_id, n_intervals):
+def redraw_statistic(stat_value, band, data_version, layout_version):
     """Redraw data based on user input."""
-    df, auto_time = get_data(session_id, n_intervals)
-    return plot_df(df, mode=stat_value, nodes=nodes)
+    if stat_value == "spectra" and data_version == layout_version:
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    if stat_value == "band_power":
+        df, auto_time = get_data(data_version)
+        if band not in df:
+            raise PreventUpdate
+        stat_value = band
+    return get_compact_data(data_version, stat_value)
+
+
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="hex_figure"),
+    Output("graph", "figure"),
+    [
+        Input("hex-store", "data"),
+        Input("hex-geometry", "data"),
+        Input("node-dropdown", "value"),
+    ],
+)
+
+
+def precompute(data_version):
+    """Build the default view of the app embedded in the layout.
+
+    Parameters
+    ----------
+    data_version : str
+        version of the ingested data used for caching.
+
+    Returns
+    -------
+    dict
+        The data version, time of the autocorrelations (JD), node and band
+        dropdown options, the antenna positions from compact_geometry and
+        the autospectra statistic as returned by compact_df.
+
+    """
+    df, auto_time = get_data(data_version)
+    return {
+        "data_version": data_version,
+        "auto_time": auto_time.jd,
+        "node_options": _node_options(df),
+        "band_options": _band_options(df),
+        "geometry": get_geometry(data_version),
+        "hex": get_compact_data(data_version, "spectra"),
+    }
@@ -1,5 +1,4 @@
 """Dash App to create Table of hookup notes."""
-import re
 import uuid
 import numpy as np
 import pandas as pd
@@ -74,9 +73,8 @@ def get_data(session_id):
         if stat is not None:
             if ant["ant_number"] == 11:
                 print(stat.snap_hostname)
-            match = re.search(r"heraNode(?P<node>\d+)Snap", stat.snap_hostname)
-            if match is not None:
-                node = int(match.group("node"))
+            if stat.node is not None:
+                node = stat.node
 
             apriori_stat = (
                 AprioriStatus.objects.filter(antenna=stat.antenna)
@@ -1,8 +1,8 @@
 """A dash application to plot statistics versus node position."""
-import re
 
 import copy
-import uuid
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 
@@ -11,44 +11,35 @@ from functools import lru_cache
 
 import dash
 import dash_daq as daq
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
-import plotly.graph_objs as go
 
 from django_plotly_dash import DjangoDash
 
-from ..models import Antenna, AntennaStatus, AprioriStatus, AutoSpectra
+from . import STATUS_HOVER_LINES, add_scripts, status_hover_values
+from ..models import Antenna, AntennaStatus, AprioriStatus, AutoSpectra, SpectraMetrics
+from ..snapshots import (
+    as_of_label,
+    parse_as_of,
+    slider_as_of,
+    slider_range,
+    snapshot_time,
+    snapshot_version,
+    STEP,
+)
+from ..store import format_data_version, get_precomputed, single_flight
 
+# ingest sources which trigger a data refresh
+data_sources = ["antennas", "autospectra", "antenna_status", "apriori"]
 
-def plot_df(
-    df, mode="spectra", cbar_title="dB", vmax=None, vmin=None, colorscale="viridis"
-):
-    """Plot input dataframe for statistics vs node.
 
-    Parameters
-    ----------
-    df : Pandas DataFrame
-        data from hosting adc histogram data from get_data
-    mode : string
-        The column of the dataFrame to plot
-    cbar_title : string
-        Title used for colorbar
-    vmax : float
-        colorscale maximum
-    vmin : float
-        colorscale minimum
-    colorscale : string or list
-        String name of a built in plotly colorscale or list of [%, R, G, B] values for defining a coloscale
+hovertemplate = "%{text}<extra></extra>"
 
-    Returns
-    -------
-    plotly Figure object
-
-    """
-    hovertemplate = "%{text}<extra></extra>"
 
+def _layout(df, mode="spectra", vmax=None, vmin=None, colorscale="viridis"):
     layout = {
         "xaxis": {
             "title": "Node Number",
@@ -70,13 +61,15 @@ def plot_df(
         "pam_power": "dB",
         "adc_power": "dB",
         "adc_rms": "RMS Linear",
+        "adc_clip_fraction": "fraction",
+        "adc_effective_bits": "bits",
+        "adc_kurtosis": "excess kurtosis",
+        "adc_asymmetry": "skewness",
         "fem_imu_theta": "degrees",
         "fem_imu_phi": "degrees",
         "eq_coeffs": "median coefficient",
     }
 
-    fig = go.Figure()
-
     # drop rows with None
     if vmin is None:
         vmin = getattr(df, mode).min()
@@ -112,40 +105,90 @@ def plot_df(
             }
         }
     )
+    return layout
+
+
+def compact_geometry(df):
+    """Pack the static data of the node plot markers for the browser.
+
+    The positions and the static part of the hover text only change with
+    the antennas and their hookup, so they are sent once and merged client
+    side with the values from compact_df by the ``heranow.node_figure``
+    function.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        data from get_data
+
+    Returns
+    -------
+    dict
+        x and y positions and text of the markers of each node trace, the
+        hover lines filled in with the values from compact_df and a key
+        identifying all of it.
+
+    """
+    traces = []
+    for node in df.node.unique():
+        df1 = df[df.node == node]
+        traces.append(
+            {
+                "x": df1.node.tolist(),
+                "y": list(range(len(df1))),
+                "text": df1.text.tolist(),
+            }
+        )
+    geometry = {"traces": traces, "lines": STATUS_HOVER_LINES}
+    geometry["key"] = hashlib.sha1(json.dumps(geometry).encode()).hexdigest()
+    return geometry
 
-    fig["layout"] = layout
 
+def compact_df(df, mode="spectra"):
+    """Pack the marker colours and hover values of the node plot for the browser.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        data from get_data
+    mode : string
+        The column of the dataFrame to plot
+
+    Returns
+    -------
+    dict
+        layout and hovertemplate of the figure, the key of the static data
+        from compact_geometry and the colours and values of the hover lines
+        of each node trace.
+
+    """
+    traces = []
     for node in df.node.unique():
         df1 = df[df.node == node]
-        df1.reset_index(inplace=True)
-
-        trace = go.Scattergl(
-            x=df1.node,
-            y=df1.index,
-            mode="markers",
-            marker={
-                "color": getattr(df1, mode).fillna("orange"),
-                "size": 14,
-                "symbol": "hexagon",
-                "coloraxis": "coloraxis",
-            },
-            text=df1.text,
-            hovertemplate=hovertemplate,
+        traces.append(
+            {
+                "color": getattr(df1, mode).astype(object).fillna("orange").tolist(),
+                "hover": df1.hover.tolist(),
+            }
         )
-        fig.add_trace(trace)
-    return fig
+    return {
+        "layout": _layout(df, mode),
+        "hovertemplate": hovertemplate,
+        "geometry": compact_geometry(df)["key"],
+        "traces": traces,
+    }
 
 
 @lru_cache(maxsize=32)
-def get_data(session_id, n_intervals):
+@single_flight("node_plot")
+def get_data(data_version):
     """Query Database and prepare data as DataFrame.
 
     Parameters
     ----------
-    session_id : str
-        unique session id hex used for caching.
-    interval : int
-        update interval from counter used for updating data.
+    data_version : str
+        version of the ingested data used for caching, or a snapshot
+        version to show the data as of a past time.
 
     Returns
     -------
@@ -159,11 +202,23 @@ def get_data(session_id, n_intervals):
 
     # a shorter variable to help with the text section
     NA = "Unknown"
-    last_spectra = AutoSpectra.objects.last()
+    as_of = snapshot_time(data_version)
+    spectra = AutoSpectra.objects.all()
+    if as_of is not None:
+        spectra = spectra.filter(time__lte=as_of)
+    last_spectra = spectra.order_by("time").last()
     if last_spectra is not None:
-        all_spectra = AutoSpectra.objects.filter(time=last_spectra.time)
+        all_metrics = {
+            metrics.antenna_id: metrics
+            for metrics in SpectraMetrics.objects.filter(time=last_spectra.time)
+        }
     else:
-        all_spectra = None
+        all_metrics = {}
+    all_stats = {
+        stat.antenna_id: stat
+        for stat in AntennaStatus.snapshot(as_of).select_related("eq_coeff_set")
+    }
+    all_apriori = {stat.antenna_id: stat for stat in AprioriStatus.snapshot(as_of)}
 
     pol_list = list(Antenna.objects.order_by().values_list("polarization").distinct())
     pol_y_val = {val[0]: cnt for cnt, val in enumerate(pol_list)}
@@ -175,47 +230,19 @@ def get_data(session_id, n_intervals):
             "ant": antenna.ant_number,
             "pol": f"{antenna.polarization}",
             "text": f"{antenna.ant_number}{antenna.polarization}<br>Not Constructed",
+            "hover": None,
         }
-        stat = AntennaStatus.objects.filter(antenna=antenna).order_by("time").last()
+        stat = all_stats.get(antenna.id)
         if stat is not None:
-            node = "Unknown"
-            snap = "Unknown"
-            match = re.search(
-                r"heraNode(?P<node>\d+)Snap(?P<snap>\d{1,2})", stat.snap_hostname
-            )
-            if match is not None:
-                node = int(match.group("node"))
-                snap = int(match.group("snap"))
+            node = stat.node if stat.node is not None else "Unknown"
+            snap = stat.snap if stat.snap is not None else "Unknown"
 
             apriori = "Unknown"
-            apriori_stat = (
-                AprioriStatus.objects.filter(antenna=stat.antenna)
-                .order_by("time")
-                .last()
-            )
+            apriori_stat = all_apriori.get(antenna.id)
             if apriori_stat is not None:
                 apriori = apriori_stat.get_apriori_status_display()
-            if all_spectra is not None:
-                try:
-                    auto = all_spectra.get(antenna=antenna)
-                except AutoSpectra.DoesNotExist:
-                    auto = None
-                if auto is not None:
-                    if auto.eq_coeffs is not None:
-                        spectra = (
-                            np.array(auto.spectra) / np.median(auto.eq_coeffs) ** 2
-                        )
-                    else:
-                        spectra = auto.spectra
-                    spectra = (
-                        (10 * np.log10(np.ma.masked_invalid(spectra)))
-                        .filled(-100)
-                        .mean()
-                    )
-                else:
-                    spectra = None
-            else:
-                spectra = None
+            metrics = all_metrics.get(antenna.id)
+            spectra = metrics.mean_db if metrics is not None else None
 
             adc_power = (
                 10 * np.log10(stat.adc_power) if stat.adc_power is not None else None
@@ -230,6 +257,10 @@ def get_data(session_id, n_intervals):
                     "pam_power": stat.pam_power,
                     "adc_power": adc_power,
                     "adc_rms": stat.adc_rms,
+                    "adc_clip_fraction": stat.adc_clip_fraction,
+                    "adc_effective_bits": stat.adc_effective_bits,
+                    "adc_kurtosis": stat.adc_kurtosis,
+                    "adc_asymmetry": stat.adc_asymmetry,
                     "fem_imu_theta": stat.fem_imu[0],
                     "fem_imu_phi": stat.fem_imu[1],
                     "eq_coeffs": np.median(stat.eq_coeffs)
@@ -246,18 +277,11 @@ def get_data(session_id, n_intervals):
                         f"Snap: {stat.snap_hostname or NA}<br>"
                         f"PAM: {stat.pam_id or NA}<br>"
                         f"Status: {apriori}<br>"
-                        f"Fem Switch: {stat.get_fem_switch_display() or NA}<br>"
-                        f"Auto  [dB]: {spectra or NA:{'.2f' if spectra else 's'}}<br>"
-                        f"PAM [dB]: {stat.pam_power or NA:{'.2f' if stat.pam_power else 's'}}<br>"
-                        f"ADC [dB]: {adc_power or NA:{'.2f' if adc_power else 's'}}<br>"
-                        f"ADC RMS: {stat.adc_rms or NA:{'.2f' if stat.adc_rms else 's'}}<br>"
-                        f"FEM IMU THETA: {stat.fem_imu[0] or NA:{'.2f' if stat.fem_imu[0] else 's'}}<br>"
-                        f"FEM IMU PHI: {stat.fem_imu[1] or NA:{'.2f' if stat.fem_imu[1] else 's'}}<br>"
-                        f"EQ COEF: {data['eq_coeffs'] or NA}<br>"
-                        "Antenna Status "
-                        f"{(Time.now() - Time(stat.time, format='datetime')).to_value('hour'):.2f}"
-                        " hours old"
-                    )
+                        f"Fem Switch: {stat.get_fem_switch_display() or NA}"
+                    ),
+                    "hover": status_hover_values(
+                        stat, spectra, adc_power, data["eq_coeffs"]
+                    ),
                 }
             )
 
@@ -280,10 +304,44 @@ def serve_layout():
     Div of application used in web rendering.
 
     """
-    session_id = str(uuid.uuid4())
+    precomputed = get_precomputed(app_name) or {}
+    data_version = format_data_version(data_sources)
+    slider_start, slider_end, slider_marks = slider_range()
+
     return html.Div(
         [
-            html.Div(session_id, id="session-id", style={"display": "none"}),
+            dcc.Location(id="url", refresh=False),
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=data_version),
+            # the data version, or a snapshot version when viewing a past time
+            dcc.Store(id="view-version", data=data_version),
+            # data version of the precomputed view embedded below
+            dcc.Store(id="layout-version", data=precomputed.get("data_version")),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Small(
+                                    id="as-of-label", children=as_of_label(None)
+                                ),
+                                dcc.Slider(
+                                    id="as-of-slider",
+                                    min=slider_start,
+                                    max=slider_end,
+                                    step=int(STEP.total_seconds()),
+                                    value=slider_end,
+                                    marks=slider_marks,
+                                ),
+                            ],
+                            style={"text-align": "center"},
+                        ),
+                        width=10,
+                    ),
+                ],
+                justify="center",
+                align="center",
+            ),
             dbc.Row(
                 [
                     dbc.Col(
@@ -306,6 +364,19 @@ def serve_layout():
                                     {"label": "PAM Power", "value": "pam_power"},
                                     {"label": "ADC Power", "value": "adc_power"},
                                     {"label": "ADC RMS", "value": "adc_rms"},
+                                    {
+                                        "label": "ADC Clipping",
+                                        "value": "adc_clip_fraction",
+                                    },
+                                    {
+                                        "label": "ADC Effective Bits",
+                                        "value": "adc_effective_bits",
+                                    },
+                                    {"label": "ADC Kurtosis", "value": "adc_kurtosis"},
+                                    {
+                                        "label": "ADC Asymmetry",
+                                        "value": "adc_asymmetry",
+                                    },
                                     {
                                         "label": "FEM IMU THETA",
                                         "value": "fem_imu_theta",
@@ -330,9 +401,15 @@ def serve_layout():
                 config={"doubleClick": "reset"},
                 style={"height": "72.5vh"},
             ),
+            # marker positions are sent once, later updates only carry the
+            # marker colours and text which are merged client side
+            dcc.Store(id="node-geometry", data=precomputed.get("geometry")),
+            dcc.Store(id="node-store", data=precomputed.get("node")),
+            # A timer to check for new data every few seconds
+            # interval value is milliseconds
             dcc.Interval(
                 id="interval-component",
-                interval=60 * 1000,
+                interval=5 * 1000,
                 n_intervals=0,
                 disabled=True,
             ),
@@ -353,6 +430,7 @@ dash_app = DjangoDash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     add_bootstrap_links=True,
 )
+add_scripts(dash_app, "data_version.js", "dash_filters.js")
 
 dash_app.layout = serve_layout
 
@@ -366,15 +444,107 @@ def start_reload_counter(reload_box):
     return not reload_box
 
 
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
 @dash_app.callback(
-    Output("dash_app", "figure"),
+    Output("as-of-slider", "value"),
+    [Input("url", "search")],
+    [State("as-of-slider", "min"), State("as-of-slider", "max")],
+)
+def select_url_time(search, slider_start, slider_end):
+    """Move the time slider to the as_of time requested in the page URL."""
+    as_of = parse_as_of(search)
+    if as_of is None:
+        raise PreventUpdate
+    return min(max(int(as_of.timestamp()), slider_start), slider_end)
+
+
+@dash_app.callback(
+    [Output("view-version", "data"), Output("as-of-label", "children")],
+    [Input("data-version", "data"), Input("as-of-slider", "value")],
+    [State("as-of-slider", "max"), State("view-version", "data")],
+)
+def update_view_version(data_version, slider_value, slider_end, current):
+    """Switch between the latest data and a snapshot of a past time."""
+    version = snapshot_version(data_version, slider_as_of(slider_value, slider_end))
+    if version == current:
+        raise PreventUpdate
+    return version, as_of_label(version)
+
+
+@lru_cache(maxsize=32)
+def get_geometry(data_version):
+    """Cache the marker positions shared by every session."""
+    return compact_geometry(get_data(data_version))
+
+
+@lru_cache(maxsize=32)
+def get_compact_data(data_version, stat_value):
+    """Cache the compact statistics shared by every session."""
+    return compact_df(get_data(data_version), mode=stat_value)
+
+
+@dash_app.callback(
+    Output("node-geometry", "data"),
+    [Input("view-version", "data")],
+    [State("layout-version", "data"), State("node-geometry", "data")],
+)
+def update_geometry(data_version, layout_version, current):
+    """Send the marker positions only when they have changed."""
+    if data_version == layout_version:
+        raise PreventUpdate
+    geometry = get_geometry(data_version)
+    if current is not None and current["key"] == geometry["key"]:
+        raise PreventUpdate
+    return geometry
+
+
+@dash_app.callback(
+    Output("node-store", "data"),
     [
         Input("stat-dropdown", "value"),
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+        Input("view-version", "data"),
     ],
+    [State("layout-version", "data")],
 )
-def redraw_statistic(stat_value, session_id, n_intervals):
+def redraw_statistic(stat_value, data_version, layout_version):
     """Redraw data based on user input."""
-    df = get_data(session_id, n_intervals)
-    return plot_df(df, mode=stat_value)
+    if stat_value == "spectra" and data_version == layout_version:
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    return get_compact_data(data_version, stat_value)
+
+
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="node_figure"),
+    Output("dash_app", "figure"),
+    [Input("node-store", "data"), Input("node-geometry", "data")],
+)
+
+
+def precompute(data_version):
+    """Build the default view of the app embedded in the layout.
+
+    Parameters
+    ----------
+    data_version : str
+        version of the ingested data used for caching.
+
+    Returns
+    -------
+    dict
+        The data version, the marker positions from compact_geometry and
+        the autospectra statistic as returned by compact_df.
+
+    """
+    return {
+        "data_version": data_version,
+        "geometry": get_geometry(data_version),
+        "node": get_compact_data(data_version, "spectra"),
+    }
@@ -1,7 +1,5 @@
 """A dash app to plot snapspectra."""
 
-import re
-import uuid
 import numpy as np
 import pandas as pd
 
@@ -12,13 +10,19 @@ import dash_daq as daq
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 
 import plotly.graph_objs as go
 
 from django_plotly_dash import DjangoDash
 
+from dashboard.dash_apps import add_scripts
 from dashboard.models import SnapSpectra, SnapStatus, AntennaStatus
+from dashboard.store import format_data_version, get_precomputed, single_flight
+
+# ingest sources which trigger a data refresh
+data_sources = ["snap_spectra", "snap_status", "antenna_status"]
 
 
 def plot_df(df, hostname):
@@ -75,15 +79,14 @@ def plot_df(df, hostname):
 
 
 @lru_cache(maxsize=32)
-def get_data(session_id, interval):
+@single_flight("snapspectra")
+def get_data(data_version):
     """Query Database and prepare data as DataFrame.
 
     Parameters
     ----------
-    session_id : str
-        unique session id hex used for caching.
-    interval : int
-        update interval from counter used for updating data.
+    data_version : str
+        version of the ingested data used for caching.
 
     Returns
     -------
@@ -104,14 +107,15 @@ def get_data(session_id, interval):
             "antenna__polarization",
         )
     )
-    for unique_spectra in SnapSpectra.objects.order_by("-time").distinct(
-        "hostname", "input_number", "time"
+    for unique_spectra in (
+        SnapSpectra.objects.order_by("-time")
+        .distinct("hostname", "input_number", "time")
+        .select_related("eq_coeff_set")
     ):
         hostname = unique_spectra.hostname
         loc_num = unique_spectra.input_number
-        match = re.search(r"heraNode(?P<node>\d+)Snap(?P<snap>\d+)", hostname)
-        node = int(match.group("node"))
-        snap = int(match.group("snap"))
+        node = unique_spectra.node
+        snap = unique_spectra.snap
 
         spectra = np.atleast_1d(
             np.ma.masked_invalid(
@@ -192,6 +196,11 @@ def get_data(session_id, interval):
     return df, dropdown_labels
 
 
+def _hostname_options(dropdown_labels):
+    """Build the options of the snap dropdown."""
+    return [{"label": host, "value": host} for host in dropdown_labels.keys()]
+
+
 def serve_layout():
     """Render layout of webpage.
 
@@ -200,10 +209,14 @@ def serve_layout():
     Div of application used in web rendering.
 
     """
-    session_id = str(uuid.uuid4())
+    precomputed = get_precomputed(app_name) or {}
+
     return html.Div(
         [
-            html.Div(session_id, id="session-id", style={"display": "none"}),
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=format_data_version(data_sources)),
+            # data version of the precomputed view embedded below
+            dcc.Store(id="layout-version", data=precomputed.get("data_version")),
             dbc.Row(
                 [
                     dbc.Col(
@@ -221,7 +234,7 @@ def serve_layout():
                             "Snap:",
                             dcc.Dropdown(
                                 id="hostname-dropdown",
-                                options=[],
+                                options=precomputed.get("hostname_options", []),
                                 multi=False,
                                 clearable=False,
                                 style={"width": "100%", "display": "inline-block"},
@@ -230,7 +243,7 @@ def serve_layout():
                         style={"width": "15%"},
                     ),
                     html.Div(
-                        # children=dropdown_labels[hostlist[0]],
+                        children=precomputed.get("snap_stats"),
                         id="snap-stats",
                         style={"padding-left": "1em"},
                     ),
@@ -239,14 +252,16 @@ def serve_layout():
                 align="center",
             ),
             dcc.Graph(
-                # figure=plot_df(df, hostname=hostlist[0]),
+                figure=precomputed.get("figure", {}),
                 id="dash_app",
                 config={"doubleClick": "reset"},
                 style={"height": "72.5vh"},
             ),
+            # A timer to check for new data every few seconds
+            # interval value is milliseconds
             dcc.Interval(
                 id="interval-component",
-                interval=60 * 1000,
+                interval=5 * 1000,
                 n_intervals=0,
                 disabled=True,
             ),
@@ -267,6 +282,7 @@ dash_app = DjangoDash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     add_bootstrap_links=True,
 )
+add_scripts(dash_app, "data_version.js")
 
 
 dash_app.layout = serve_layout
@@ -281,15 +297,25 @@ def start_reload_counter(reload_box):
     return not reload_box
 
 
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
 @dash_app.callback(
     Output("hostname-dropdown", "options"),
-    [Input("session-id", "children"), Input("interval-component", "n_intervals")],
+    [Input("data-version", "data")],
+    [State("layout-version", "data")],
 )
-def update_snap_selection(session_id, n_intervals):
+def update_snap_selection(data_version, layout_version):
     """Re-compute snap dropdown options."""
-    df, dropdown_labels = get_data(session_id, n_intervals)
-    options = [{"label": host, "value": host} for host in dropdown_labels.keys()]
-    return options
+    if data_version == layout_version:
+        raise PreventUpdate
+    df, dropdown_labels = get_data(data_version)
+    return _hostname_options(dropdown_labels)
 
 
 @dash_app.callback(
@@ -299,13 +325,41 @@ def update_snap_selection(session_id, n_intervals):
     ],
     [
         Input("hostname-dropdown", "value"),
-        Input("session-id", "children"),
-        Input("interval-component", "n_intervals"),
+        Input("data-version", "data"),
     ],
+    [State("layout-version", "data")],
 )
-def redraw_statistic(hostname, session_id, n_intervals):
+def redraw_statistic(hostname, data_version, layout_version):
     """Replot the spectra based on user input."""
-    df, dropdown_labels = get_data(session_id, n_intervals)
+    if hostname is None and data_version == layout_version:
+        # the precomputed view is already embedded in the layout
+        raise PreventUpdate
+    df, dropdown_labels = get_data(data_version)
     if hostname is None:
         hostname = list(dropdown_labels.keys())[0]
     return plot_df(df, hostname=hostname), dropdown_labels[hostname]
+
+
+def precompute(data_version):
+    """Build the default view of the app embedded in the layout.
+
+    Parameters
+    ----------
+    data_version : str
+        version of the ingested data used for caching.
+
+    Returns
+    -------
+    dict
+        The data version, snap dropdown options, the spectra figure of the
+        first snap as a dictionary and the status of that snap.
+
+    """
+    df, dropdown_labels = get_data(data_version)
+    hostname = list(dropdown_labels.keys())[0]
+    return {
+        "data_version": data_version,
+        "hostname_options": _hostname_options(dropdown_labels),
+        "figure": plot_df(df, hostname=hostname).to_plotly_json(),
+        "snap_stats": dropdown_labels[hostname],
+    }
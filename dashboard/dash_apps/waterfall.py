@@ -0,0 +1,231 @@
+"""A dash application to plot the recent autocorrelations versus time."""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import dash_daq as daq
+import dash_core_components as dcc
+import dash_bootstrap_components as dbc
+import dash_html_components as html
+from dash.dependencies import ClientsideFunction, Input, Output, State
+
+import plotly.graph_objs as go
+
+from django_plotly_dash import DjangoDash
+
+from . import add_scripts
+from ..store import format_data_version
+from ..waterfall import Waterfall, format_time
+
+# ingest sources which trigger a data refresh
+data_sources = ["autospectra"]
+
+# resolution the waterfall is decimated to on the server
+max_times = 400
+max_chans = 1000
+
+
+def _antpol_options():
+    """Build the options of the antpol dropdown from the buffer."""
+    buffer = Waterfall.open()
+    if buffer is None:
+        return []
+    return [{"label": antpol, "value": antpol} for antpol in buffer.antpols]
+
+
+def _zoom_range(selection, axis, parse=float):
+    """Read the zoomed range of an axis from relayoutData, None if unzoomed."""
+    if selection is None or f"{axis}.range[0]" not in selection:
+        return None, None
+    return (
+        parse(selection[f"{axis}.range[0]"]),
+        parse(selection[f"{axis}.range[1]"]),
+    )
+
+
+def _unix_time(value):
+    return pd.Timestamp(value, tz="UTC").timestamp()
+
+
+@lru_cache(maxsize=32)
+def get_figure(antpol, data_version, start, end, fmin, fmax):
+    """Build the waterfall of an antpol decimated to the plot resolution.
+
+    Parameters
+    ----------
+    antpol : str
+        Name of the antpol, e.g. "1e".
+    data_version : str
+        version of the ingested data used for caching.
+    start, end : float or None
+        Unix time range shown, everything if None.
+    fmin, fmax : float or None
+        Frequency range shown in MHz, everything if None.
+
+    Returns
+    -------
+    plotly Figure object
+
+    """
+    layout = {
+        "xaxis": {"title": "Frequency [MHz]"},
+        "yaxis": {"title": "Time [UTC]"},
+        "title": {"text": antpol or "", "x": 0.5, "font": {"size": 24}},
+        "margin": {"l": 40, "b": 30, "r": 40, "t": 46},
+        "autosize": True,
+        # keep the zoom while the decimated data is replaced
+        "uirevision": antpol,
+    }
+    fig = go.Figure(layout=layout)
+    buffer = Waterfall.open()
+    if antpol is None or buffer is None or antpol not in buffer.antpols:
+        return fig
+
+    times, freqs, spectra = buffer.slice(
+        antpol,
+        start=start,
+        end=end,
+        fmin=None if fmin is None else fmin * 1e6,
+        fmax=None if fmax is None else fmax * 1e6,
+        max_times=max_times,
+        max_chans=max_chans,
+    )
+    # on the same scale as the autospectra app
+    with np.errstate(divide="ignore", invalid="ignore"):
+        power = 10 * np.log10(spectra / 4)
+    power[~np.isfinite(power)] = np.nan
+    fig.add_trace(
+        go.Heatmap(
+            x=np.round(freqs / 1e6, 4),
+            y=[format_time(time) for time in times],
+            z=np.round(power, 3),
+            colorscale="viridis",
+            colorbar={"title": {"text": "dB", "side": "right"}},
+            hovertemplate="%{x:.2f} MHz<br>%{y}<br>%{z:.2f} dB<extra></extra>",
+        )
+    )
+    return fig
+
+
+def serve_layout():
+    """Render layout of webpage.
+
+    Returns
+    -------
+    Div of application used in web rendering.
+
+    """
+    antpol_options = _antpol_options()
+
+    return html.Div(
+        [
+            dcc.Store(id="data-sources", data=data_sources),
+            dcc.Store(id="data-version", data=format_data_version(data_sources)),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        daq.BooleanSwitch(
+                            id="reload-box",
+                            on=False,
+                            label="Reload Data",
+                            labelPosition="top",
+                            style={"text-align": "center"},
+                        ),
+                        width=1,
+                    ),
+                    html.Label(
+                        [
+                            "Antpol:",
+                            dcc.Dropdown(
+                                id="antpol-dropdown",
+                                options=antpol_options,
+                                value=antpol_options[0]["value"]
+                                if antpol_options
+                                else None,
+                                multi=False,
+                                clearable=False,
+                                style={"width": "100%"},
+                            ),
+                        ],
+                        style={"width": "30%"},
+                    ),
+                ],
+                justify="center",
+                align="center",
+            ),
+            dcc.Graph(
+                id="waterfall",
+                config={"doubleClick": "reset"},
+                style={"height": "72.5vh"},
+            ),
+            # A timer to check for new data every few seconds
+            # interval value is milliseconds
+            dcc.Interval(
+                id="interval-component",
+                interval=5 * 1000,
+                n_intervals=0,
+                disabled=True,
+            ),
+        ],
+        style={"height": "100%", "width": "100%"},
+    )
+
+
+app_name = "dash_waterfall"
+
+dash_app = DjangoDash(
+    name=app_name,
+    serve_locally=False,
+    app_name=app_name,
+    meta_tags=[
+        {"name": "viewport", "content": "width=device-width, initial-scale=1.0"}
+    ],
+    external_stylesheets=[dbc.themes.BOOTSTRAP],
+    add_bootstrap_links=True,
+)
+add_scripts(dash_app, "data_version.js")
+
+dash_app.layout = serve_layout
+
+
+@dash_app.callback(
+    Output("interval-component", "disabled"),
+    [Input("reload-box", "on")],
+)
+def start_reload_counter(reload_box):
+    """Track the reload status for data."""
+    return not reload_box
+
+
+dash_app.clientside_callback(
+    ClientsideFunction(namespace="heranow", function_name="data_version"),
+    Output("data-version", "data"),
+    [Input("interval-component", "n_intervals")],
+    [State("data-sources", "data"), State("data-version", "data")],
+)
+
+
+@dash_app.callback(
+    Output("antpol-dropdown", "options"),
+    [Input("data-version", "data")],
+)
+def update_antpol_selection(data_version):
+    """Update the antpols available in the buffer."""
+    return _antpol_options()
+
+
+@dash_app.callback(
+    Output("waterfall", "figure"),
+    [
+        Input("antpol-dropdown", "value"),
+        Input("data-version", "data"),
+        Input("waterfall", "relayoutData"),
+    ],
+)
+def draw_waterfall(antpol, data_version, selection):
+    """Redraw the waterfall at the resolution of the zoomed region."""
+    start, end = _zoom_range(selection, "yaxis", _unix_time)
+    fmin, fmax = _zoom_range(selection, "xaxis")
+    return get_figure(antpol, data_version, start, end, fmin, fmax)
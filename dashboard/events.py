@@ -0,0 +1,150 @@
+"""Server-sent event stream of ingest data versions.
+
+A single redis subscription per web worker is fanned out to every
+connected browser session. Dash apps use the versions to refetch data
+only when new data has been ingested.
+"""
+
+import asyncio
+import json
+import logging
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from django.conf import settings
+
+from dashboard.store import DATA_VERSION_KEY, DATA_SOURCES
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = "/events/data_version"
+# seconds between keep-alive comments sent to idle clients
+HEARTBEAT = 30
+
+
+class DataVersionBroadcaster:
+    """Fan out data version notifications from redis to many listeners."""
+
+    def __init__(self, redis_url, channel):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.listeners = set()
+        self._task = None
+
+    def subscribe(self):
+        """Register a new listener and return its message queue."""
+        queue = asyncio.Queue()
+        self.listeners.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        """Remove a listener."""
+        self.listeners.discard(queue)
+
+    async def current_versions(self):
+        """Read the current version of every source from redis."""
+        client = aioredis.Redis.from_url(self.redis_url)
+        try:
+            stored = await client.hgetall(DATA_VERSION_KEY)
+        finally:
+            await client.close()
+        versions = {source: 0 for source in DATA_SOURCES}
+        versions.update({key.decode(): int(val) for key, val in stored.items()})
+        return versions
+
+    async def _listen(self):
+        while self.listeners:
+            try:
+                await self._relay()
+            except Exception as err:  # noqa
+                logger.warning(f"Data version subscription failed. {err}")
+                await asyncio.sleep(HEARTBEAT)
+
+    async def _relay(self):
+        client = aioredis.Redis.from_url(self.redis_url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            while self.listeners:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=HEARTBEAT
+                )
+                if message is None:
+                    continue
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode()
+                for queue in list(self.listeners):
+                    queue.put_nowait(data)
+        finally:
+            await pubsub.close()
+            await client.close()
+
+
+broadcaster = DataVersionBroadcaster(
+    settings.DASHBOARD_REDIS_URL, settings.DATA_VERSION_CHANNEL
+)
+
+
+def _event(data):
+    return f"event: version\ndata: {data}\n\n".encode()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def data_version_events(scope, receive, send):
+    """ASGI application streaming data version updates as server-sent events."""
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                # tell nginx not to buffer the stream
+                (b"x-accel-buffering", b"no"),
+            ],
+        }
+    )
+
+    queue = broadcaster.subscribe()
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        try:
+            versions = await broadcaster.current_versions()
+        except RedisError:
+            versions = {}
+        await send(
+            {
+                "type": "http.response.body",
+                "body": _event(json.dumps(versions)),
+                "more_body": True,
+            }
+        )
+        while True:
+            message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                [message, disconnect],
+                timeout=HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                message.cancel()
+                break
+            if message in done:
+                body = _event(message.result())
+            else:
+                message.cancel()
+                body = b": keep-alive\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        broadcaster.unsubscribe(queue)
+        if not disconnect.done():
+            disconnect.cancel()
@@ -0,0 +1,350 @@
+"""Bulk export of the spectra and status history as Arrow or Parquet.
+
+Rows are read from a server-side cursor in chunks and every chunk becomes
+one Arrow record batch, so the memory used does not grow with the
+requested time range. Spectra are written as fixed-size float32 list
+columns, all spectra of one export have the same number of channels.
+"""
+
+import json
+from datetime import timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from asgiref.sync import sync_to_async
+from django.utils import dateparse, timezone
+
+from .models import AntennaStatus, AutoSpectra
+
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+TIME_TYPE = pa.timestamp("us", tz="UTC")
+
+# scalar columns of the antenna status export and their arrow types
+STATUS_COLUMNS = [
+    ("node", pa.int16()),
+    ("snap", pa.int16()),
+    ("snap_hostname", pa.string()),
+    ("snap_channel_number", pa.int16()),
+    ("adc_mean", pa.float64()),
+    ("adc_rms", pa.float64()),
+    ("adc_power", pa.float64()),
+    ("adc_clip_fraction", pa.float64()),
+    ("adc_effective_bits", pa.float64()),
+    ("adc_kurtosis", pa.float64()),
+    ("adc_asymmetry", pa.float64()),
+    ("pam_atten", pa.int32()),
+    ("pam_power", pa.float64()),
+    ("pam_voltage", pa.float64()),
+    ("pam_current", pa.float64()),
+    ("pam_id", pa.string()),
+    ("fem_voltage", pa.float64()),
+    ("fem_current", pa.float64()),
+    ("fem_id", pa.string()),
+    ("fem_lna_power", pa.bool_()),
+    ("fem_temp", pa.float64()),
+    ("fem_switch", pa.string()),
+    ("fft_overflow", pa.bool_()),
+    ("fem_imu", pa.list_(pa.float32(), 2)),
+    ("adc_hist_counts", pa.list_(pa.int32(), 255)),
+]
+
+
+def parse_time_range(start=None, end=None):
+    """Parse the ISO format bounds of an export.
+
+    Parameters
+    ----------
+    start, end : str, optional
+        Bounds of the time range, naive times are taken to be UTC. The range
+        defaults to the day before end, end defaults to now.
+
+    Returns
+    -------
+    start, end : datetime
+
+    Raises
+    ------
+    ValueError
+        If a bound is not a valid time or start is after end.
+
+    """
+    bounds = []
+    for value in [start, end]:
+        if value is None:
+            bounds.append(None)
+            continue
+        time = dateparse.parse_datetime(value)
+        if time is None:
+            raise ValueError(f"Invalid time {value!r}.")
+        if timezone.is_naive(time):
+            time = timezone.make_aware(time, timezone.utc)
+        bounds.append(time)
+    start, end = bounds
+    if end is None:
+        end = timezone.now()
+    if start is None:
+        start = end - timedelta(days=1)
+    if start > end:
+        raise ValueError("The start of the time range is after its end.")
+    return start, end
+
+
+def _filter(model, start, end, antennas):
+    rows = model.objects.filter(time__gte=start, time__lte=end)
+    if antennas is not None:
+        rows = rows.filter(antenna__ant_number__in=antennas)
+    return rows
+
+
+def _chunks(rows, chunk_size):
+    """Group the rows of a server-side cursor iterator into lists."""
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _key_arrays(chunk):
+    # the time, antenna number and polarization leading every row
+    times, ants, pols = zip(*[row[:3] for row in chunk])
+    return [
+        pa.array(times, type=TIME_TYPE),
+        pa.array(ants, type=pa.int16()),
+        pa.array(pols, type=pa.string()),
+    ]
+
+
+def _key_fields():
+    return [
+        pa.field("time", TIME_TYPE, nullable=False),
+        pa.field("ant", pa.int16(), nullable=False),
+        pa.field("pol", pa.string(), nullable=False),
+    ]
+
+
+def autospectra_batches(start, end, antennas=None, nchan=None, chunk_size=500):
+    """Read the autospectra history as Arrow record batches.
+
+    Parameters
+    ----------
+    start, end : datetime
+        Time range to export, inclusive.
+    antennas : list of int, optional
+        Antenna numbers to export, all antennas if None.
+    nchan : int, optional
+        Number of channels of the exported spectra. Defaults to the length
+        of the first spectrum in the range, spectra of other lengths are
+        not exported.
+    chunk_size : int
+        Rows read from the database cursor per record batch.
+
+    Returns
+    -------
+    schema : pyarrow Schema
+        Schema of the batches, the frequencies in Hz are stored in the
+        "frequencies" metadata entry as JSON.
+    batches : generator of pyarrow RecordBatch
+
+    """
+    rows = _filter(AutoSpectra, start, end, antennas).order_by("time", "antenna")
+    if nchan is None:
+        nchan = rows.values_list("spectra__len", flat=True).first() or 0
+    rows = rows.filter(spectra__len=nchan)
+    frequencies = (
+        rows.values_list("frequencies", flat=True).first() if nchan > 0 else None
+    )
+
+    schema = pa.schema(
+        _key_fields() + [pa.field("spectra", pa.list_(pa.float32(), nchan))],
+        metadata={"frequencies": json.dumps(frequencies or [])},
+    )
+
+    def batches():
+        values = rows.values_list(
+            "time", "antenna__ant_number", "antenna__polarization", "spectra"
+        )
+        for chunk in _chunks(values, chunk_size):
+            spectra = np.asarray([row[3] for row in chunk], dtype=np.float32)
+            yield pa.RecordBatch.from_arrays(
+                _key_arrays(chunk)
+                + [pa.FixedSizeListArray.from_arrays(pa.array(spectra.ravel()), nchan)],
+                schema=schema,
+            )
+
+    return schema, batches()
+
+
+def antenna_status_batches(start, end, antennas=None, chunk_size=5000):
+    """Read the antenna status history as Arrow record batches.
+
+    Parameters
+    ----------
+    start, end : datetime
+        Time range to export, inclusive.
+    antennas : list of int, optional
+        Antenna numbers to export, all antennas if None.
+    chunk_size : int
+        Rows read from the database cursor per record batch.
+
+    Returns
+    -------
+    schema : pyarrow Schema
+    batches : generator of pyarrow RecordBatch
+
+    """
+    rows = _filter(AntennaStatus, start, end, antennas).order_by("time", "antenna")
+    schema = pa.schema(
+        _key_fields() + [pa.field(name, dtype) for name, dtype in STATUS_COLUMNS]
+    )
+
+    def batches():
+        values = rows.values_list(
+            "time",
+            "antenna__ant_number",
+            "antenna__polarization",
+            *[name for name, _ in STATUS_COLUMNS],
+        )
+        for chunk in _chunks(values, chunk_size):
+            columns = list(zip(*chunk))[3:]
+            yield pa.RecordBatch.from_arrays(
+                _key_arrays(chunk)
+                + [
+                    pa.array(column, type=dtype)
+                    for column, (_, dtype) in zip(columns, STATUS_COLUMNS)
+                ],
+                schema=schema,
+            )
+
+    return schema, batches()
+
+
+TABLES = {
+    "autospectra": autospectra_batches,
+    "antenna_status": antenna_status_batches,
+}
+
+
+def iter_write(sink, schema, batches, fmt="arrow"):
+    """Write record batches as an Arrow IPC stream or a Parquet file.
+
+    Parameters
+    ----------
+    sink : file-like object
+        Writable binary file.
+    schema : pyarrow Schema
+        Schema of the batches.
+    batches : iterable of pyarrow RecordBatch
+        The batches to write, each becomes a Parquet row group.
+    fmt : str
+        "arrow" or "parquet".
+
+    Yields
+    ------
+    int
+        Number of rows of each batch once it has been written. The file is
+        complete when the generator is exhausted.
+
+    """
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            if fmt == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+            yield batch.num_rows
+    finally:
+        writer.close()
+
+
+class ChunkSink:
+    """A write-only file keeping the bytes written since they were last taken.
+
+    Lets iter_write feed a streaming HTTP response one batch at a time.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        """Keep data, return the number of bytes written."""
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        """Return the number of bytes written so far."""
+        return self._position
+
+    def flush(self):
+        """Nothing to flush, the bytes are kept until taken."""
+
+    def close(self):
+        """Mark the file closed."""
+        self.closed = True
+
+    def take(self):
+        """Return and forget the bytes written since the last call."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_export(schema, batches, fmt="arrow"):
+    """Yield the encoded export one record batch at a time.
+
+    Parameters
+    ----------
+    schema : pyarrow Schema
+        Schema of the batches.
+    batches : iterable of pyarrow RecordBatch
+        The batches to encode.
+    fmt : str
+        "arrow" or "parquet".
+
+    Yields
+    ------
+    bytes
+
+    """
+    sink = ChunkSink()
+    for _ in iter_write(pa.PythonFile(sink, mode="w"), schema, batches, fmt):
+        yield sink.take()
+    # the stream end marker or Parquet footer written on close
+    yield sink.take()
+
+
+async def astream_export(schema, batches, fmt="arrow"):
+    """Yield the encoded export one record batch at a time, asynchronously.
+
+    Under ASGI Django reads a synchronous streaming response into memory
+    before sending it, so the web views stream this instead. Every batch is
+    read and encoded by stream_export in the sync thread, see stream_export
+    for the parameters.
+    """
+    chunks = stream_export(schema, batches, fmt)
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,234 @@
+"""Capture query plans of the time-series lookups on synthetic data."""
+import os
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from dashboard.models import (
+    Antenna,
+    AntennaStatus,
+    AprioriStatus,
+    AutoSpectra,
+    SnapSpectra,
+    SnapStatus,
+)
+
+# three antennas, two polarizations each, per SNAP
+INPUTS_PER_SNAP = 6
+SNAPS_PER_NODE = 4
+# days of autospectra kept by delete_old_data
+AUTOSPECTRA_DAYS = 7
+
+POPULATE_SQL = [
+    """
+    INSERT INTO dashboard_autospectra
+        (antenna_id, time, spectra, frequencies,
+         frequencies_downsampled, spectra_downsampled)
+    SELECT a.id, t, array_fill(random(), ARRAY[%(nchan)s]),
+        array_fill(0.0::float8, ARRAY[%(nchan)s]), '{1}', '{1}'
+    FROM dashboard_antenna AS a,
+        generate_series(%(autos_start)s, %(end)s, %(interval)s) AS t
+    """,
+    """
+    INSERT INTO dashboard_antennaconfiguration
+        (antenna_id, valid_from, valid_to, snap_hostname, snap_channel_number)
+    SELECT a.id, %(start)s, %(end)s,
+        'heraNode' || (rank / %(inputs_per_node)s)
+            || 'Snap' || (rank %% %(inputs_per_node)s / %(inputs_per_snap)s),
+        rank %% %(inputs_per_snap)s
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY ant_number, polarization) - 1
+            AS rank
+        FROM dashboard_antenna
+    ) AS a
+    """,
+    """
+    INSERT INTO dashboard_antennameasurement
+        (antenna_id, time, configuration_id, adc_mean, adc_rms, adc_power)
+    SELECT c.antenna_id, t, c.id, random(), random(), random()
+    FROM dashboard_antennaconfiguration AS c,
+        generate_series(%(start)s, %(end)s, %(interval)s) AS t
+    """,
+    """
+    INSERT INTO dashboard_aprioristatus (antenna_id, time, apriori_status)
+    SELECT a.id, t, 'DhO'
+    FROM dashboard_antenna AS a,
+        generate_series(%(start)s, %(end)s, interval '1 day') AS t
+    """,
+    """
+    INSERT INTO dashboard_snapstatus (hostname, time, fpga_temp)
+    SELECT h.snap_hostname, t, random()
+    FROM (SELECT DISTINCT snap_hostname FROM dashboard_antennaconfiguration) AS h,
+        generate_series(%(start)s, %(end)s, %(interval)s) AS t
+    """,
+    """
+    INSERT INTO dashboard_snapspectra (hostname, input_number, time, spectra)
+    SELECT c.snap_hostname, c.snap_channel_number, t,
+        array_fill(random(), ARRAY[%(nchan)s])
+    FROM dashboard_antennaconfiguration AS c,
+        generate_series(%(start)s, %(end)s, %(interval)s) AS t
+    """,
+]
+
+
+def _summary(plan):
+    """Return the execution time in ms and the top node of a plan."""
+    match = re.search(r"Execution Time: ([\d.]+) ms", plan)
+    runtime = float(match.group(1)) if match else float("nan")
+    top_node = plan.splitlines()[0].split("  (")[0].strip()
+    return runtime, top_node
+
+
+def _time_queries(end):
+    """Return the lookups of the dashboards and tasks keyed by a short name."""
+    day_ago = end - timedelta(days=1)
+    return {
+        "autospectra_latest": AutoSpectra.objects.order_by("-time")[:1],
+        "autospectra_at_time": AutoSpectra.objects.filter(time=end),
+        "autospectra_latest_per_antenna": AutoSpectra.snapshot(),
+        "antenna_status_latest_per_antenna": AntennaStatus.snapshot(),
+        "antenna_status_last_day": AntennaStatus.objects.filter(time__gte=day_ago),
+        "antenna_status_snapshot_day_ago": AntennaStatus.snapshot(day_ago),
+        "apriori_latest_per_antenna": AprioriStatus.snapshot(),
+        "apriori_snapshot_day_ago": AprioriStatus.snapshot(day_ago),
+        "snap_spectra_latest_per_input": SnapSpectra.snapshot(),
+        "snap_spectra_last_day": SnapSpectra.objects.filter(time__gte=day_ago),
+        "snap_status_latest_per_host": SnapStatus.snapshot(),
+        "snap_status_last_day": SnapStatus.objects.filter(time__gte=day_ago),
+    }
+
+
+class Command(BaseCommand):
+    """Command to EXPLAIN ANALYZE the time-series queries."""
+
+    help = (
+        "Fill a throwaway test database with a synthetic month of data and "
+        "capture EXPLAIN ANALYZE plans of the time-series lookups."
+    )
+
+    def add_arguments(self, parser):
+        """Add additional arguments to command line parser."""
+        parser.add_argument(
+            "--days", type=int, default=30, help="Days of synthetic data."
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=1,
+            help="Minutes between synthetic measurements, the ingest cadence by "
+            "default.",
+        )
+        parser.add_argument(
+            "--ants", type=int, default=350, help="Number of synthetic antennas."
+        )
+        parser.add_argument(
+            "--nchan", type=int, default=16, help="Length of the synthetic spectra."
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            help="Directory to write one plan per query to, for diffing runs.",
+        )
+        parser.add_argument(
+            "--compare",
+            type=str,
+            help="Directory of plans written by --output to compare against.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Fraction an execution time may exceed the stored one before "
+            "it is flagged.",
+        )
+        parser.add_argument(
+            "--noinput",
+            action="store_false",
+            dest="interactive",
+            help="Do not prompt before removing an existing test database.",
+        )
+
+    def handle(self, *args, **options):
+        """Create the test database, fill it and explain every query."""
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=options["verbosity"], autoclobber=not options["interactive"]
+        )
+        try:
+            self._populate(options)
+            end = AutoSpectra.objects.latest("time").time
+            plans = {
+                name: queryset.explain(analyze=True, buffers=True)
+                for name, queryset in _time_queries(end).items()
+            }
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=options["verbosity"]
+            )
+
+        if options["output"] is not None:
+            os.makedirs(options["output"], exist_ok=True)
+        for name, plan in plans.items():
+            if options["output"] is not None:
+                with open(os.path.join(options["output"], f"{name}.txt"), "w") as f:
+                    f.write(plan + "\n")
+            else:
+                self.stdout.write(f"== {name}\n{plan}\n")
+
+        stored = {}
+        if options["compare"] is not None:
+            for name in plans:
+                try:
+                    with open(os.path.join(options["compare"], f"{name}.txt")) as f:
+                        stored[name] = _summary(f.read())
+                except FileNotFoundError:
+                    continue
+
+        self.stdout.write(
+            f"{'query':<36} {'execution ms':>12} {'stored ms':>10}  top node"
+        )
+        changed = []
+        for name, plan in plans.items():
+            runtime, top_node = _summary(plan)
+            line = f"{name:<36} {runtime:>12.3f}"
+            if name in stored:
+                stored_runtime, stored_node = stored[name]
+                line += f" {stored_runtime:>10.3f}  {top_node}"
+                if top_node != stored_node:
+                    line += f"  << top node was {stored_node}"
+                    changed.append(name)
+                elif runtime > stored_runtime * (1 + options["tolerance"]):
+                    line += "  << slower"
+                    changed.append(name)
+            else:
+                line += f" {'':>10}  {top_node}"
+            self.stdout.write(line)
+        if changed:
+            raise CommandError(f"{len(changed)} plans changed: {', '.join(changed)}")
+
+    def _populate(self, options):
+        """Insert the synthetic data ending now."""
+        Antenna.objects.bulk_create(
+            [
+                Antenna(ant_number=num, ant_name=f"HH{num}", polarization=pol)
+                for num in range(options["ants"])
+                for pol in ["e", "n"]
+            ]
+        )
+        end = timezone.now().replace(second=0, microsecond=0)
+        params = {
+            "start": end - timedelta(days=options["days"]),
+            "autos_start": end - timedelta(days=min(options["days"], AUTOSPECTRA_DAYS)),
+            "end": end,
+            "interval": timedelta(minutes=options["interval"]),
+            "nchan": options["nchan"],
+            "inputs_per_snap": INPUTS_PER_SNAP,
+            "inputs_per_node": INPUTS_PER_SNAP * SNAPS_PER_NODE,
+        }
+        with connection.cursor() as cursor:
+            for sql in POPULATE_SQL:
+                cursor.execute(sql, params)
+            cursor.execute("ANALYZE")
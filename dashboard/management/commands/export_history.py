@@ -0,0 +1,65 @@
+"""Export spectra or status history as Arrow IPC or Parquet."""
+import logging  # noqa
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import export
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Command to export the history of a table."""
+
+    help = (
+        "Write the autospectra or antenna status history of a time range to "
+        "an Arrow IPC stream or Parquet file, reading the database in chunks."
+    )
+
+    def add_arguments(self, parser):
+        """Add additional arguments to command line parser."""
+        parser.add_argument("table", choices=sorted(export.TABLES))
+        parser.add_argument("output", type=str, help="File to write.")
+        parser.add_argument(
+            "--start", type=str, help="ISO start time, a day before end by default."
+        )
+        parser.add_argument("--end", type=str, help="ISO end time, now by default.")
+        parser.add_argument(
+            "--ants", type=int, nargs="+", help="Antenna numbers, all by default."
+        )
+        parser.add_argument(
+            "--format", choices=sorted(export.FORMATS), default="parquet"
+        )
+        parser.add_argument(
+            "--nchan",
+            type=int,
+            help="Channels of the exported autospectra, "
+            "the length of the first spectrum by default.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, help="Rows read per record batch."
+        )
+
+    def handle(self, *args, **options):
+        """Stream the batches to the output file."""
+        try:
+            start, end = export.parse_time_range(options["start"], options["end"])
+        except ValueError as err:
+            raise CommandError(err)
+        kwargs = {"antennas": options["ants"]}
+        if options["table"] == "autospectra":
+            kwargs["nchan"] = options["nchan"]
+        if options["chunk_size"] is not None:
+            kwargs["chunk_size"] = options["chunk_size"]
+
+        schema, batches = export.TABLES[options["table"]](start, end, **kwargs)
+        n_rows = 0
+        with open(options["output"], "wb") as sink:
+            for batch_rows in export.iter_write(
+                sink, schema, batches, options["format"]
+            ):
+                n_rows += batch_rows
+        self.stdout.write(
+            f"Wrote {n_rows} {options['table']} rows from {start} to {end} "
+            f"to {options['output']}."
+        )
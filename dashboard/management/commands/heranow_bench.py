@@ -0,0 +1,318 @@
+"""Benchmark the ingest tasks and dashboard data builders on synthetic data."""
+import logging  # noqa
+import contextlib
+import inspect
+import io
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from plotly.utils import PlotlyJSONEncoder
+
+from dashboard import tasks
+from dashboard.dash_apps import (
+    adchists,
+    autospectra,
+    hex_notes,
+    hex_plot,
+    node_plot,
+    snapspectra,
+)
+from dashboard.models import Antenna, AprioriStatus
+from dashboard.store import format_data_version
+from dashboard.synthetic import (
+    MemoryRedis,
+    SyntheticArray,
+    SyntheticCorrCM,
+    SyntheticMCDB,
+)
+
+logger = logging.getLogger(__name__)
+
+# ingest tasks in the order they run each minute, the tasks reading the
+# M&C database, GitHub or files on disk are not benchmarked
+INGEST_TASKS = [
+    "update_xengs",
+    "update_ant_to_snap",
+    "update_snap_to_ant",
+    "get_antenna_status_from_redis",
+    "get_autospectra_from_redis",
+    "get_snap_status_from_redis",
+    "get_snap_spectra_from_redis",
+    "precompute_dashboards",
+    "antenna_stats_to_csv",
+    "update_status_rollups",
+]
+
+# Dash apps and the payload each sends the browser from the result of its
+# get_data, the compact store data the clientside callbacks draw from
+DASH_APPS = {
+    "autospectra": (autospectra, lambda data: autospectra.compact_df(data[1])),
+    "hex_plot": (hex_plot, lambda data: hex_plot.compact_df(data[0])),
+    "node_plot": (node_plot, node_plot.compact_df),
+    "adchists": (adchists, adchists.compact_df),
+    "snapspectra": (
+        snapspectra,
+        lambda data: snapspectra.plot_df(data[0], hostname=next(iter(data[1]))),
+    ),
+    "hex_notes": (hex_notes, None),
+}
+
+
+class Command(BaseCommand):
+    """Command to benchmark the ingest tasks and dashboard data builders."""
+
+    help = (
+        "Run every redis ingest task, Dash get_data and the serialization of "
+        "the data each app sends the browser against a synthetic array in a "
+        "throwaway test database, report the p50 and p95 run times, query "
+        "counts and payload sizes and compare them to a baseline."
+    )
+
+    def add_arguments(self, parser):
+        """Add additional arguments to command line parser."""
+        parser.add_argument(
+            "--ants", type=int, default=350, help="Number of synthetic antennas."
+        )
+        parser.add_argument(
+            "--nchan",
+            type=int,
+            default=1536,
+            help="Channels of the synthetic autocorrelations.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Runs of every benchmark, each a minute of new synthetic data.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--apps",
+            nargs="+",
+            choices=list(DASH_APPS),
+            default=list(DASH_APPS),
+            help="Dash apps to benchmark, all of them by default.",
+        )
+        parser.add_argument(
+            "--baseline", type=str, help="JSON file of results to compare against."
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the results to the baseline file instead of comparing.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Fraction a p50 may exceed its baseline before it is a regression.",
+        )
+        parser.add_argument(
+            "--noinput",
+            action="store_false",
+            dest="interactive",
+            help="Do not prompt before removing an existing test database.",
+        )
+
+    def handle(self, *args, **options):
+        """Create the test database, run the benchmarks and report them."""
+        if options["save_baseline"] and options["baseline"] is None:
+            raise CommandError("--save-baseline needs a --baseline file.")
+        array = SyntheticArray(options["ants"], options["nchan"], options["seed"])
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=options["verbosity"], autoclobber=not options["interactive"]
+        )
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                with override_settings(
+                    WATERFALL_DIR=os.path.join(tmp_dir, "waterfall"),
+                    SHARED_SNAPSHOT_DIR=os.path.join(tmp_dir, "shared_snapshots"),
+                ), mock.patch.object(tasks.settings, "MEDIA_ROOT", Path(tmp_dir)):
+                    self._seed(array)
+                    timings = self._run(array, options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=options["verbosity"]
+            )
+
+        results = {
+            "options": {key: options[key] for key in ["ants", "nchan", "repeat"]},
+            "benchmarks": {
+                name: {
+                    "p50_ms": float(np.percentile(durations, 50) * 1e3),
+                    "p95_ms": float(np.percentile(durations, 95) * 1e3),
+                    "queries": int(np.median(queries)),
+                    "payload_kb": float(np.median(sizes) / 1e3) if sizes else None,
+                }
+                for name, (durations, queries, sizes) in timings.items()
+            },
+        }
+        if options["save_baseline"]:
+            with open(options["baseline"], "w") as baseline_file:
+                json.dump(results, baseline_file, indent=2)
+            self.stdout.write(f"Saved the baseline to {options['baseline']}.")
+
+        baseline = {}
+        if options["baseline"] is not None and not options["save_baseline"]:
+            try:
+                with open(options["baseline"]) as baseline_file:
+                    stored = json.load(baseline_file)
+            except (OSError, ValueError) as err:
+                raise CommandError(f"Unable to read the baseline. {err}")
+            if stored["options"] != results["options"]:
+                self.stderr.write(
+                    f"The baseline was run with {stored['options']}, "
+                    "its timings are not comparable."
+                )
+            baseline = stored["benchmarks"]
+        self._report(results["benchmarks"], baseline, options["tolerance"])
+
+    def _seed(self, array):
+        """Insert the synthetic antennas and their apriori statuses."""
+        Antenna.objects.bulk_create(
+            [
+                Antenna(
+                    ant_number=ant,
+                    ant_name=f"HH{ant}",
+                    polarization=pol,
+                    antpos_enu=[14.6 * (ant % 20), 14.6 * (ant // 20), 0.0],
+                    constructed=True,
+                )
+                for ant, pol in array.antpols
+            ]
+        )
+        now = timezone.now()
+        AprioriStatus.objects.bulk_create(
+            [
+                AprioriStatus(
+                    antenna=antenna,
+                    time=now,
+                    apriori_status=AprioriStatus.AprioriStatusList.DISH_OK,
+                )
+                for antenna in Antenna.objects.all()
+            ]
+        )
+
+    def _run(self, array, options):
+        """Run every benchmark once per synthetic minute.
+
+        Returns
+        -------
+        dict
+            Run times in seconds and query counts keyed by benchmark name.
+
+        """
+        memory = MemoryRedis()
+        clock = {"time": None}
+        timings = defaultdict(lambda: ([], [], []))
+
+        def measure(name, func, *args):
+            output = io.StringIO()
+            with CaptureQueriesContext(
+                connection
+            ) as queries, contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                result = func(*args)
+                elapsed = time.perf_counter() - start
+            if options["verbosity"] > 1 and output.getvalue():
+                self.stdout.write(output.getvalue())
+            durations, counts, sizes = timings[name]
+            durations.append(elapsed)
+            counts.append(len(queries))
+            if isinstance(result, str):
+                sizes.append(len(result))
+            return result
+
+        stand_ins = [
+            mock.patch.object(
+                tasks,
+                "HeraCorrCM",
+                lambda **kwargs: SyntheticCorrCM(array, clock["time"], memory),
+            ),
+            mock.patch.object(tasks.redis, "ConnectionPool", lambda **kwargs: None),
+            mock.patch.object(tasks.redis, "Redis", lambda **kwargs: memory),
+            mock.patch("dashboard.store.get_redis", lambda: memory),
+            mock.patch.object(tasks, "get_redis", lambda: memory),
+            mock.patch.object(
+                tasks.mc, "connect_to_mc_db", lambda *args: SyntheticMCDB(array)
+            ),
+            mock.patch.object(tasks, "_schedule_precompute", lambda: None),
+        ]
+        start = timezone.now().replace(second=0, microsecond=0, tzinfo=None)
+        with contextlib.ExitStack() as stack:
+            for stand_in in stand_ins:
+                stack.enter_context(stand_in)
+
+            for minute in range(options["repeat"]):
+                clock["time"] = start + timedelta(minutes=minute)
+                strings, hashes = array.auto_keys(clock["time"])
+                for key, value in strings.items():
+                    memory.set(key, value)
+                for key, fields in {
+                    **hashes,
+                    **array.corr_hashes(clock["time"]),
+                }.items():
+                    memory.hset(key, mapping=fields)
+
+                for name in INGEST_TASKS:
+                    measure(name, getattr(tasks, name))
+
+                for app_name in options["apps"]:
+                    app, payload = DASH_APPS[app_name]
+                    # the builder itself, past the process and shared caches
+                    data = measure(
+                        f"{app_name}.get_data",
+                        inspect.unwrap(app.get_data),
+                        format_data_version(app.data_sources),
+                    )
+                    if payload is not None:
+                        measure(f"{app_name}.payload", _serialize, payload, data)
+        return timings
+
+    def _report(self, benchmarks, baseline, tolerance):
+        """Print the results beside the baseline and fail on regressions."""
+        self.stdout.write(
+            f"{'benchmark':<36} {'p50 ms':>10} {'p95 ms':>10} {'queries':>8}"
+            f" {'kB':>8} {'base p50':>10} {'change':>8}"
+        )
+        regressions = []
+        for name, result in benchmarks.items():
+            line = (
+                f"{name:<36} {result['p50_ms']:>10.1f} {result['p95_ms']:>10.1f}"
+                f" {result['queries']:>8d}"
+            )
+            if result["payload_kb"] is None:
+                line += f" {'':>8}"
+            else:
+                line += f" {result['payload_kb']:>8.1f}"
+            if name in baseline:
+                base = baseline[name]
+                change = result["p50_ms"] / base["p50_ms"] - 1
+                line += f" {base['p50_ms']:>10.1f} {change:>+8.0%}"
+                if change > tolerance or result["queries"] > base["queries"]:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} benchmarks regressed: {', '.join(regressions)}"
+            )
+
+
+def _serialize(payload, data):
+    """Build the payload of an app and encode it as Dash sends it."""
+    return json.dumps(payload(data), cls=PlotlyJSONEncoder)
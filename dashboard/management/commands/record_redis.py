@@ -0,0 +1,80 @@
+"""Record snapshots of the correlator keys in redis."""
+import logging  # noqa
+import time
+
+import redis
+from django.core.management.base import BaseCommand
+
+from dashboard.recordings import KEY_PATTERNS, Recorder, read_keys
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Command to record the correlator keys."""
+
+    help = (
+        "Periodically read the auto, EQ, correlator mapping and status keys "
+        "from redis into compressed snapshot files of a recording, for "
+        "replay with replay_redis."
+    )
+
+    def add_arguments(self, parser):
+        """Add additional arguments to command line parser."""
+        parser.add_argument("directory", type=str, help="Recording directory.")
+        parser.add_argument(
+            "--redis-url",
+            type=str,
+            default="redis://redishost:6379/0",
+            help="Redis server to record.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10.0,
+            help="Seconds between snapshots.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            help="Seconds to record for, until interrupted by default.",
+        )
+        parser.add_argument(
+            "--keyframe-every",
+            type=int,
+            default=60,
+            help="Snapshots between snapshots holding every key.",
+        )
+        parser.add_argument(
+            "--patterns",
+            nargs="+",
+            default=KEY_PATTERNS,
+            help="Glob patterns of the recorded keys.",
+        )
+
+    def handle(self, *args, **options):
+        """Record a snapshot every interval until the duration has passed."""
+        rsession = redis.Redis.from_url(options["redis_url"])
+        recorder = Recorder(options["directory"], options["keyframe_every"])
+
+        start = time.monotonic()
+        tick = 0
+        while (
+            options["duration"] is None
+            or tick * options["interval"] < options["duration"]
+        ):
+            try:
+                state = read_keys(rsession, options["patterns"])
+            except redis.RedisError as err:
+                self.stderr.write(f"Unable to read the keys. {err}")
+            else:
+                entry = recorder.record(time.time(), state)
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        f"{entry['file']}: {entry['changed']} changed, "
+                        f"{entry['removed']} removed keys, "
+                        f"{entry['bytes'] / 1e6:.2f} MB"
+                    )
+
+            tick += 1
+            time.sleep(max(start + tick * options["interval"] - time.monotonic(), 0))
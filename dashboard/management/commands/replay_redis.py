@@ -0,0 +1,104 @@
+"""Replay a recording of the correlator keys into redis."""
+import logging  # noqa
+import time
+
+import redis
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse, timezone
+
+from dashboard.recordings import KEY_PATTERNS, iter_snapshots, read_index, write_keys
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Command to replay recorded correlator keys."""
+
+    help = (
+        "Write the snapshots of a recording made with record_redis to a "
+        "redis server at their original pace or faster. The replayed values "
+        "carry their recorded timestamps."
+    )
+
+    def add_arguments(self, parser):
+        """Add additional arguments to command line parser."""
+        parser.add_argument("directory", type=str, help="Recording directory.")
+        parser.add_argument(
+            "--redis-url",
+            type=str,
+            default="redis://localhost:6379/0",
+            help="Redis server to write to. Never point it at the correlator.",
+        )
+        parser.add_argument(
+            "--speed",
+            type=float,
+            default=1.0,
+            help="Replay speed relative to the recording, 0 for no pauses.",
+        )
+        parser.add_argument(
+            "--start", type=str, help="ISO time to replay from, the start by default."
+        )
+        parser.add_argument(
+            "--end", type=str, help="ISO time to replay to, the end by default."
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove the keys matching the recorded patterns first.",
+        )
+
+    def handle(self, *args, **options):
+        """Write every snapshot when it is due."""
+        index = read_index(options["directory"])
+        if not index:
+            raise CommandError(f"No recording in {options['directory']}.")
+        try:
+            start, end = [_parse_time(options[bound]) for bound in ["start", "end"]]
+        except ValueError as err:
+            raise CommandError(err)
+
+        rsession = redis.Redis.from_url(options["redis_url"])
+        if options["clear"]:
+            for pattern in KEY_PATTERNS:
+                keys = list(rsession.scan_iter(pattern))
+                if keys:
+                    rsession.delete(*keys)
+
+        replay_start = time.monotonic()
+        first_time = None
+        n_snapshots = 0
+        for snapshot_time, changed, removed in iter_snapshots(
+            options["directory"], start, end
+        ):
+            if first_time is None:
+                first_time = snapshot_time
+            if options["speed"] > 0:
+                due = replay_start + (snapshot_time - first_time) / options["speed"]
+                time.sleep(max(due - time.monotonic(), 0))
+            write_keys(rsession, changed, removed)
+            n_snapshots += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"{_iso(snapshot_time)}: wrote {len(changed)} keys, "
+                    f"removed {len(removed)}"
+                )
+        self.stdout.write(
+            f"Replayed {n_snapshots} snapshots in "
+            f"{time.monotonic() - replay_start:.1f} s."
+        )
+
+
+def _parse_time(value):
+    """Parse an ISO time into a Unix time, naive times are taken to be UTC."""
+    if value is None:
+        return None
+    parsed = dateparse.parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid time {value!r}.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed.timestamp()
+
+
+def _iso(unix_time):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(unix_time))
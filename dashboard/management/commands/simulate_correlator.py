@@ -0,0 +1,151 @@
+"""Publish synthetic correlator output to redis for soak and scale tests."""
+import logging  # noqa
+import time
+from datetime import datetime
+
+import numpy as np
+import redis
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.synthetic import SyntheticArray, malform
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Command to simulate the correlator keys in redis."""
+
+    help = (
+        "Write the auto:*, auto:timestamp, eq:ant:*, corr:* and status keys "
+        "of a synthetic array to a redis server at a fixed cadence, with "
+        "optional stalls and malformed values, to drive the ingest tasks."
+    )
+
+    def add_arguments(self, parser):
+        """Add additional arguments to command line parser."""
+        parser.add_argument(
+            "--redis-url",
+            type=str,
+            default="redis://localhost:6379/0",
+            help="Redis server to write to. Never point it at the correlator.",
+        )
+        parser.add_argument(
+            "--ants", type=int, default=350, help="Number of synthetic antennas."
+        )
+        parser.add_argument(
+            "--nchan",
+            type=int,
+            default=1536,
+            help="Channels of the autocorrelations, a divisor of 6144.",
+        )
+        parser.add_argument(
+            "--cadence",
+            type=float,
+            default=10.0,
+            help="Seconds between updates of the keys.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            help="Seconds to run for, until interrupted by default.",
+        )
+        parser.add_argument(
+            "--stall-every",
+            type=float,
+            help="Seconds between correlator stalls, no stalls by default.",
+        )
+        parser.add_argument(
+            "--stall-length",
+            type=float,
+            default=300.0,
+            help="Seconds every stall lasts, no keys are updated meanwhile.",
+        )
+        parser.add_argument(
+            "--malformed",
+            type=float,
+            default=0.0,
+            help="Fraction of the published values which are malformed.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Publish the keys every cadence until the duration has passed."""
+        if 6144 % options["nchan"] != 0:
+            raise CommandError("--nchan must be a divisor of 6144.")
+        array = SyntheticArray(options["ants"], options["nchan"], options["seed"])
+        rng = np.random.default_rng(options["seed"])
+        rsession = redis.Redis.from_url(options["redis_url"])
+
+        # the mappings only change when the correlator is reconfigured
+        with rsession.pipeline(transaction=False) as pipe:
+            for key, fields in array.corr_hashes(datetime.utcnow()).items():
+                pipe.delete(key)
+                pipe.hset(key, mapping=fields)
+            pipe.execute()
+
+        start = time.monotonic()
+        tick = 0
+        stalled = False
+        while (
+            options["duration"] is None
+            or tick * options["cadence"] < options["duration"]
+        ):
+            was_stalled = stalled
+            stalled = self._stalled(tick * options["cadence"], options)
+            if stalled != was_stalled:
+                self.stdout.write(
+                    f"{datetime.utcnow():%H:%M:%S} correlator "
+                    f"{'stalled' if stalled else 'resumed'}"
+                )
+            if not stalled:
+                self._publish(rsession, array, rng, options)
+
+            tick += 1
+            delay = start + tick * options["cadence"] - time.monotonic()
+            if delay < 0:
+                self.stderr.write(
+                    f"Publishing took {-delay:.1f} s longer than the cadence."
+                )
+            time.sleep(max(delay, 0))
+
+    @staticmethod
+    def _stalled(elapsed, options):
+        """Whether the correlator is stalled elapsed seconds after the start."""
+        if options["stall_every"] is None:
+            return False
+        period = options["stall_every"] + options["stall_length"]
+        return elapsed % period >= options["stall_every"]
+
+    def _publish(self, rsession, array, rng, options):
+        """Write one update of the autocorrelations and statuses."""
+        now = datetime.utcnow()
+        build_start = time.monotonic()
+        strings, hashes = array.auto_keys(now)
+        hashes.update(array.status_hashes(now))
+        malformed = 0
+        if options["malformed"] > 0:
+            malformed = malform(strings, hashes, options["malformed"], rng)
+
+        write_start = time.monotonic()
+        with rsession.pipeline(transaction=False) as pipe:
+            for key, value in strings.items():
+                pipe.set(key, value)
+            for key, fields in hashes.items():
+                pipe.delete(key)
+                if fields:
+                    pipe.hset(key, mapping=fields)
+            pipe.execute()
+        write_end = time.monotonic()
+
+        if options["verbosity"] > 1:
+            n_bytes = sum(len(value) for value in strings.values()) + sum(
+                len(field) + len(value)
+                for fields in hashes.values()
+                for field, value in fields.items()
+            )
+            self.stdout.write(
+                f"{now:%H:%M:%S} wrote {len(strings) + len(hashes)} keys, "
+                f"{n_bytes / 1e6:.1f} MB, {malformed} malformed values, "
+                f"built in {write_start - build_start:.2f} s, "
+                f"written in {write_end - write_start:.2f} s"
+            )
@@ -0,0 +1,279 @@
+"""Metrics of the celery tasks in the Prometheus text format.
+
+Every task decorated with track_task reports its duration, outcome, the
+number and time of its database queries and the time spent reading
+redis, and bulk_create reports the rows a task built, the rows the
+database inserted and the rows it ignored as conflicts.
+
+The metrics of a run are added to a hash in the shared redis store when
+the run ends. The increments are atomic, so the prefork children of every
+celery worker add to the same counters, and the /metrics endpoint of any
+web worker serves the totals.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+import redis
+from django.db import connection
+
+from . import store
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "heranow:task_metrics"
+
+# upper bounds in seconds of the duration histogram buckets
+DURATION_BUCKETS = [0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 120, 300]
+
+# type and help text of every metric family
+METRICS = {
+    "heranow_task_duration_seconds": ("histogram", "Run time of the task."),
+    "heranow_task_last_duration_seconds": (
+        "gauge",
+        "Run time of the latest run of the task.",
+    ),
+    "heranow_task_last_run_timestamp_seconds": (
+        "gauge",
+        "Unix time the latest run of the task ended.",
+    ),
+    "heranow_task_runs_total": ("counter", "Runs of the task by outcome."),
+    "heranow_task_failures_total": (
+        "counter",
+        "Failed runs and failed steps of the task by kind.",
+    ),
+    "heranow_task_rows_built_total": (
+        "counter",
+        "Rows the task passed to bulk_create.",
+    ),
+    "heranow_task_rows_inserted_total": (
+        "counter",
+        "Rows the database inserted.",
+    ),
+    "heranow_task_rows_ignored_total": (
+        "counter",
+        "Rows the database ignored as conflicts with existing rows.",
+    ),
+    "heranow_task_db_queries_total": ("counter", "Database queries of the task."),
+    "heranow_task_db_seconds_total": (
+        "counter",
+        "Time the task waited on database queries.",
+    ),
+    "heranow_task_redis_calls_total": (
+        "counter",
+        "Timed reads of the correlator redis.",
+    ),
+    "heranow_task_redis_seconds_total": (
+        "counter",
+        "Time the task waited on the correlator redis.",
+    ),
+}
+
+_local = threading.local()
+
+
+def _sample(name, **labels):
+    """Format the name of a sample with its labels."""
+    escaped = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in sorted(labels.items())
+    )
+    return f"{name}{{{escaped}}}"
+
+
+class _QueryTimer:
+    """Database execute wrapper counting queries and inserted rows."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.inserted = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+        if sql.lstrip().upper().startswith("INSERT"):
+            self.inserted += max(context["cursor"].rowcount, 0)
+        return result
+
+
+def track_task(func):
+    """Record the metrics of every run of a task.
+
+    Apply below the shared_task decorator. Exceptions escaping the task are
+    counted as failures of the kind of the exception and raised again.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        task = func.__name__
+        _local.run = run = {"task": task, "counts": Counter()}
+        timer = _QueryTimer()
+        outcome = "success"
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timer):
+                return func(*args, **kwargs)
+        except Exception as err:
+            outcome = "failure"
+            count_failure(type(err).__name__)
+            raise
+        finally:
+            _local.run = None
+            _finish(run, timer, outcome, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _finish(run, timer, outcome, duration):
+    """Add the metrics of a finished run to the shared store."""
+    task = run["task"]
+    counts = run["counts"]
+    counts[_sample("heranow_task_runs_total", task=task, outcome=outcome)] += 1
+    counts[_sample("heranow_task_db_queries_total", task=task)] += timer.count
+    counts[_sample("heranow_task_db_seconds_total", task=task)] += timer.seconds
+    counts[_sample("heranow_task_duration_seconds_sum", task=task)] += duration
+    counts[_sample("heranow_task_duration_seconds_count", task=task)] += 1
+    for bound in DURATION_BUCKETS + ["+Inf"]:
+        if bound == "+Inf" or duration <= bound:
+            bucket = _sample(
+                "heranow_task_duration_seconds_bucket", task=task, le=bound
+            )
+            counts[bucket] += 1
+    gauges = {
+        _sample("heranow_task_last_duration_seconds", task=task): duration,
+        _sample("heranow_task_last_run_timestamp_seconds", task=task): time.time(),
+    }
+
+    try:
+        pipe = store.get_redis().pipeline(transaction=False)
+        for field, amount in counts.items():
+            pipe.hincrbyfloat(METRICS_KEY, field, amount)
+        pipe.hset(METRICS_KEY, mapping=gauges)
+        pipe.execute()
+    except redis.RedisError as err:
+        logger.warning(f"Unable to store the metrics of {task}. {err}")
+
+
+def _count(name, amount=1, **labels):
+    """Add to a counter of the running task, if there is one."""
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["counts"][_sample(name, task=run["task"], **labels)] += amount
+
+
+def count_failure(kind):
+    """Count a failure of the running task.
+
+    Parameters
+    ----------
+    kind : str
+        What failed, like the name of an exception or of a step the task
+        continues without.
+
+    """
+    _count("heranow_task_failures_total", kind=kind)
+
+
+@contextmanager
+def timed_redis():
+    """Time a read of the correlator redis in the running task."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _count("heranow_task_redis_calls_total")
+        _count("heranow_task_redis_seconds_total", time.perf_counter() - start)
+
+
+def bulk_create(model, objs, **kwargs):
+    """Bulk create rows and count the rows built, inserted and ignored.
+
+    Parameters
+    ----------
+    model : django.db.models.Model
+        Model of the rows.
+    objs : iterable of model instances
+        Unsaved rows.
+    kwargs
+        Passed on to the bulk_create of the model manager.
+
+    Returns
+    -------
+    list
+        The rows, as returned by bulk_create.
+
+    """
+    objs = list(objs)
+    timer = _QueryTimer()
+    with connection.execute_wrapper(timer):
+        created = model.objects.bulk_create(objs, **kwargs)
+    table = model.__name__
+    _count("heranow_task_rows_built_total", len(objs), table=table)
+    _count("heranow_task_rows_inserted_total", timer.inserted, table=table)
+    _count("heranow_task_rows_ignored_total", len(objs) - timer.inserted, table=table)
+    return created
+
+
+def _family(name):
+    """Return the metric family a sample name belongs to."""
+    for suffix in ["_bucket", "_sum", "_count"]:
+        if name.endswith(suffix) and name[: -len(suffix)] in METRICS:
+            return name[: -len(suffix)]
+    return name
+
+
+def _sample_order(field):
+    """Sort samples by name and labels, histogram buckets by bound."""
+    name, labels = field.rstrip("}").split("{")
+    bound = None
+    other = []
+    for label in labels.split(","):
+        if label.startswith("le="):
+            bound = label[4:-1]
+        else:
+            other.append(label)
+    if bound is None:
+        return name, other, 0.0
+    return name, other, float("inf") if bound == "+Inf" else float(bound)
+
+
+def render_metrics():
+    """Render the stored metrics in the Prometheus text format.
+
+    Returns
+    -------
+    str
+        HELP and TYPE lines and the samples of every stored metric family.
+
+    """
+    try:
+        stored = store.get_redis().hgetall(METRICS_KEY)
+    except redis.RedisError as err:
+        logger.warning(f"Unable to read the task metrics. {err}")
+        stored = {}
+
+    families = {}
+    for field, value in stored.items():
+        field = field.decode()
+        families.setdefault(_family(field.split("{")[0]), []).append(
+            (field, float(value))
+        )
+
+    lines = []
+    for family in sorted(families):
+        if family in METRICS:
+            kind, text = METRICS[family]
+            lines.append(f"# HELP {family} {text}")
+            lines.append(f"# TYPE {family} {kind}")
+        for field, value in sorted(families[family], key=lambda x: _sample_order(x[0])):
+            lines.append(f"{field} {value:.17g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,61 @@
+# Store ADC histogram counts without repeating the bin centers in every row.
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+FORWARD = """
+UPDATE {table}
+SET adc_hist_counts = ARRAY(SELECT unnest(adc_hist[2:2]))::integer[]
+WHERE adc_hist IS NOT NULL
+    AND array_length(adc_hist, 2) = 255
+    AND adc_hist[1][1] = -128
+"""
+
+REVERSE = """
+UPDATE {table}
+SET adc_hist = ARRAY[
+    ARRAY(SELECT generate_series(-128, 126))::double precision[],
+    adc_hist_counts::double precision[]
+]
+WHERE adc_hist_counts IS NOT NULL
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0032_auto_20220421_1759"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="antennastatus",
+            name="adc_hist_counts",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(), blank=True, null=True, size=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="snapspectra",
+            name="adc_hist_counts",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(), blank=True, null=True, size=255
+            ),
+        ),
+        migrations.RunSQL(
+            FORWARD.format(table="dashboard_antennastatus"),
+            REVERSE.format(table="dashboard_antennastatus"),
+        ),
+        migrations.RunSQL(
+            FORWARD.format(table="dashboard_snapspectra"),
+            REVERSE.format(table="dashboard_snapspectra"),
+        ),
+        migrations.RemoveField(
+            model_name="antennastatus",
+            name="adc_hist",
+        ),
+        migrations.RemoveField(
+            model_name="snapspectra",
+            name="adc_hist",
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Store each distinct vector of EQ coefficients once and reference it by hash.
+
+import hashlib
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+from django.db.models import Min
+
+EQ_MODELS = ["AutoSpectra", "AntennaStatus", "SnapSpectra"]
+
+
+def hash_coeffs(coeffs):
+    # frozen copy of EqCoeffSet.hash_coeffs
+    return hashlib.sha256(np.asarray(coeffs, dtype=np.float64).tobytes()).hexdigest()
+
+
+def populate_eq_coeff_sets(apps, schema_editor):
+    EqCoeffSet = apps.get_model("dashboard", "EqCoeffSet")
+    eq_table = EqCoeffSet._meta.db_table
+    for model_name in EQ_MODELS:
+        model = apps.get_model("dashboard", model_name)
+        distinct_coeffs = (
+            model.objects.filter(eq_coeffs__isnull=False)
+            .values("eq_coeffs")
+            .annotate(first_seen=Min("time"))
+            .order_by()
+        )
+        for row in distinct_coeffs.iterator():
+            eq_set, created = EqCoeffSet.objects.get_or_create(
+                content_hash=hash_coeffs(row["eq_coeffs"]),
+                defaults={"coeffs": row["eq_coeffs"], "first_seen": row["first_seen"]},
+            )
+            if not created and row["first_seen"] < eq_set.first_seen:
+                eq_set.first_seen = row["first_seen"]
+                eq_set.save()
+
+        table = model._meta.db_table
+        schema_editor.execute(
+            f"UPDATE {table} SET eq_coeff_set_id = eq.content_hash "
+            f"FROM {eq_table} AS eq WHERE {table}.eq_coeffs = eq.coeffs"
+        )
+
+
+def restore_eq_coeffs(apps, schema_editor):
+    EqCoeffSet = apps.get_model("dashboard", "EqCoeffSet")
+    eq_table = EqCoeffSet._meta.db_table
+    for model_name in EQ_MODELS:
+        table = apps.get_model("dashboard", model_name)._meta.db_table
+        schema_editor.execute(
+            f"UPDATE {table} SET eq_coeffs = eq.coeffs "
+            f"FROM {eq_table} AS eq WHERE {table}.eq_coeff_set_id = eq.content_hash"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0033_adc_hist_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EqCoeffSet",
+            fields=[
+                (
+                    "content_hash",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                (
+                    "coeffs",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(), size=None
+                    ),
+                ),
+                ("first_seen", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="autospectra",
+            name="eq_coeff_set",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="dashboard.eqcoeffset",
+            ),
+        ),
+        migrations.AddField(
+            model_name="antennastatus",
+            name="eq_coeff_set",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="dashboard.eqcoeffset",
+            ),
+        ),
+        migrations.AddField(
+            model_name="snapspectra",
+            name="eq_coeff_set",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="dashboard.eqcoeffset",
+            ),
+        ),
+        migrations.RunPython(populate_eq_coeff_sets, restore_eq_coeffs),
+        migrations.RemoveField(
+            model_name="autospectra",
+            name="eq_coeffs",
+        ),
+        migrations.RemoveField(
+            model_name="antennastatus",
+            name="eq_coeffs",
+        ),
+        migrations.RemoveField(
+            model_name="snapspectra",
+            name="eq_coeffs",
+        ),
+    ]
@@ -0,0 +1,303 @@
+# Split the slowly varying AntennaStatus fields into an interval table.
+#
+# The existing antenna status table is renamed to AntennaMeasurement and keeps
+# the measured values, the configuration fields move to AntennaConfiguration
+# intervals and AntennaStatus becomes a view joining both.
+
+import dashboard.models
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+CONFIG_COLUMNS = [
+    "snap_hostname",
+    "snap_channel_number",
+    "pam_atten",
+    "pam_id",
+    "fem_id",
+    "fem_lna_power",
+    "fem_switch",
+]
+
+RENAME_TABLE = """
+ALTER TABLE dashboard_antennastatus RENAME TO dashboard_antennameasurement;
+ALTER INDEX dashboard_a_antenna_71ebb3_idx RENAME TO dashboard_a_antenna_556f77_idx;
+DROP INDEX dashboard_a_snap_ho_764181_idx;
+"""
+
+RESTORE_TABLE = """
+CREATE INDEX dashboard_a_snap_ho_764181_idx
+    ON dashboard_antennameasurement (snap_hostname, snap_channel_number);
+ALTER INDEX dashboard_a_antenna_556f77_idx RENAME TO dashboard_a_antenna_71ebb3_idx;
+ALTER TABLE dashboard_antennameasurement RENAME TO dashboard_antennastatus;
+"""
+
+# group consecutive statuses of an antenna with identical configurations
+# into intervals and point every measurement at its interval
+POPULATE_CONFIGURATIONS = """
+INSERT INTO dashboard_antennaconfiguration (antenna_id, valid_from, valid_to, {columns})
+SELECT antenna_id, min(time), max(time), {columns}
+FROM (
+    SELECT *, sum(changed) OVER (PARTITION BY antenna_id ORDER BY time) AS interval
+    FROM (
+        SELECT antenna_id, time, {columns},
+            CASE WHEN ROW({columns}) IS NOT DISTINCT FROM ROW({previous})
+                THEN 0 ELSE 1 END AS changed
+        FROM dashboard_antennameasurement
+        WINDOW w AS (PARTITION BY antenna_id ORDER BY time)
+    ) AS statuses
+) AS intervals
+GROUP BY antenna_id, interval, {columns};
+
+UPDATE dashboard_antennameasurement AS m SET configuration_id = c.id
+FROM dashboard_antennaconfiguration AS c
+WHERE m.antenna_id = c.antenna_id AND m.time BETWEEN c.valid_from AND c.valid_to;
+""".format(
+    columns=", ".join(CONFIG_COLUMNS),
+    previous=", ".join(f"lag({column}) OVER w" for column in CONFIG_COLUMNS),
+)
+
+RESTORE_CONFIGURATIONS = """
+UPDATE dashboard_antennameasurement AS m SET {assignments}
+FROM dashboard_antennaconfiguration AS c
+WHERE m.configuration_id = c.id;
+""".format(
+    assignments=", ".join(f"{column} = c.{column}" for column in CONFIG_COLUMNS)
+)
+
+CREATE_VIEW = """
+CREATE VIEW dashboard_antennastatus AS
+SELECT m.id, m.antenna_id, m.time,
+    c.snap_hostname, c.snap_channel_number,
+    m.adc_mean, m.adc_rms, m.adc_power,
+    c.pam_atten, m.pam_power, m.pam_voltage, m.pam_current, c.pam_id,
+    m.fem_voltage, m.fem_current, c.fem_id, c.fem_lna_power,
+    m.fem_imu, m.fem_temp, m.fft_overflow,
+    m.eq_coeff_set_id, m.adc_hist_counts, c.fem_switch,
+    m.configuration_id
+FROM dashboard_antennameasurement AS m
+LEFT JOIN dashboard_antennaconfiguration AS c ON c.id = m.configuration_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0034_eqcoeffset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AntennaConfiguration",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("valid_from", models.DateTimeField()),
+                ("valid_to", models.DateTimeField()),
+                (
+                    "snap_hostname",
+                    models.CharField(blank=True, max_length=200, null=True),
+                ),
+                (
+                    "snap_channel_number",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("pam_atten", models.IntegerField(blank=True, null=True)),
+                ("pam_id", models.CharField(blank=True, max_length=200, null=True)),
+                ("fem_id", models.CharField(blank=True, max_length=200, null=True)),
+                ("fem_lna_power", models.BooleanField(blank=True, null=True)),
+                (
+                    "fem_switch",
+                    models.CharField(
+                        choices=[
+                            ("ANT", "Antenna"),
+                            ("LOAD", "Load"),
+                            ("NOISE", "Noise"),
+                            ("UNKNOWN", "Unknown"),
+                            ("FAILED", "Failed"),
+                        ],
+                        max_length=7,
+                        null=True,
+                    ),
+                ),
+                (
+                    "antenna",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="dashboard.antenna",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="antennaconfiguration",
+            index=models.Index(
+                fields=["antenna", "valid_from"], name="dashboard_a_antenna_cc22e4_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="antennaconfiguration",
+            index=models.Index(
+                fields=["snap_hostname", "snap_channel_number"],
+                name="dashboard_a_snap_ho_b3eba0_idx",
+            ),
+        ),
+        # keep the existing rows, only the table and index are renamed
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(RENAME_TABLE, RESTORE_TABLE)],
+            state_operations=[
+                migrations.CreateModel(
+                    name="AntennaMeasurement",
+                    fields=[
+                        (
+                            "id",
+                            models.AutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        ("time", models.DateTimeField(verbose_name="Status Time")),
+                        (
+                            "snap_hostname",
+                            models.CharField(blank=True, max_length=200, null=True),
+                        ),
+                        (
+                            "snap_channel_number",
+                            models.PositiveSmallIntegerField(blank=True, null=True),
+                        ),
+                        ("adc_mean", models.FloatField(blank=True, null=True)),
+                        ("adc_rms", models.FloatField(blank=True, null=True)),
+                        ("adc_power", models.FloatField(blank=True, null=True)),
+                        ("pam_atten", models.IntegerField(blank=True, null=True)),
+                        ("pam_power", models.FloatField(blank=True, null=True)),
+                        ("pam_voltage", models.FloatField(blank=True, null=True)),
+                        ("pam_current", models.FloatField(blank=True, null=True)),
+                        (
+                            "pam_id",
+                            models.CharField(blank=True, max_length=200, null=True),
+                        ),
+                        ("fem_voltage", models.FloatField(blank=True, null=True)),
+                        ("fem_current", models.FloatField(blank=True, null=True)),
+                        (
+                            "fem_id",
+                            models.CharField(blank=True, max_length=200, null=True),
+                        ),
+                        ("fem_lna_power", models.BooleanField(blank=True, null=True)),
+                        (
+                            "fem_imu",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.FloatField(),
+                                blank=True,
+                                null=True,
+                                size=2,
+                            ),
+                        ),
+                        ("fem_temp", models.FloatField(blank=True, null=True)),
+                        ("fft_overflow", models.BooleanField(blank=True, null=True)),
+                        (
+                            "adc_hist_counts",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.IntegerField(),
+                                blank=True,
+                                null=True,
+                                size=255,
+                            ),
+                        ),
+                        (
+                            "fem_switch",
+                            models.CharField(
+                                choices=[
+                                    ("ANT", "Antenna"),
+                                    ("LOAD", "Load"),
+                                    ("NOISE", "Noise"),
+                                    ("UNKNOWN", "Unknown"),
+                                    ("FAILED", "Failed"),
+                                ],
+                                max_length=7,
+                                null=True,
+                            ),
+                        ),
+                        (
+                            "antenna",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="dashboard.antenna",
+                            ),
+                        ),
+                        (
+                            "eq_coeff_set",
+                            models.ForeignKey(
+                                blank=True,
+                                null=True,
+                                on_delete=django.db.models.deletion.PROTECT,
+                                to="dashboard.eqcoeffset",
+                            ),
+                        ),
+                    ],
+                    bases=(
+                        dashboard.models.EqCoeffsMixin,
+                        dashboard.models.AdcHistogramMixin,
+                        models.Model,
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="antennameasurement",
+                    index=models.Index(
+                        fields=["antenna", "time"],
+                        name="dashboard_a_antenna_556f77_idx",
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="antennameasurement",
+                    constraint=models.UniqueConstraint(
+                        fields=("antenna", "time"), name="One antpol status per time"
+                    ),
+                ),
+                migrations.AlterModelOptions(
+                    name="antennastatus",
+                    options={"managed": False},
+                ),
+                migrations.AlterModelTable(
+                    name="antennastatus",
+                    table="dashboard_antennastatus",
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="antennastatus",
+            name="configuration",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                to="dashboard.antennaconfiguration",
+            ),
+        ),
+        migrations.AddField(
+            model_name="antennameasurement",
+            name="configuration",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="dashboard.antennaconfiguration",
+            ),
+        ),
+        migrations.RunSQL(POPULATE_CONFIGURATIONS, RESTORE_CONFIGURATIONS),
+    ]
+    operations += [
+        migrations.RemoveField(model_name="antennameasurement", name=column)
+        for column in CONFIG_COLUMNS
+    ]
+    operations += [
+        migrations.RunSQL(CREATE_VIEW, "DROP VIEW dashboard_antennastatus;"),
+    ]
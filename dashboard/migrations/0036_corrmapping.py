@@ -0,0 +1,190 @@
+# Store the correlator mappings as versions which are only written on change.
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+MAPPINGS = [
+    ("XengChannels", "xeng_chans"),
+    ("AntToSnap", "ant_to_snap"),
+    ("SnapToAnt", "snap_to_ant"),
+]
+
+
+def hash_content(keys):
+    # frozen copy of CorrMapping.hash_content
+    content = json.dumps(sorted(keys), separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def content_key(kind, row):
+    # frozen copy of the content_key methods of the mapping models
+    if kind == "xeng_chans":
+        return [row.number, list(row.chans)]
+    if kind == "ant_to_snap":
+        return [
+            row.antenna.ant_number,
+            row.antenna.polarization,
+            row.snap_hostname,
+            row.chan,
+        ]
+    return [
+        row.snap_hostname,
+        list(row.ants),
+        None if row.inds is None else list(row.inds),
+    ]
+
+
+def populate_mappings(apps, schema_editor):
+    CorrMapping = apps.get_model("dashboard", "CorrMapping")
+    for model_name, kind in MAPPINGS:
+        model = apps.get_model("dashboard", model_name)
+        times = list(
+            model.objects.order_by("time").values_list("time", flat=True).distinct()
+        )
+        current = None
+        xengs = {}
+        for time in times:
+            rows = model.objects.filter(time=time)
+            if kind == "ant_to_snap":
+                rows = rows.select_related("antenna")
+            if kind == "xeng_chans":
+                # xengs with unchanged channels were not inserted again,
+                # carry them over from the earlier times
+                new_numbers = set()
+                for row in rows:
+                    xengs[row.number] = list(row.chans)
+                    new_numbers.add(row.number)
+                keys = [[number, chans] for number, chans in xengs.items()]
+            else:
+                keys = [content_key(kind, row) for row in rows]
+            content_hash = hash_content(keys)
+
+            if current is not None and current.content_hash == content_hash:
+                # an unchanged copy of the current mapping
+                current.update_time = time
+                current.save()
+                rows.delete()
+                continue
+
+            if current is not None:
+                current.valid_to = time
+                current.save()
+            current = CorrMapping.objects.create(
+                kind=kind,
+                content_hash=content_hash,
+                update_time=time,
+                valid_from=time,
+            )
+            rows.update(mapping=current)
+            if kind == "xeng_chans":
+                model.objects.bulk_create(
+                    [
+                        model(time=time, number=number, chans=chans, mapping=current)
+                        for number, chans in xengs.items()
+                        if number not in new_numbers
+                    ]
+                )
+
+
+# copies of unchanged xengs would violate the old constraint
+REMOVE_XENG_COPIES = """
+DELETE FROM dashboard_xengchannels AS a USING dashboard_xengchannels AS b
+WHERE a.number = b.number AND a.chans = b.chans AND a.id > b.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0035_antenna_configuration"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CorrMapping",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("xeng_chans", "X-Engine Channels"),
+                            ("ant_to_snap", "Antenna to SNAP"),
+                            ("snap_to_ant", "SNAP to Antenna"),
+                        ],
+                        max_length=11,
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                ("update_time", models.DateTimeField()),
+                ("valid_from", models.DateTimeField()),
+                ("valid_to", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="corrmapping",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(valid_to__isnull=True),
+                fields=("kind",),
+                name="One current mapping per kind",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="corrmapping",
+            index=models.Index(
+                fields=["kind", "valid_from"], name="dashboard_c_kind_7ec0f0_idx"
+            ),
+        ),
+        migrations.RemoveConstraint(
+            model_name="xengchannels",
+            name="xengs must have disjoint channels.",
+        ),
+        migrations.RemoveConstraint(
+            model_name="anttosnap",
+            name="One ant to snap mapping per time",
+        ),
+        migrations.RemoveConstraint(
+            model_name="snaptoant",
+            name="One snap to ant mappering per time",
+        ),
+        migrations.AddField(
+            model_name="xengchannels",
+            name="mapping",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="dashboard.corrmapping",
+            ),
+        ),
+        migrations.AddField(
+            model_name="anttosnap",
+            name="mapping",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="dashboard.corrmapping",
+            ),
+        ),
+        migrations.AddField(
+            model_name="snaptoant",
+            name="mapping",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="dashboard.corrmapping",
+            ),
+        ),
+        migrations.RunPython(populate_mappings, migrations.RunPython.noop),
+        migrations.RunSQL(migrations.RunSQL.noop, REMOVE_XENG_COPIES),
+    ]
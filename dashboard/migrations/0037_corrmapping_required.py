@@ -0,0 +1,61 @@
+# Require a mapping version on every correlator mapping row.
+#
+# Kept apart from 0036 because postgres does not allow altering the tables
+# in the same transaction as the rows updated by its data migration.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0036_corrmapping"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="xengchannels",
+            name="mapping",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="dashboard.corrmapping",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="anttosnap",
+            name="mapping",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="dashboard.corrmapping",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="snaptoant",
+            name="mapping",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="dashboard.corrmapping",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="xengchannels",
+            constraint=models.UniqueConstraint(
+                fields=("mapping", "number"), name="One xeng per mapping"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="anttosnap",
+            constraint=models.UniqueConstraint(
+                fields=("mapping", "antenna"),
+                name="One ant to snap mapping per version",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="snaptoant",
+            constraint=models.UniqueConstraint(
+                fields=("mapping", "snap_hostname"),
+                name="One snap to ant mapping per version",
+            ),
+        ),
+    ]
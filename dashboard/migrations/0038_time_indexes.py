@@ -0,0 +1,79 @@
+# Index the time-series tables for latest-row lookups and time range scans.
+#
+# The indexes are built concurrently so ingest keeps writing while they are
+# created, which needs a non-atomic migration.
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("dashboard", "0037_corrmapping_required"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="autospectra",
+            index=models.Index(fields=["-time"], name="dashboard_a_time_5fa5e2_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="autospectra",
+            index=models.Index(
+                fields=["antenna", "-time"], name="dashboard_a_antenna_5b1478_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="antennameasurement",
+            index=models.Index(
+                fields=["antenna", "-time"], name="dashboard_a_antenna_ee5cbd_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="antennameasurement",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["time"], name="dashboard_a_time_aa9df9_brin"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="aprioristatus",
+            index=models.Index(
+                fields=["antenna", "-time"], name="dashboard_a_antenna_fe11a3_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="aprioristatus",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["time"], name="dashboard_a_time_c5f9fd_brin"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="snapspectra",
+            index=models.Index(
+                fields=["hostname", "input_number", "-time"],
+                name="dashboard_s_hostnam_44994f_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="snapspectra",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["time"], name="dashboard_s_time_9a4899_brin"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="snapstatus",
+            index=models.Index(
+                fields=["hostname", "-time"], name="dashboard_s_hostnam_46f8b1_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="snapstatus",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["time"], name="dashboard_s_time_06527a_brin"
+            ),
+        ),
+    ]
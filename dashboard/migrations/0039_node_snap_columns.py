@@ -0,0 +1,104 @@
+# Store the node and SNAP numbers parsed from the SNAP hostnames.
+
+from django.db import migrations, models
+
+POPULATE_NODE_SNAP = r"""
+UPDATE {table}
+SET node = substring({column} from 'heraNode(\d+)Snap\d+')::integer,
+    snap = substring({column} from 'heraNode\d+Snap(\d+)')::integer
+WHERE {column} ~ 'heraNode\d+Snap\d+';
+"""
+
+VIEW_COLUMNS = """
+    m.id, m.antenna_id, m.time,
+    c.snap_hostname, c.snap_channel_number,
+    m.adc_mean, m.adc_rms, m.adc_power,
+    c.pam_atten, m.pam_power, m.pam_voltage, m.pam_current, c.pam_id,
+    m.fem_voltage, m.fem_current, c.fem_id, c.fem_lna_power,
+    m.fem_imu, m.fem_temp, m.fft_overflow,
+    m.eq_coeff_set_id, m.adc_hist_counts, c.fem_switch,
+    m.configuration_id
+"""
+
+VIEW_FROM = """
+FROM dashboard_antennameasurement AS m
+LEFT JOIN dashboard_antennaconfiguration AS c ON c.id = m.configuration_id;
+"""
+
+# columns can only be appended to a view
+ADD_VIEW_COLUMNS = (
+    "CREATE OR REPLACE VIEW dashboard_antennastatus AS SELECT"
+    + VIEW_COLUMNS
+    + ", c.node, c.snap"
+    + VIEW_FROM
+)
+
+REMOVE_VIEW_COLUMNS = (
+    "DROP VIEW dashboard_antennastatus; "
+    + "CREATE VIEW dashboard_antennastatus AS SELECT"
+    + VIEW_COLUMNS
+    + VIEW_FROM
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0038_time_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="antennaconfiguration",
+            name="node",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="antennaconfiguration",
+            name="snap",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="snapspectra",
+            name="node",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="snapspectra",
+            name="snap",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunSQL(
+            POPULATE_NODE_SNAP.format(
+                table="dashboard_antennaconfiguration", column="snap_hostname"
+            ),
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            POPULATE_NODE_SNAP.format(table="dashboard_snapspectra", column="hostname"),
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="antennaconfiguration",
+            index=models.Index(
+                fields=["node", "snap"], name="dashboard_a_node_4226ed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="snapspectra",
+            index=models.Index(
+                fields=["node", "snap"], name="dashboard_s_node_d02b6d_idx"
+            ),
+        ),
+        migrations.RunSQL(ADD_VIEW_COLUMNS, REMOVE_VIEW_COLUMNS),
+        migrations.AddField(
+            model_name="antennastatus",
+            name="node",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="antennastatus",
+            name="snap",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Autospectra summary statistics computed at ingest.
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0039_node_snap_columns"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpectraMetrics",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("time", models.DateTimeField(verbose_name="Status Time")),
+                ("mean_db", models.FloatField(blank=True, null=True)),
+                ("median_eq", models.FloatField(blank=True, null=True)),
+                ("band_start", models.FloatField()),
+                ("band_width", models.FloatField()),
+                (
+                    "band_power",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(null=True), size=None
+                    ),
+                ),
+                (
+                    "antenna",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="dashboard.antenna",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="spectrametrics",
+            index=models.Index(fields=["-time"], name="dashboard_s_time_cbb502_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="spectrametrics",
+            index=models.Index(
+                fields=["antenna", "-time"], name="dashboard_s_antenna_add370_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="spectrametrics",
+            constraint=models.UniqueConstraint(
+                fields=("antenna", "time"), name="One antpol metrics per time"
+            ),
+        ),
+    ]
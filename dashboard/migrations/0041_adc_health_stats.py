@@ -0,0 +1,69 @@
+# ADC health statistics derived from the histograms at ingest.
+
+from django.db import migrations, models
+
+ADC_STATS = [
+    "adc_clip_fraction",
+    "adc_effective_bits",
+    "adc_kurtosis",
+    "adc_asymmetry",
+]
+
+VIEW_COLUMNS = """
+    m.id, m.antenna_id, m.time,
+    c.snap_hostname, c.snap_channel_number,
+    m.adc_mean, m.adc_rms, m.adc_power,
+    c.pam_atten, m.pam_power, m.pam_voltage, m.pam_current, c.pam_id,
+    m.fem_voltage, m.fem_current, c.fem_id, c.fem_lna_power,
+    m.fem_imu, m.fem_temp, m.fft_overflow,
+    m.eq_coeff_set_id, m.adc_hist_counts, c.fem_switch,
+    m.configuration_id, c.node, c.snap
+"""
+
+VIEW_FROM = """
+FROM dashboard_antennameasurement AS m
+LEFT JOIN dashboard_antennaconfiguration AS c ON c.id = m.configuration_id;
+"""
+
+# columns can only be appended to a view
+ADD_VIEW_COLUMNS = (
+    "CREATE OR REPLACE VIEW dashboard_antennastatus AS SELECT"
+    + VIEW_COLUMNS
+    + "".join(f", m.{column}" for column in ADC_STATS)
+    + VIEW_FROM
+)
+
+REMOVE_VIEW_COLUMNS = (
+    "DROP VIEW dashboard_antennastatus; "
+    + "CREATE VIEW dashboard_antennastatus AS SELECT"
+    + VIEW_COLUMNS
+    + VIEW_FROM
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0040_spectrametrics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="antennameasurement",
+            name=column,
+            field=models.FloatField(blank=True, null=True),
+        )
+        for column in ADC_STATS
+    ]
+    operations += [
+        migrations.RunSQL(ADD_VIEW_COLUMNS, REMOVE_VIEW_COLUMNS),
+    ]
+    # the view model only tracks the new columns in the migration state
+    operations += [
+        migrations.AddField(
+            model_name="antennastatus",
+            name=column,
+            field=models.FloatField(blank=True, null=True),
+        )
+        for column in ADC_STATS
+    ]
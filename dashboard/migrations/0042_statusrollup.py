@@ -0,0 +1,65 @@
+# Status history aggregated over fixed time buckets for time-series queries.
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0041_adc_health_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatusRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=16)),
+                ("series", models.CharField(max_length=200)),
+                ("bucket", models.IntegerField()),
+                ("time", models.DateTimeField(verbose_name="Bucket Start")),
+                ("count", models.IntegerField()),
+                (
+                    "mean",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(null=True), size=None
+                    ),
+                ),
+                (
+                    "minimum",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(null=True), size=None
+                    ),
+                ),
+                (
+                    "maximum",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(null=True), size=None
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["source", "bucket", "-time"],
+                        name="dashboard_s_source_1b5b6d_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source", "bucket", "series", "time"),
+                        name="One rollup per series and bucket",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Drop the (antenna, time) b-trees of AprioriStatus and AntennaMeasurement
+# and the (hostname, time) b-tree of SnapStatus.
+#
+# The unique constraints on the same columns are backed by an index, so
+# these only cost writes and disk. The indexes are dropped concurrently so
+# ingest keeps writing, which needs a non-atomic migration.
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("dashboard", "0042_statusrollup"),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name="aprioristatus",
+            name="dashboard_a_antenna_6dbfa3_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="antennameasurement",
+            name="dashboard_a_antenna_556f77_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="snapstatus",
+            name="dashboard_s_hostnam_16a685_idx",
+        ),
+    ]
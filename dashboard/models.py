@@ -1,9 +1,14 @@
 """Definition of Database Classes used to build website."""
 
 import datetime
+import hashlib
+import json
+import re
 
+import numpy as np
 from astropy.time import Time
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
@@ -57,11 +62,189 @@ class Antenna(models.Model):
         return f"{self.ant_name} pol:{self.polarization} built:{self.constructed}"
 
 
+def parse_snap_hostname(hostname):
+    """Return the node and SNAP numbers encoded in a SNAP hostname.
+
+    Parameters
+    ----------
+    hostname : str or None
+        SNAP hostname like heraNode4Snap2.
+
+    Returns
+    -------
+    node : int or None
+        The node number, None if the hostname does not follow the pattern.
+    snap : int or None
+        The SNAP number within the node, None if not known.
+
+    """
+    match = re.search(r"heraNode(?P<node>\d+)Snap(?P<snap>\d+)", hostname or "")
+    if match is None:
+        return None, None
+    return int(match.group("node")), int(match.group("snap"))
+
+
 def _get_dummy_default():
     return [1]
 
 
-class AutoSpectra(models.Model):
+class EqCoeffSet(models.Model):
+    """Definition of the digital EQ coefficient set table.
+
+    Each distinct vector of EQ coefficients is stored once, keyed by the hash
+    of its content. Time series tables reference a set instead of repeating
+    the coefficients in every row.
+
+    content_hash : Character Field
+        Hex digest of the coefficients from hash_coeffs. Primary key.
+    coeffs : Array Field of Floats
+        The digital equalization coefficients.
+    first_seen : DateTime Field
+        Time of the first row these coefficients were recorded for.
+
+    """
+
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    coeffs = ArrayField(models.FloatField())
+    first_seen = models.DateTimeField()
+
+    @staticmethod
+    def hash_coeffs(coeffs):
+        """Return the content hash of a vector of coefficients."""
+        return hashlib.sha256(
+            np.asarray(coeffs, dtype=np.float64).tobytes()
+        ).hexdigest()
+
+    def __str__(self):
+        """Define string representation of class."""
+        return f"EQ {self.content_hash[:8]} first seen: {self.first_seen}"
+
+
+class EqCoeffsMixin:
+    """Access the EQ coefficients referenced through eq_coeff_set."""
+
+    @property
+    def eq_coeffs(self):
+        """The digital equalization coefficients or None."""
+        if self.eq_coeff_set_id is None:
+            return None
+        return self.eq_coeff_set.coeffs
+
+    @classmethod
+    def eq_history(cls, **filters):
+        """Return when the EQ coefficients changed.
+
+        Parameters
+        ----------
+        filters : dict
+            Keyword filters selecting the rows, e.g. antenna=antenna.
+
+        Returns
+        -------
+        list of tuple
+            (time, content_hash) of the first row using each coefficient
+            set, sorted by time.
+
+        """
+        changes = (
+            cls.objects.filter(eq_coeff_set__isnull=False, **filters)
+            .order_by("eq_coeff_set", "time")
+            .distinct("eq_coeff_set")
+            .values_list("time", "eq_coeff_set")
+        )
+        return sorted(changes)
+
+
+class SnapshotMixin:
+    """Look up the latest row of every series up to a time in a single query.
+
+    Subclasses set snapshot_fields to the fields identifying a series.
+    """
+
+    snapshot_fields = ("antenna",)
+    # how far before the snapshot time the series without a key table
+    # are looked for
+    snapshot_window = datetime.timedelta(days=1)
+
+    @classmethod
+    def snapshot(cls, time=None, bounded=True):
+        """Return the latest row of every series at or before time.
+
+        Series keyed by antenna are looked up one antenna at a time, each
+        lookup reads a single row of the (antenna, -time) index. On the
+        AntennaStatus view the lookups only read AntennaMeasurement, the
+        unused join of the configuration is removed by the planner. Other
+        series have no table listing them, their DISTINCT ON query only
+        reads the rows within snapshot_window before time.
+
+        Parameters
+        ----------
+        time : datetime, optional
+            Time of the snapshot, the latest rows of every series if None.
+        bounded : bool
+            Only find the series without a key table which have a row within
+            snapshot_window before time. Unbounded lookups read the whole
+            history.
+
+        """
+        rows = cls.objects.all()
+        if time is not None:
+            rows = rows.filter(time__lte=time)
+        if cls.snapshot_fields == ("antenna",):
+            latest = (
+                rows.filter(antenna=models.OuterRef("pk"))
+                .order_by("-time")
+                .values("pk")[:1]
+            )
+            per_antenna = Antenna.objects.annotate(latest=models.Subquery(latest))
+            return cls.objects.filter(pk__in=per_antenna.values("latest")).order_by(
+                "antenna"
+            )
+        if bounded:
+            since = (timezone.now() if time is None else time) - cls.snapshot_window
+            rows = rows.filter(time__gte=since)
+        return rows.order_by(*cls.snapshot_fields, "-time").distinct(
+            *cls.snapshot_fields
+        )
+
+
+# bin centers shared by every ADC histogram
+ADC_HIST_BINS = np.arange(-128, 127)
+
+
+class AdcHistogramMixin:
+    """Access ADC histogram counts stored without their bin centers.
+
+    The counts are stored in the adc_hist_counts column on the bins
+    defined by ADC_HIST_BINS.
+    """
+
+    @property
+    def adc_hist(self):
+        """2D array of [[ADC histogram bin centers],[ADC histogram counts]]."""
+        if self.adc_hist_counts is None:
+            return None
+        return [ADC_HIST_BINS.tolist(), list(self.adc_hist_counts)]
+
+    @adc_hist.setter
+    def adc_hist(self, value):
+        if value is None:
+            self.adc_hist_counts = None
+            return
+        value = np.asarray(value)
+        if value.ndim == 2:
+            if not np.array_equal(value[0], ADC_HIST_BINS):
+                raise ValueError("ADC histogram bins do not match ADC_HIST_BINS.")
+            value = value[1]
+        if value.shape != ADC_HIST_BINS.shape:
+            raise ValueError(
+                f"ADC histogram must have {ADC_HIST_BINS.size} counts, "
+                f"got {value.size}."
+            )
+        self.adc_hist_counts = value.astype(int).tolist()
+
+
+class AutoSpectra(SnapshotMixin, EqCoeffsMixin, models.Model):
     """Definition of AutoSpectra table.
 
     Used to store autocorrelations from the correlator.
@@ -76,8 +259,8 @@ class AutoSpectra(models.Model):
         Full frequency array for corresponding spectra
     time : DateTime Field
         The time corresponding to the autocorrelation measurement
-    eq_coeffs : Array Field of Floats
-        The digital equalization coefficiants
+    eq_coeff_set : EqCoeffSet Instance
+        The digital equalization coefficiants, available as eq_coeffs
     frequencies_downsampled : Array Field of Float
         Frequencies corresponding to the downsampled version of the spectrum
     spectra_downsampled : Array of Float Field
@@ -89,7 +272,9 @@ class AutoSpectra(models.Model):
     spectra = ArrayField(models.FloatField())
     frequencies = ArrayField(models.FloatField())
     time = models.DateTimeField("Status Time")
-    eq_coeffs = ArrayField(models.FloatField(), default=_get_dummy_default)
+    eq_coeff_set = models.ForeignKey(
+        EqCoeffSet, on_delete=models.PROTECT, blank=True, null=True
+    )
     frequencies_downsampled = ArrayField(
         models.FloatField(), default=_get_dummy_default
     )
@@ -105,13 +290,19 @@ class AutoSpectra(models.Model):
     is_recent.short_description = "Recent Spectra?"
 
     class Meta:
-        """Define constraints on unique measurements."""
+        """Define constraints on unique measurements and indexes."""
 
         constraints = [
             models.UniqueConstraint(
                 fields=["antenna", "time"], name="One antpol auto per time"
             ),
         ]
+        # the latest spectra overall and per antenna are read on every
+        # dashboard load
+        indexes = [
+            models.Index(fields=["-time"]),
+            models.Index(fields=["antenna", "-time"]),
+        ]
 
     def clean(self):
         """Define cleaning constraints for the parameters."""
@@ -125,7 +316,59 @@ class AutoSpectra(models.Model):
             )
 
 
-class AprioriStatus(models.Model):
+class SpectraMetrics(SnapshotMixin, models.Model):
+    """Definition of the derived autospectra metrics table.
+
+    Summary statistics of each AutoSpectra row computed at ingest, so the
+    dashboards read scalars instead of the full spectra.
+    Uniquely keyed on the Antenna and time.
+
+    antenna : Antenna Instance
+        Unique antpol for each autocorrelation
+    time : DateTime Field
+        The time of the autocorrelation the metrics are derived from
+    mean_db : Float Field
+        Mean over channels of the autocorrelation in dB after dividing out
+        the squared median EQ coefficient.
+    median_eq : Float Field
+        Median of the digital EQ coefficients.
+    band_start : Float Field
+        Lower edge of the first frequency band in MHz.
+    band_width : Float Field
+        Width of each frequency band in MHz.
+    band_power : Array Field of Floats
+        Mean power in dB of each band, starting at band_start.
+
+    """
+
+    antenna = models.ForeignKey(Antenna, on_delete=models.CASCADE)
+    time = models.DateTimeField("Status Time")
+    mean_db = models.FloatField(blank=True, null=True)
+    median_eq = models.FloatField(blank=True, null=True)
+    band_start = models.FloatField()
+    band_width = models.FloatField()
+    band_power = ArrayField(models.FloatField(null=True))
+
+    @property
+    def band_edges(self):
+        """Lower edges of the frequency bands in MHz."""
+        return self.band_start + self.band_width * np.arange(len(self.band_power))
+
+    class Meta:
+        """Define constraints on unique measurements and indexes."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["antenna", "time"], name="One antpol metrics per time"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["-time"]),
+            models.Index(fields=["antenna", "-time"]),
+        ]
+
+
+class AprioriStatus(SnapshotMixin, models.Model):
     """Definition of The Apriori Status table.
 
     Uniquely keyed on Antenna and time of status.
@@ -178,7 +421,8 @@ class AprioriStatus(models.Model):
             ),
         ]
         indexes = [
-            models.Index(fields=["antenna", "time"]),
+            models.Index(fields=["antenna", "-time"]),
+            BrinIndex(fields=["time"]),
         ]
 
     def observation_ready(self):
@@ -195,12 +439,15 @@ class AprioriStatus(models.Model):
         return f"{self.antenna.ant_name} staus: {self.get_apriori_status_display()}"
 
 
-class AntennaStatus(models.Model):
+class AntennaStatus(SnapshotMixin, EqCoeffsMixin, AdcHistogramMixin, models.Model):
     """
-    Definition of antenna status table (based on SNAP info).
+    Definition of antenna status view (based on SNAP info).
 
     Very Similar to the Atenna Status table from HERA MC.
-    Listed below are the columns in the table.
+    This is a read only database view joining the minute AntennaMeasurement
+    rows with the AntennaConfiguration interval valid at their time.
+    New statuses are written to those two tables.
+    Listed below are the columns in the view.
 
 
     antenna : Antenna Instance
@@ -209,6 +456,10 @@ class AntennaStatus(models.Model):
         GPS time of the antenna status data, floored. Part of primary_key.
     snap_hostname : String Column
         SNAP hostname.
+    node : Integer Column
+        Node number of the SNAP, parsed from the hostname.
+    snap : Integer Column
+        SNAP number within the node, parsed from the hostname.
     snap_channel_number : Integer Column
         The SNAP ADC channel number (0-7) to which this antenna is connected.
     adc_mean : Float Column
@@ -243,17 +494,31 @@ class AntennaStatus(models.Model):
         EM temperature sensor reading for this antenna in degrees Celsius.
     fft_overflow : Boolean Column
         Indicator of an FFT overflow, True if there was an FFT overflow.
-    eq_coeffs : Array Column
-        Digital EQ coefficients for this antenna,
-    adc_hist : Array of Array Column
-        2D array of [[ADC histogram bin centers],[ADC histogram counts]]
+    eq_coeff_set : EqCoeffSet Instance
+        Digital EQ coefficients for this antenna, available as eq_coeffs
+    adc_hist_counts : Array Column
+        ADC histogram counts on the bins defined by ADC_HIST_BINS.
+        The adc_hist property returns the 2D form
+        [[ADC histogram bin centers],[ADC histogram counts]]
+    adc_clip_fraction : Float Column
+        Fraction of ADC samples in the outermost histogram bins.
+    adc_effective_bits : Float Column
+        Shannon entropy of the ADC histogram in bits.
+    adc_kurtosis : Float Column
+        Excess kurtosis of the ADC histogram, 0 for Gaussian noise.
+    adc_asymmetry : Float Column
+        Skewness of the ADC histogram.
+    configuration : AntennaConfiguration Instance
+        The configuration interval of this status.
 
     """
 
-    antenna = models.ForeignKey(Antenna, on_delete=models.CASCADE)
+    antenna = models.ForeignKey(Antenna, on_delete=models.DO_NOTHING)
     time = models.DateTimeField("Status Time")
 
     snap_hostname = models.CharField(max_length=200, blank=True, null=True)
+    node = models.IntegerField(blank=True, null=True)
+    snap = models.IntegerField(blank=True, null=True)
     snap_channel_number = models.PositiveSmallIntegerField(blank=True, null=True)
 
     adc_mean = models.FloatField(blank=True, null=True)
@@ -276,9 +541,18 @@ class AntennaStatus(models.Model):
 
     fft_overflow = models.BooleanField(blank=True, null=True)
 
-    eq_coeffs = ArrayField(models.FloatField(), blank=True, null=True)
-    # adc histograms first row centers, second row values
-    adc_hist = ArrayField(ArrayField(models.FloatField()), blank=True, null=True)
+    eq_coeff_set = models.ForeignKey(
+        EqCoeffSet, on_delete=models.DO_NOTHING, blank=True, null=True
+    )
+    # adc histogram counts, the bin centers are ADC_HIST_BINS
+    adc_hist_counts = ArrayField(
+        models.IntegerField(), size=ADC_HIST_BINS.size, blank=True, null=True
+    )
+    # health statistics derived from the histogram at ingest
+    adc_clip_fraction = models.FloatField(blank=True, null=True)
+    adc_effective_bits = models.FloatField(blank=True, null=True)
+    adc_kurtosis = models.FloatField(blank=True, null=True)
+    adc_asymmetry = models.FloatField(blank=True, null=True)
 
     _fem_mapping = {
         "antenna": "ANT",
@@ -320,6 +594,151 @@ class AntennaStatus(models.Model):
         ):
             raise ValidationError("snap_channel_number must be in the range [0,7].")
 
+    configuration = models.ForeignKey(
+        "AntennaConfiguration", on_delete=models.DO_NOTHING, blank=True, null=True
+    )
+
+    class Meta:
+        """Definition of the database view backing the model."""
+
+        managed = False
+        db_table = "dashboard_antennastatus"
+
+
+class AntennaConfiguration(models.Model):
+    """
+    Definition of the antenna configuration interval table.
+
+    Holds the slowly varying AntennaStatus fields. A row covers the time
+    from valid_from to valid_to during which the configuration of an
+    antenna did not change, and is extended as new unchanged statuses
+    arrive.
+
+    antenna : Antenna Instance
+       An instance of the Antenna Class. The antenna number and polarization.
+    valid_from : Datetime Column
+        Time of the first status with this configuration.
+    valid_to : Datetime Column
+        Time of the last status with this configuration.
+    snap_hostname : String Column
+        SNAP hostname.
+    node : Integer Column
+        Node number of the SNAP, parsed from the hostname at ingest.
+    snap : Integer Column
+        SNAP number within the node, parsed from the hostname at ingest.
+    snap_channel_number : Integer Column
+        The SNAP ADC channel number (0-7) to which this antenna is connected.
+    pam_atten : Integer Column
+        PAM attenuation setting for this antenna, in dB. (Integer)
+    pam_id : String Column
+        Serial number of this PAM.
+    fem_id : String Column
+        Serial number of this FEM.
+    fem_lna_power : Boolean Column
+        Power state of this FEM (True if powered).
+    fem_switch : String Column
+        Switch state for this FEM. Options are: {'antenna', 'load', 'noise'}
+
+    """
+
+    # the columns which together make up a configuration
+    config_fields = [
+        "snap_hostname",
+        "snap_channel_number",
+        "pam_atten",
+        "pam_id",
+        "fem_id",
+        "fem_lna_power",
+        "fem_switch",
+    ]
+
+    antenna = models.ForeignKey(Antenna, on_delete=models.CASCADE)
+    valid_from = models.DateTimeField()
+    valid_to = models.DateTimeField()
+
+    snap_hostname = models.CharField(max_length=200, blank=True, null=True)
+    node = models.IntegerField(blank=True, null=True)
+    snap = models.IntegerField(blank=True, null=True)
+    snap_channel_number = models.PositiveSmallIntegerField(blank=True, null=True)
+    pam_atten = models.IntegerField(blank=True, null=True)
+    pam_id = models.CharField(max_length=200, blank=True, null=True)
+    fem_id = models.CharField(max_length=200, blank=True, null=True)
+    fem_lna_power = models.BooleanField(blank=True, null=True)
+    fem_switch = models.CharField(
+        max_length=7, choices=AntennaStatus.FemSwitchStates.choices, null=True
+    )
+
+    def same_configuration(self, other):
+        """Return True if other has the same configuration values."""
+        return all(
+            getattr(self, field) == getattr(other, field)
+            for field in self.config_fields
+        )
+
+    class Meta:
+        """Definition of indexes on the table."""
+
+        indexes = [
+            models.Index(fields=["antenna", "valid_from"]),
+            models.Index(fields=["snap_hostname", "snap_channel_number"]),
+            models.Index(fields=["node", "snap"]),
+        ]
+
+    def __str__(self):
+        """Define string representation of class."""
+        return (
+            f"{self.antenna.ant_name}{self.antenna.polarization} "
+            f"{self.snap_hostname}:{self.snap_channel_number} "
+            f"from {self.valid_from} to {self.valid_to}"
+        )
+
+
+class AntennaMeasurement(SnapshotMixin, EqCoeffsMixin, AdcHistogramMixin, models.Model):
+    """
+    Definition of the antenna measurement table.
+
+    The measured values of an antenna status recorded every minute.
+    The configuration fields are stored once per interval in
+    AntennaConfiguration, the AntennaStatus view combines both.
+    See AntennaStatus for the description of the columns.
+
+    """
+
+    antenna = models.ForeignKey(Antenna, on_delete=models.CASCADE)
+    time = models.DateTimeField("Status Time")
+    configuration = models.ForeignKey(
+        AntennaConfiguration, on_delete=models.PROTECT, blank=True, null=True
+    )
+
+    adc_mean = models.FloatField(blank=True, null=True)
+    adc_rms = models.FloatField(blank=True, null=True)
+    adc_power = models.FloatField(blank=True, null=True)
+
+    pam_power = models.FloatField(blank=True, null=True)
+    pam_voltage = models.FloatField(blank=True, null=True)
+    pam_current = models.FloatField(blank=True, null=True)
+
+    fem_voltage = models.FloatField(blank=True, null=True)
+    fem_current = models.FloatField(blank=True, null=True)
+    # fem IMU Theta and Phi
+    fem_imu = ArrayField(models.FloatField(), 2, blank=True, null=True)
+    fem_temp = models.FloatField(blank=True, null=True)
+
+    fft_overflow = models.BooleanField(blank=True, null=True)
+
+    eq_coeff_set = models.ForeignKey(
+        EqCoeffSet, on_delete=models.PROTECT, blank=True, null=True
+    )
+    # adc histogram counts, the bin centers are ADC_HIST_BINS
+    adc_hist_counts = ArrayField(
+        models.IntegerField(), size=ADC_HIST_BINS.size, blank=True, null=True
+    )
+    # health statistics derived from the histogram at ingest
+    adc_clip_fraction = models.FloatField(blank=True, null=True)
+    adc_effective_bits = models.FloatField(blank=True, null=True)
+    adc_kurtosis = models.FloatField(blank=True, null=True)
+    adc_asymmetry = models.FloatField(blank=True, null=True)
+
     class Meta:
         """Definition of unique constraints and indexes on the table."""
 
@@ -329,12 +748,12 @@ class AntennaStatus(models.Model):
             ),
         ]
         indexes = [
-            models.Index(fields=["antenna", "time"]),
-            models.Index(fields=["snap_hostname", "snap_channel_number"]),
+            models.Index(fields=["antenna", "-time"]),
+            BrinIndex(fields=["time"]),
         ]
 
 
-class SnapStatus(models.Model):
+class SnapStatus(SnapshotMixin, models.Model):
     """
     Definition of SNAP status table.
 
@@ -365,6 +784,8 @@ class SnapStatus(models.Model):
         Last time this FPGA was programmed in floored gps seconds.
     """
 
+    snapshot_fields = ("hostname",)
+
     time = models.DateTimeField("Status Time")
     hostname = models.CharField(max_length=200)
     node = models.IntegerField(blank=True, null=True)
@@ -385,8 +806,9 @@ class SnapStatus(models.Model):
             ),
         ]
         indexes = [
-            models.Index(fields=["hostname", "time"]),
+            models.Index(fields=["hostname", "-time"]),
             models.Index(fields=["hostname", "snap_loc_num"]),
+            BrinIndex(fields=["time"]),
         ]
 
     def __str__(self):
@@ -394,7 +816,7 @@ class SnapStatus(models.Model):
         return f"{self.hostname} observed: {self.time}"
 
 
-class SnapSpectra(models.Model):
+class SnapSpectra(SnapshotMixin, EqCoeffsMixin, AdcHistogramMixin, models.Model):
     """
     Description of a SnapRF status table. Pulled from hera_corr_cm directly.
 
@@ -404,24 +826,38 @@ class SnapSpectra(models.Model):
         The time of the status
     hostname : String Column
         The name of the host
+    node : Integer Column
+        Node number of the SNAP, parsed from the hostname at ingest.
+    snap : Integer Column
+        SNAP number within the node, parsed from the hostname at ingest.
     input_number : Integer Column
         The snap input number.
-    eq_coeffs : Array Column
-        The equalization coefficients for the snap spectrum
+    eq_coeff_set : EqCoeffSet Instance
+        The equalization coefficients for the snap spectrum, available as eq_coeffs
     spectra : Array Column
         The autocorrelation spectrum taken directly from the snap
-    adc_hist : Array of Array Column
-        2D array of [[ADC histogram bin centers],[ADC histogram counts]]
+    adc_hist_counts : Array Column
+        ADC histogram counts on the bins defined by ADC_HIST_BINS.
+        The adc_hist property returns the 2D form
+        [[ADC histogram bin centers],[ADC histogram counts]]
 
     """
 
+    snapshot_fields = ("hostname", "input_number")
+
     time = models.DateTimeField()
     hostname = models.CharField(max_length=200)
+    node = models.IntegerField(blank=True, null=True)
+    snap = models.IntegerField(blank=True, null=True)
     input_number = models.IntegerField()
     spectra = ArrayField(models.FloatField(), blank=True, null=True)
-    eq_coeffs = ArrayField(models.FloatField(), blank=True, null=True)
-    # adc histograms first row centers, second row values
-    adc_hist = ArrayField(ArrayField(models.FloatField()), blank=True, null=True)
+    eq_coeff_set = models.ForeignKey(
+        EqCoeffSet, on_delete=models.PROTECT, blank=True, null=True
+    )
+    # adc histogram counts, the bin centers are ADC_HIST_BINS
+    adc_hist_counts = ArrayField(
+        models.IntegerField(), size=ADC_HIST_BINS.size, blank=True, null=True
+    )
 
     class Meta:
         """Definition of unique constraints and indexes on the table."""
@@ -435,6 +871,9 @@ class SnapSpectra(models.Model):
         indexes = [
             models.Index(fields=["hostname", "time"]),
             models.Index(fields=["hostname", "input_number"]),
+            models.Index(fields=["hostname", "input_number", "-time"]),
+            models.Index(fields=["node", "snap"]),
+            BrinIndex(fields=["time"]),
         ]
 
     def __str__(self):
@@ -524,10 +963,157 @@ class CommissioningIssue(models.Model):
         ]
 
 
-class XengChannels(models.Model):
+class StatusRollup(models.Model):
+    """Definition of the status history aggregated over fixed time buckets.
+
+    Each row aggregates every metric of one series, an antpol or a SNAP,
+    over one bucket. The metrics of each source and the bucket lengths are
+    defined in dashboard.rollups, metrics are stored in the order listed
+    there.
+
+    source : Character Field
+        The status table aggregated, one of dashboard.rollups.SOURCES.
+    series : Character Field
+        The antpol name, e.g. "1e", or the SNAP hostname.
+    bucket : Integer Field
+        Length of the bucket in seconds.
+    time : DateTime Field
+        Start of the bucket.
+    count : Integer Field
+        Number of status rows aggregated.
+    mean : Array Field of Floats
+        Mean of each metric over the bucket.
+    minimum : Array Field of Floats
+        Minimum of each metric over the bucket.
+    maximum : Array Field of Floats
+        Maximum of each metric over the bucket.
+
+    """
+
+    source = models.CharField(max_length=16)
+    series = models.CharField(max_length=200)
+    bucket = models.IntegerField()
+    time = models.DateTimeField("Bucket Start")
+    count = models.IntegerField()
+    mean = ArrayField(models.FloatField(null=True))
+    minimum = ArrayField(models.FloatField(null=True))
+    maximum = ArrayField(models.FloatField(null=True))
+
+    class Meta:
+        """Define constraints on unique buckets and indexes."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "bucket", "series", "time"],
+                name="One rollup per series and bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["source", "bucket", "-time"]),
+        ]
+
+    def __str__(self):
+        """Define string representation of class."""
+        return f"{self.source} {self.series} {self.bucket}s at {self.time}"
+
+
+class CorrMapping(models.Model):
+    """Definition of the correlator mapping interval table.
+
+    Each row is one version of a correlator mapping, valid from valid_from
+    until valid_to. The mapping tables reference the version their rows
+    belong to, so an unchanged mapping is never stored twice.
+
+    kind : Character Field
+        Which mapping this is a version of, one of CorrMapping.Kinds.
+    content_hash : Character Field
+        Hex digest of the mapping content from hash_content.
+    update_time : DateTime Field
+        Latest correlator update time reported with this content.
+    valid_from : DateTime Field
+        Time this version took effect.
+    valid_to : DateTime Field
+        Time this version was replaced, null for the current version.
+
+    """
+
+    class Kinds(models.TextChoices):
+        """Correlator mappings tracked over time."""
+
+        XENG_CHANS = "xeng_chans", gettext_lazy("X-Engine Channels")
+        ANT_TO_SNAP = "ant_to_snap", gettext_lazy("Antenna to SNAP")
+        SNAP_TO_ANT = "snap_to_ant", gettext_lazy("SNAP to Antenna")
+
+    kind = models.CharField(max_length=11, choices=Kinds.choices)
+    content_hash = models.CharField(max_length=64)
+    update_time = models.DateTimeField()
+    valid_from = models.DateTimeField()
+    valid_to = models.DateTimeField(null=True, blank=True)
+
+    @staticmethod
+    def hash_content(keys):
+        """Return the content hash of the content_key of every mapping row."""
+        content = json.dumps(sorted(keys), separators=(",", ":"))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    class Meta:
+        """Definition of unique constraints and indexes on the table."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind"],
+                condition=models.Q(valid_to__isnull=True),
+                name="One current mapping per kind",
+            )
+        ]
+        indexes = [models.Index(fields=["kind", "valid_from"])]
+
+    def __str__(self):
+        """Define string representation of class."""
+        return f"{self.kind} {self.content_hash[:8]} from: {self.valid_from}"
+
+
+class CorrMappingMixin:
+    """Look up the rows of a mapping version in a single query.
+
+    Subclasses set mapping_kind to their CorrMapping.Kinds value.
+    """
+
+    mapping_kind = None
+
+    @classmethod
+    def current(cls):
+        """Return the rows of the current mapping."""
+        return cls.objects.filter(
+            mapping__kind=cls.mapping_kind, mapping__valid_to__isnull=True
+        )
+
+    @classmethod
+    def as_of(cls, time):
+        """Return the rows of the mapping which was valid at time.
+
+        Parameters
+        ----------
+        time : datetime
+            Time at which the mapping is wanted.
+
+        """
+        return cls.objects.filter(
+            models.Q(mapping__valid_to__isnull=True)
+            | models.Q(mapping__valid_to__gt=time),
+            mapping__kind=cls.mapping_kind,
+            mapping__valid_from__lte=time,
+        )
+
+
+class XengChannels(CorrMappingMixin, models.Model):
     """
     Description of the  Xeng Channel mapping table.
 
+    time : DateTimeField
+        Time the mapping was read from the correlator.
+    mapping : CorrMapping class object
+        The mapping version this row belongs to.
     number : Integer Column
         The xeng's assigned number.
     chans : ArrayField
@@ -535,16 +1121,23 @@ class XengChannels(models.Model):
 
     """
 
+    mapping_kind = CorrMapping.Kinds.XENG_CHANS
+
     time = models.DateTimeField()
+    mapping = models.ForeignKey(CorrMapping, on_delete=models.CASCADE)
     number = models.IntegerField()
     chans = ArrayField(models.IntegerField())
 
+    def content_key(self):
+        """Return the values of this row hashed into the mapping content."""
+        return [self.number, list(self.chans)]
+
     class Meta:
         """Definition of unique constraints on the table."""
 
         constraints = [
             models.UniqueConstraint(
-                fields=["number", "chans"], name="xengs must have disjoint channels."
+                fields=["mapping", "number"], name="One xeng per mapping"
             )
         ]
 
@@ -553,12 +1146,14 @@ class XengChannels(models.Model):
         return f"xeng: {self.number} chans: {self.chans[0]}...{self.chans[-1]}"
 
 
-class AntToSnap(models.Model):
+class AntToSnap(CorrMappingMixin, models.Model):
     """
     Description of Antenna to Snap mapping table.
 
     time : DateTimeField
         Time the mapping was last updated
+    mapping : CorrMapping class object
+        The mapping version this row belongs to.
     antenna : Antenna class object
         Instance of the antenna associated with the snap
     snap_hostname : Text Column
@@ -568,17 +1163,30 @@ class AntToSnap(models.Model):
 
     """
 
+    mapping_kind = CorrMapping.Kinds.ANT_TO_SNAP
+
     time = models.DateTimeField("Snap mapping timestamp")
+    mapping = models.ForeignKey(CorrMapping, on_delete=models.CASCADE)
     antenna = models.ForeignKey(Antenna, on_delete=models.CASCADE)
     snap_hostname = models.CharField(max_length=200)
     chan = models.IntegerField()
 
+    def content_key(self):
+        """Return the values of this row hashed into the mapping content."""
+        return [
+            self.antenna.ant_number,
+            self.antenna.polarization,
+            self.snap_hostname,
+            self.chan,
+        ]
+
     class Meta:
         """Definition of unique constraints and indexes on the table."""
 
         constraints = [
             models.UniqueConstraint(
-                fields=["time", "antenna"], name="One ant to snap mapping per time"
+                fields=["mapping", "antenna"],
+                name="One ant to snap mapping per version",
             )
         ]
 
@@ -587,12 +1195,14 @@ class AntToSnap(models.Model):
         return f"{str(self.antenna.ant_number)}{str(self.antenna.polarization)} snap: {self.snap_hostname}:{self.chan}"
 
 
-class SnapToAnt(models.Model):
+class SnapToAnt(CorrMappingMixin, models.Model):
     """
     Description of the Snap to Antenna mapping table.
 
     time : DateTimeField
         The time associatd with the mapping
+    mapping : CorrMapping class object
+        The mapping version this row belongs to.
     snap_hostname : Text Column
         The Name of the snap
     node : Integer Column
@@ -606,20 +1216,31 @@ class SnapToAnt(models.Model):
 
     """
 
+    mapping_kind = CorrMapping.Kinds.SNAP_TO_ANT
+
     time = models.DateTimeField("Snap mapping timestamp")
+    mapping = models.ForeignKey(CorrMapping, on_delete=models.CASCADE)
     snap_hostname = models.CharField(max_length=200)
     node = models.IntegerField(null=True, blank=True)
     snap = models.IntegerField(null=True, blank=True)
     ants = ArrayField(models.CharField(max_length=6))
     inds = ArrayField(models.IntegerField(), null=True, blank=True)
 
+    def content_key(self):
+        """Return the values of this row hashed into the mapping content."""
+        return [
+            self.snap_hostname,
+            list(self.ants),
+            None if self.inds is None else list(self.inds),
+        ]
+
     class Meta:
         """Definition of unique constraints and indexes on the table."""
 
         constraints = [
             models.UniqueConstraint(
-                fields=["time", "snap_hostname"],
-                name="One snap to ant mappering per time",
+                fields=["mapping", "snap_hostname"],
+                name="One snap to ant mapping per version",
             )
         ]
         ordering = ["node", "snap"]
@@ -0,0 +1,227 @@
+"""Profiles of the Dash callbacks served by the web workers.
+
+DashProfileMiddleware measures every callback request of the Dash apps:
+the wall time, the number and time of the database queries, the lookups
+of the shared store (single flight results and precomputed views) which
+were hits or misses and the size of the response. The profiles are kept
+in a rolling window in the shared redis store, so the stats page sees
+the callbacks of every web worker.
+
+Queries slower than settings.DASH_PROFILE_EXPLAIN_MS are stored with
+their EXPLAIN plan.
+"""
+
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+import redis
+from dash._utils import create_callback_id
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils.text import slugify
+from django_plotly_dash.dash_wrapper import all_apps
+
+from . import store
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY = "heranow:callback_profiles"
+# slow queries explained per callback request
+MAX_EXPLAINED = 3
+
+_local = threading.local()
+
+
+def record_cache(hit):
+    """Count a lookup of the shared store in the current callback profile.
+
+    Parameters
+    ----------
+    hit : bool
+        Whether the lookup found a stored result.
+
+    """
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile["cache_hits" if hit else "cache_misses"] += 1
+
+
+class _QueryTimer:
+    """Database execute wrapper counting and timing the queries."""
+
+    def __init__(self, explain_ms):
+        self.explain_ms = explain_ms
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if (
+                self.explain_ms is not None
+                and not many
+                and elapsed * 1e3 >= self.explain_ms
+            ):
+                self.slow.append((elapsed, sql, params))
+
+
+def _explain(sql, params):
+    """Return the EXPLAIN plan of a query, None if it cannot be explained."""
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            return "\n".join(str(row[0]) for row in cursor.fetchall())
+    except DatabaseError as err:
+        logger.warning(f"Unable to explain a slow callback query. {err}")
+        return None
+
+
+@lru_cache(maxsize=None)
+def _callback_names(ident):
+    """Map the output ids of a Dash app's callbacks to the function names."""
+    dash_app = all_apps().get(slugify(ident))
+    if dash_app is None:
+        return {}
+    names = {}
+    for callback_set, func in dash_app._callback_sets:
+        try:
+            names[create_callback_id(callback_set["output"])] = func.__name__
+        except (AttributeError, TypeError):
+            continue
+    return names
+
+
+def callback_name(ident, output):
+    """Return the function name of a callback, the output id if unknown."""
+    if not isinstance(output, str):
+        return str(output)
+    return _callback_names(ident).get(output, output)
+
+
+class DashProfileMiddleware:
+    """Profile the callback requests of the Dash apps.
+
+    Only requests to the ``_dash-update-component`` endpoints are profiled,
+    and only while settings.DASH_PROFILE is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Serve the request, storing a profile if it ran a callback."""
+        if not settings.DASH_PROFILE or not request.path.rstrip("/").endswith(
+            "_dash-update-component"
+        ):
+            return self.get_response(request)
+
+        try:
+            output = json.loads(request.body)["output"]
+        except (KeyError, TypeError, ValueError):
+            output = ""
+        timer = _QueryTimer(settings.DASH_PROFILE_EXPLAIN_MS)
+        _local.profile = profile = {"cache_hits": 0, "cache_misses": 0}
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timer):
+                response = self.get_response(request)
+        finally:
+            wall = time.perf_counter() - start
+            _local.profile = None
+
+        match = request.resolver_match
+        ident = match.kwargs.get("ident", "") if match is not None else ""
+        profile.update(
+            {
+                "time": time.time(),
+                "app": ident,
+                "callback": callback_name(ident, output),
+                "status": response.status_code,
+                "wall_ms": wall * 1e3,
+                "queries": timer.count,
+                "db_ms": timer.seconds * 1e3,
+                "bytes": 0 if response.streaming else len(response.content),
+                "slow_queries": [
+                    {"ms": elapsed * 1e3, "sql": sql, "plan": _explain(sql, params)}
+                    for elapsed, sql, params in sorted(
+                        timer.slow, key=lambda query: query[0], reverse=True
+                    )[:MAX_EXPLAINED]
+                ],
+            }
+        )
+        store_profile(profile)
+        return response
+
+
+def store_profile(profile):
+    """Append a profile to the rolling window in the shared store."""
+    try:
+        pipe = store.get_redis().pipeline()
+        pipe.lpush(PROFILE_KEY, json.dumps(profile, default=str))
+        pipe.ltrim(PROFILE_KEY, 0, settings.DASH_PROFILE_WINDOW - 1)
+        pipe.execute()
+    except redis.RedisError as err:
+        logger.warning(f"Unable to store a callback profile. {err}")
+
+
+def get_profiles():
+    """Return the profiles in the rolling window, newest first."""
+    try:
+        stored = store.get_redis().lrange(PROFILE_KEY, 0, -1)
+    except redis.RedisError:
+        stored = []
+    return [json.loads(profile) for profile in stored]
+
+
+def summarize(profiles):
+    """Aggregate profiles per callback.
+
+    Parameters
+    ----------
+    profiles : list of dict
+        Profiles as returned by get_profiles.
+
+    Returns
+    -------
+    list of dict
+        Call count, wall time percentiles, mean queries, database time and
+        response size and the shared store hit rate of every callback,
+        slowest p95 first.
+
+    """
+    groups = {}
+    for profile in profiles:
+        groups.setdefault((profile["app"], profile["callback"]), []).append(profile)
+
+    summary = []
+    for (app, callback), group in groups.items():
+        wall = np.array([profile["wall_ms"] for profile in group])
+        hits = sum(profile["cache_hits"] for profile in group)
+        lookups = hits + sum(profile["cache_misses"] for profile in group)
+        summary.append(
+            {
+                "app": app,
+                "callback": callback,
+                "calls": len(group),
+                "p50_ms": np.percentile(wall, 50),
+                "p95_ms": np.percentile(wall, 95),
+                "max_ms": wall.max(),
+                "queries": np.mean([profile["queries"] for profile in group]),
+                "db_ms": np.mean([profile["db_ms"] for profile in group]),
+                "hit_rate": hits / lookups if lookups else None,
+                "bytes": np.mean([profile["bytes"] for profile in group]),
+            }
+        )
+    return sorted(summary, key=lambda row: row["p95_ms"], reverse=True)
@@ -0,0 +1,220 @@
+"""Recordings of the correlator keys in redis for later replay.
+
+A recording is a directory of gzip compressed snapshot files and an
+``index.jsonl`` file with one line per snapshot. A keyframe snapshot holds
+every recorded key, the snapshots in between only the keys which changed
+or were removed since the one before, so unchanged mappings, EQ
+coefficients and statuses are not stored again.
+
+The snapshots are pickled and must only be read from trusted recordings.
+"""
+
+import gzip
+import json
+import os
+import pickle
+
+# keys read by the ingest tasks
+KEY_PATTERNS = ["auto:*", "eq:ant:*", "corr:*", "status:*"]
+INDEX_FILE = "index.jsonl"
+
+
+def read_keys(rsession, patterns=KEY_PATTERNS):
+    """Read the string and hash keys matching patterns.
+
+    Parameters
+    ----------
+    rsession : redis.Redis
+        Client returning bytes.
+    patterns : list of str
+        Glob patterns of the keys.
+
+    Returns
+    -------
+    dict
+        bytes values of string keys and dictionaries of bytes of hash keys,
+        keyed by the key name.
+
+    """
+    keys = sorted({key for pattern in patterns for key in rsession.scan_iter(pattern)})
+    pipe = rsession.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+    types = pipe.execute()
+
+    pipe = rsession.pipeline(transaction=False)
+    read = []
+    for key, key_type in zip(keys, types):
+        if key_type == b"string":
+            pipe.get(key)
+        elif key_type == b"hash":
+            pipe.hgetall(key)
+        else:
+            continue
+        read.append(key.decode())
+    return {key: value for key, value in zip(read, pipe.execute()) if value is not None}
+
+
+def write_keys(rsession, changed, removed):
+    """Write the changed keys of a snapshot and remove the removed ones.
+
+    Parameters
+    ----------
+    rsession : redis.Redis
+        Client to write to.
+    changed : dict
+        Values keyed by the key name as returned by read_keys.
+    removed : list of str
+        Names of the keys to remove.
+
+    """
+    pipe = rsession.pipeline(transaction=False)
+    for key, value in changed.items():
+        if isinstance(value, dict):
+            pipe.delete(key)
+            if value:
+                pipe.hset(key, mapping=value)
+        else:
+            pipe.set(key, value)
+    if removed:
+        pipe.delete(*removed)
+    pipe.execute()
+
+
+class Recorder:
+    """Append snapshots of the correlator keys to a recording.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the recording, created if missing. Snapshots are
+        appended to an existing recording.
+    keyframe_every : int
+        Snapshots between keyframes holding every key.
+
+    """
+
+    def __init__(self, directory, keyframe_every=60):
+        self.directory = directory
+        self.keyframe_every = keyframe_every
+        os.makedirs(directory, exist_ok=True)
+        self.sequence = len(read_index(directory))
+        # the first snapshot of a session is always a keyframe
+        self._previous = None
+
+    def record(self, time, state):
+        """Store a snapshot of the keys.
+
+        Parameters
+        ----------
+        time : float
+            Unix time the keys were read.
+        state : dict
+            All recorded keys as returned by read_keys.
+
+        Returns
+        -------
+        dict
+            The index entry of the snapshot.
+
+        """
+        keyframe = self._previous is None or self.sequence % self.keyframe_every == 0
+        if keyframe:
+            changed, removed = state, []
+        else:
+            changed = {
+                key: value
+                for key, value in state.items()
+                if self._previous.get(key) != value
+            }
+            removed = [key for key in self._previous if key not in state]
+
+        filename = f"{self.sequence:08d}.pkl.gz"
+        path = os.path.join(self.directory, filename)
+        with gzip.open(f"{path}.tmp", "wb", compresslevel=6) as snapshot_file:
+            pickle.dump(
+                {"time": time, "changed": changed, "removed": removed},
+                snapshot_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(f"{path}.tmp", path)
+
+        entry = {
+            "time": time,
+            "file": filename,
+            "keyframe": keyframe,
+            "changed": len(changed),
+            "removed": len(removed),
+            "bytes": os.path.getsize(path),
+        }
+        with open(os.path.join(self.directory, INDEX_FILE), "a") as index_file:
+            index_file.write(json.dumps(entry) + "\n")
+        self.sequence += 1
+        self._previous = state
+        return entry
+
+
+def read_index(directory):
+    """Return the index entries of a recording in time order."""
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as index_file:
+            return [json.loads(line) for line in index_file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _load(directory, entry):
+    with gzip.open(os.path.join(directory, entry["file"]), "rb") as snapshot_file:
+        return pickle.load(snapshot_file)
+
+
+def iter_snapshots(directory, start=None, end=None):
+    """Iterate over the snapshots of a recording within a time range.
+
+    The first snapshot yielded holds every key as it was at the first
+    snapshot time in the range, rebuilt from the keyframe before it.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the recording.
+    start, end : float, optional
+        Unix time range to replay, the whole recording by default.
+
+    Yields
+    ------
+    time : float
+        Unix time the snapshot was recorded.
+    changed : dict
+        Values keyed by the key name.
+    removed : list of str
+        Names of the removed keys.
+
+    """
+    index = read_index(directory)
+    selected = [
+        position
+        for position, entry in enumerate(index)
+        if (start is None or entry["time"] >= start)
+        and (end is None or entry["time"] <= end)
+    ]
+    if not selected:
+        return
+    first = selected[0]
+    keyframe = max(
+        position for position in range(first + 1) if index[position]["keyframe"]
+    )
+
+    state = {}
+    for entry in index[keyframe : first + 1]:
+        snapshot = _load(directory, entry)
+        if entry["keyframe"]:
+            state = {}
+        state.update(snapshot["changed"])
+        for key in snapshot["removed"]:
+            state.pop(key, None)
+    yield index[first]["time"], state, []
+
+    for position in selected[1:]:
+        snapshot = _load(directory, index[position])
+        yield snapshot["time"], snapshot["changed"], snapshot["removed"]
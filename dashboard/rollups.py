@@ -0,0 +1,366 @@
+"""Status history aggregated over fixed time buckets.
+
+The status tables hold a row per antpol or SNAP every minute, far more
+than a plot of weeks or months can show. update_rollups aggregates them
+into StatusRollup rows of ten minutes, an hour and a day. The shortest
+buckets are computed from the status rows, every longer one from the
+bucket before it. series_values picks the bucket from the resolution a
+plot asks for and only reads status rows for short time ranges.
+"""
+
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db import models, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.utils import timezone
+
+from .models import Antenna, AntennaStatus, SnapStatus, SpectraMetrics, StatusRollup
+
+Source = namedtuple("Source", ["model", "series_fields", "metrics"])
+
+# Metrics are stored in the rollup arrays in the order listed here,
+# new metrics must only be appended.
+SOURCES = {
+    "antenna": Source(
+        AntennaStatus,
+        ("antenna__ant_number", "antenna__polarization"),
+        [
+            "adc_mean",
+            "adc_rms",
+            "adc_power",
+            "adc_clip_fraction",
+            "adc_effective_bits",
+            "adc_kurtosis",
+            "adc_asymmetry",
+            "pam_atten",
+            "pam_power",
+            "pam_voltage",
+            "pam_current",
+            "fem_voltage",
+            "fem_current",
+            "fem_temp",
+        ],
+    ),
+    "spectra": Source(
+        SpectraMetrics,
+        ("antenna__ant_number", "antenna__polarization"),
+        ["mean_db", "median_eq"],
+    ),
+    "snap": Source(
+        SnapStatus, ("hostname",), ["fpga_temp", "pps_count", "uptime_cycles"]
+    ),
+}
+
+# stored bucket lengths in seconds, each a multiple of the one before
+BUCKETS = [600, 3600, 86400]
+# buckets computed from the status rows when a plot needs finer resolution
+STATUS_BUCKETS = [60, 120, 300]
+# how long stored buckets are kept, forever if None
+RETENTION = {
+    600: timedelta(weeks=8),
+    3600: timedelta(weeks=104),
+    86400: None,
+}
+# time range aggregated per query, a multiple of every bucket
+CHUNK = timedelta(days=1)
+
+
+class BucketStart(models.Func):
+    """The start of the fixed-length time bucket a time falls in."""
+
+    template = (
+        "to_timestamp(floor(extract(epoch from %(expressions)s) / %(bucket)d) "
+        "* %(bucket)d)"
+    )
+    output_field = models.DateTimeField()
+
+    def __init__(self, expression, bucket, **extra):
+        super().__init__(expression, bucket=int(bucket), **extra)
+
+
+def floor_time(time, bucket):
+    """Return the start of the bucket of length bucket seconds time is in."""
+    return datetime.fromtimestamp(
+        bucket * (time.timestamp() // bucket), tz=timezone.utc
+    )
+
+
+def _series_filter(source, series):
+    """Translate a series name into filter keywords on the status table."""
+    if SOURCES[source].series_fields == ("hostname",):
+        return {"hostname": series}
+    return {
+        "antenna__ant_number": int(series[:-1]),
+        "antenna__polarization": series[-1],
+    }
+
+
+def list_series(source):
+    """Return the names of the series of a source.
+
+    Parameters
+    ----------
+    source : str
+        One of SOURCES.
+
+    Returns
+    -------
+    list of str
+        Antpol names like "1e" or SNAP hostnames.
+
+    """
+    if SOURCES[source].series_fields == ("hostname",):
+        return sorted(SnapStatus.snapshot().values_list("hostname", flat=True))
+    return [
+        f"{ant}{pol}"
+        for ant, pol in Antenna.objects.order_by(
+            "ant_number", "polarization"
+        ).values_list("ant_number", "polarization")
+    ]
+
+
+def _as_float(value):
+    return None if value is None else float(value)
+
+
+def _aggregate_status(source, bucket, start, end):
+    """Aggregate the status rows in [start, end) into rollups."""
+    spec = SOURCES[source]
+    aggregates = {}
+    for index, metric in enumerate(spec.metrics):
+        aggregates[f"mean_{index}"] = Avg(metric)
+        aggregates[f"min_{index}"] = Min(metric)
+        aggregates[f"max_{index}"] = Max(metric)
+    rows = (
+        spec.model.objects.filter(time__gte=start, time__lt=end)
+        .annotate(bucket_time=BucketStart("time", bucket))
+        .values(*spec.series_fields, "bucket_time")
+        .annotate(count=Count("time"), **aggregates)
+        .order_by()
+    )
+    indices = range(len(spec.metrics))
+    return [
+        StatusRollup(
+            source=source,
+            series="".join(str(row[field]) for field in spec.series_fields),
+            bucket=bucket,
+            time=row["bucket_time"],
+            count=row["count"],
+            mean=[_as_float(row[f"mean_{index}"]) for index in indices],
+            minimum=[_as_float(row[f"min_{index}"]) for index in indices],
+            maximum=[_as_float(row[f"max_{index}"]) for index in indices],
+        )
+        for row in rows
+    ]
+
+
+def _matrix(arrays, n_metrics):
+    """Stack stored metric arrays into a float matrix, NaN where missing."""
+    matrix = np.full((len(arrays), n_metrics), np.nan)
+    for index, array in enumerate(arrays):
+        values = [np.nan if value is None else value for value in array[:n_metrics]]
+        matrix[index, : len(values)] = values
+    return matrix
+
+
+def _as_list(array):
+    return [float(value) if np.isfinite(value) else None for value in array]
+
+
+def _combine_rollups(source, bucket, start, end, child_bucket):
+    """Combine the shorter rollups in [start, end) into rollups of bucket."""
+    n_metrics = len(SOURCES[source].metrics)
+    groups = defaultdict(list)
+    children = StatusRollup.objects.filter(
+        source=source, bucket=child_bucket, time__gte=start, time__lt=end
+    ).order_by("series", "time")
+    for child in children.iterator():
+        groups[(child.series, floor_time(child.time, bucket))].append(child)
+
+    rollups = []
+    for (series, time), group in groups.items():
+        counts = np.array([child.count for child in group], dtype=float)
+        means = _matrix([child.mean for child in group], n_metrics)
+        # weight the means by the rows each of them aggregates
+        valid = np.isfinite(means)
+        weights = counts[:, None] * valid
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (np.where(valid, means, 0) * weights).sum(axis=0) / weights.sum(
+                axis=0
+            )
+        rollups.append(
+            StatusRollup(
+                source=source,
+                series=series,
+                bucket=bucket,
+                time=time,
+                count=int(counts.sum()),
+                mean=_as_list(mean),
+                minimum=_as_list(
+                    np.fmin.reduce(
+                        _matrix([child.minimum for child in group], n_metrics)
+                    )
+                ),
+                maximum=_as_list(
+                    np.fmax.reduce(
+                        _matrix([child.maximum for child in group], n_metrics)
+                    )
+                ),
+            )
+        )
+    return rollups
+
+
+def _first_time(source, child_bucket):
+    """Return the time of the oldest data a bucket level is built from."""
+    if child_bucket is None:
+        rows = SOURCES[source].model.objects
+    else:
+        rows = StatusRollup.objects.filter(source=source, bucket=child_bucket)
+    return rows.order_by("time").values_list("time", flat=True).first()
+
+
+def update_rollups(now=None):
+    """Bring the rollups of every source up to date.
+
+    Every level is recomputed from the start of its latest stored bucket,
+    which was still filling up when it was written, and rollups past their
+    retention are removed.
+
+    Parameters
+    ----------
+    now : datetime, optional
+        Time up to which the status history is aggregated, now by default.
+
+    Returns
+    -------
+    int
+        Number of rollups written.
+
+    """
+    if now is None:
+        now = timezone.now()
+    written = 0
+    for source in SOURCES:
+        child_bucket = None
+        for bucket in BUCKETS:
+            latest = (
+                StatusRollup.objects.filter(source=source, bucket=bucket)
+                .order_by("-time")
+                .values_list("time", flat=True)
+                .first()
+            )
+            if latest is None:
+                latest = _first_time(source, child_bucket)
+            if latest is None:
+                child_bucket = bucket
+                continue
+
+            start = floor_time(latest, bucket)
+            while start < now:
+                end = min(start + CHUNK, now)
+                if child_bucket is None:
+                    rollups = _aggregate_status(source, bucket, start, end)
+                else:
+                    rollups = _combine_rollups(source, bucket, start, end, child_bucket)
+                with transaction.atomic():
+                    StatusRollup.objects.filter(
+                        source=source, bucket=bucket, time__gte=start, time__lt=end
+                    ).delete()
+                    StatusRollup.objects.bulk_create(rollups, batch_size=1000)
+                written += len(rollups)
+                start = end
+            child_bucket = bucket
+
+    for bucket, keep in RETENTION.items():
+        if keep is not None:
+            StatusRollup.objects.filter(bucket=bucket, time__lt=now - keep).delete()
+    return written
+
+
+def choose_bucket(start, end, max_points):
+    """Pick the shortest bucket giving at most max_points points over a range.
+
+    Parameters
+    ----------
+    start, end : datetime
+        Time range of the plot.
+    max_points : int
+        Maximum number of points wanted.
+
+    Returns
+    -------
+    int
+        Bucket length in seconds, the longest stored bucket if no bucket
+        is long enough.
+
+    """
+    interval = (end - start).total_seconds() / max(max_points, 1)
+    for bucket in STATUS_BUCKETS + BUCKETS:
+        if bucket >= interval:
+            return bucket
+    return BUCKETS[-1]
+
+
+def series_values(source, series, metric, start, end, max_points):
+    """Return the mean of a metric of one series per bucket over a range.
+
+    Stored rollups are read when the chosen bucket is stored, the status
+    rows are aggregated on the fly for the short buckets of short ranges.
+
+    Parameters
+    ----------
+    source : str
+        One of SOURCES.
+    series : str
+        Antpol name like "1e" or SNAP hostname.
+    metric : str
+        One of the metrics of the source.
+    start, end : datetime
+        Time range, inclusive.
+    max_points : int
+        Maximum number of points wanted, decides the bucket length.
+
+    Returns
+    -------
+    list of (datetime, float or None)
+        Start time and mean of every bucket with data, in time order.
+
+    Raises
+    ------
+    ValueError
+        If the metric or series is unknown.
+
+    """
+    spec = SOURCES[source]
+    if metric not in spec.metrics:
+        raise ValueError(f"Unknown {source} metric {metric}.")
+    bucket = choose_bucket(start, end, max_points)
+    start = floor_time(start, bucket)
+
+    if bucket in BUCKETS:
+        rows = (
+            StatusRollup.objects.filter(
+                source=source,
+                bucket=bucket,
+                series=series,
+                time__gte=start,
+                time__lte=end,
+            )
+            .order_by("time")
+            .values_list("time", f"mean__{spec.metrics.index(metric)}")
+        )
+    else:
+        rows = (
+            spec.model.objects.filter(
+                time__gte=start, time__lte=end, **_series_filter(source, series)
+            )
+            .annotate(bucket_time=BucketStart("time", bucket))
+            .values("bucket_time")
+            .annotate(value=Avg(metric))
+            .order_by("bucket_time")
+            .values_list("bucket_time", "value")
+        )
+    return [(time, _as_float(value)) for time, value in rows]
@@ -0,0 +1,107 @@
+"""Latest ingested arrays shared by every web worker through mapped files.
+
+The ingest tasks publish each new snapshot as a directory of .npy arrays
+and a small meta.json header under settings.SHARED_SNAPSHOT_DIR, then
+atomically point the ``<name>.current`` symlink at it. The web workers map
+the arrays read-only, so all of them share the one copy in the page cache
+instead of each querying and materializing the same rows.
+
+A reader resolves the symlink once before opening any file, so it always
+sees a complete file set. Replaced file sets are removed after a few
+versions, mappings held by readers stay valid after removal.
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# replaced file sets kept on disk besides the current one
+KEEP_VERSIONS = 2
+
+
+def _current_link(name):
+    return os.path.join(settings.SHARED_SNAPSHOT_DIR, f"{name}.current")
+
+
+def publish_snapshot(name, arrays, meta):
+    """Write a new file set and make it the current snapshot.
+
+    Parameters
+    ----------
+    name : str
+        Name of the snapshot, e.g. "autospectra".
+    arrays : dict
+        Numpy arrays keyed by name.
+    meta : dict
+        JSON serializable description of the arrays.
+
+    Returns
+    -------
+    str
+        Directory of the published file set.
+
+    """
+    os.makedirs(settings.SHARED_SNAPSHOT_DIR, exist_ok=True)
+    directory = os.path.join(
+        settings.SHARED_SNAPSHOT_DIR, f"{name}.{time.time_ns()}.{os.getpid()}"
+    )
+    os.mkdir(directory)
+    for key, array in arrays.items():
+        np.save(os.path.join(directory, f"{key}.npy"), array)
+    with open(os.path.join(directory, "meta.json"), "w") as meta_file:
+        json.dump(meta, meta_file)
+
+    tmp_link = f"{_current_link(name)}.{os.getpid()}.tmp"
+    os.symlink(os.path.basename(directory), tmp_link)
+    os.replace(tmp_link, _current_link(name))
+
+    old = sorted(
+        entry
+        for entry in os.listdir(settings.SHARED_SNAPSHOT_DIR)
+        if entry.startswith(f"{name}.")
+        and not entry.startswith(f"{name}.current")
+        and entry != os.path.basename(directory)
+    )
+    for entry in old[: max(len(old) - KEEP_VERSIONS, 0)]:
+        shutil.rmtree(os.path.join(settings.SHARED_SNAPSHOT_DIR, entry), True)
+    return directory
+
+
+def open_snapshot(name):
+    """Map the current snapshot read-only.
+
+    Parameters
+    ----------
+    name : str
+        Name of the snapshot, e.g. "autospectra".
+
+    Returns
+    -------
+    meta : dict or None
+        Contents of the meta.json header, None if nothing is published.
+    arrays : dict
+        Read-only memory-mapped arrays keyed by name.
+
+    """
+    try:
+        directory = os.path.realpath(_current_link(name))
+        with open(os.path.join(directory, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        arrays = {
+            entry[: -len(".npy")]: np.load(
+                os.path.join(directory, entry), mmap_mode="r"
+            )
+            for entry in os.listdir(directory)
+            if entry.endswith(".npy")
+        }
+    except (OSError, ValueError) as err:
+        logger.debug(f"No shared {name} snapshot. {err}")
+        return None, {}
+    return meta, arrays
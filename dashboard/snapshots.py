@@ -0,0 +1,181 @@
+"""Select the time at which the dashboards show the state of the array.
+
+The dashboards show the latest data by default. Given an ``as_of`` time
+they rebuild the array state from the latest rows at or before that time,
+see SnapshotMixin.snapshot. Those snapshots do not change once the ingest
+has moved past their time, so they are cached under a snapshot version
+built from the time alone instead of the data version of the ingest sources.
+"""
+
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs
+
+from django.utils import dateparse
+
+SNAPSHOT_PREFIX = "as_of:"
+
+# autospectra are only kept for a week, see delete_old_data
+HISTORY = timedelta(weeks=1)
+# resolution of the time slider, requests within a step share a snapshot
+STEP = timedelta(minutes=5)
+# more recent times may still receive data and are shown live
+SETTLE = timedelta(minutes=10)
+
+
+def _floor(time):
+    step = STEP.total_seconds()
+    return datetime.fromtimestamp(time.timestamp() // step * step, tz=timezone.utc)
+
+
+def resolve_as_of(time, now=None):
+    """Round a requested time down to the snapshot it is served from.
+
+    Parameters
+    ----------
+    time : datetime or None
+        Requested time, naive times are taken to be UTC.
+    now : datetime, optional
+        Current time, used for testing.
+
+    Returns
+    -------
+    str or None
+        ISO format time of the snapshot, None if the latest data should
+        be shown instead.
+
+    """
+    if time is None:
+        return None
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    if time > now - SETTLE:
+        return None
+    return _floor(time).isoformat()
+
+
+def parse_as_of(search):
+    """Read the as_of parameter from the query string of a page.
+
+    Parameters
+    ----------
+    search : str or None
+        Query string as reported by dcc.Location, e.g. "?as_of=2021-03-04T05:00".
+
+    Returns
+    -------
+    datetime or None
+        The requested time, None if it is missing or not a valid time.
+
+    """
+    values = parse_qs((search or "").lstrip("?")).get("as_of")
+    if not values:
+        return None
+    try:
+        return dateparse.parse_datetime(values[0])
+    except ValueError:
+        return None
+
+
+def snapshot_version(data_version, as_of):
+    """Return the version under which the data shown at as_of is cached.
+
+    Parameters
+    ----------
+    data_version : str
+        Current version of the ingest sources of the app.
+    as_of : str or None
+        Time of the snapshot from resolve_as_of, None for the latest data.
+
+    Returns
+    -------
+    str
+        The data version for the latest data, otherwise a version which
+        only depends on the snapshot time.
+
+    """
+    if as_of is None:
+        return data_version
+    return f"{SNAPSHOT_PREFIX}{as_of}"
+
+
+def snapshot_time(version):
+    """Return the time of a snapshot version.
+
+    Parameters
+    ----------
+    version : str
+        A data version or a version from snapshot_version.
+
+    Returns
+    -------
+    datetime or None
+        Time of the snapshot, None if version refers to the latest data.
+
+    """
+    if version is None or not version.startswith(SNAPSHOT_PREFIX):
+        return None
+    return dateparse.parse_datetime(version[len(SNAPSHOT_PREFIX) :])
+
+
+def slider_range(now=None):
+    """Return the range and daily marks of a time slider in unix seconds.
+
+    The end of the slider stands for the latest data.
+
+    Parameters
+    ----------
+    now : datetime, optional
+        Current time, used for testing.
+
+    Returns
+    -------
+    start : int
+        Earliest selectable time.
+    end : int
+        Value of the slider for the latest data.
+    marks : dict
+        Labels keyed by slider value.
+
+    """
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+    end = _floor(now)
+    start = end - HISTORY
+    marks = {}
+    day = start.replace(hour=0, minute=0, second=0) + timedelta(days=1)
+    while day < end - timedelta(hours=12):
+        marks[int(day.timestamp())] = day.strftime("%b %d")
+        day += timedelta(days=1)
+    marks[int(end.timestamp())] = "Live"
+    return int(start.timestamp()), int(end.timestamp()), marks
+
+
+def slider_as_of(value, end):
+    """Convert the value of a time slider to a snapshot time.
+
+    Parameters
+    ----------
+    value : int or None
+        Selected value in unix seconds.
+    end : int
+        Value of the slider for the latest data.
+
+    Returns
+    -------
+    str or None
+        Snapshot time as returned by resolve_as_of.
+
+    """
+    if value is None or value >= end:
+        return None
+    return resolve_as_of(datetime.fromtimestamp(value, tz=timezone.utc))
+
+
+def as_of_label(version):
+    """Describe the time shown by the data of a version."""
+    time = snapshot_time(version)
+    if time is None:
+        return "Showing the latest data"
+    return f"Showing the array state as of {time:%Y-%m-%d %H:%M} UTC"
@@ -0,0 +1,158 @@
+// Client side filtering of Dash figures by node and apriori status.
+// The server ships every trace once in a compact form to a dcc.Store and
+// these functions build the figure in the browser, so changing a dropdown
+// needs no round trip to the server. Static marker positions, nodes and
+// hover text are kept in a separate store so data updates only carry the
+// marker colours and the values of the hover lines.
+(function () {
+  function asList(values) {
+    if (values === null || values === undefined) {
+      return [];
+    }
+    return Array.isArray(values) ? values : [values];
+  }
+
+  function selected(value, choices) {
+    return choices.length === 0 || choices.indexOf(value) >= 0;
+  }
+
+  // Complete the static hover text of a marker with the lines of values
+  // sent with every data version, markers without a status have none.
+  function hoverText(text, values, lines) {
+    if (!values) {
+      return text;
+    }
+    return [text]
+      .concat(
+        lines.map(function (line, i) {
+          return line.replace("{}", values[i]);
+        })
+      )
+      .join("<br>");
+  }
+
+  var filters = {
+    // Build line traces from the output of compact_df in the autospectra
+    // and adchists apps. meta[0] holds the node, meta[1] the apriori status.
+    filter_traces: function (data, nodes, apriori) {
+      if (!data) {
+        throw window.dash_clientside.PreventUpdate;
+      }
+      nodes = asList(nodes);
+      apriori = asList(apriori);
+      var traces = [];
+      data.traces.forEach(function (trace) {
+        if (!selected(trace.meta[0], nodes) || !selected(trace.meta[1], apriori)) {
+          return;
+        }
+        traces.push({
+          type: "scattergl",
+          mode: "lines",
+          name: trace.name,
+          x: trace.x || data.x,
+          y: trace.y,
+          text: trace.text,
+          meta: trace.meta,
+          hovertemplate: data.hovertemplate,
+        });
+      });
+      var layout = Object.assign({}, data.layout, {
+        uirevision: JSON.stringify([nodes, apriori]),
+      });
+      return { data: traces, layout: layout };
+    },
+
+    // Build the hex plot traces from the output of compact_df in hex_plot,
+    // merged with the static antenna data from compact_geometry.
+    hex_figure: function (data, geometry, nodes) {
+      if (!data || !geometry || data.geometry !== geometry.key) {
+        // wait for the positions matching these values
+        throw window.dash_clientside.PreventUpdate;
+      }
+      nodes = asList(nodes);
+      var ants = Object.assign({}, geometry, data.antennas);
+      var groups = { unconstructed: [], selected: [], other: [] };
+      for (var i = 0; i < ants.x.length; i++) {
+        if (!ants.constructed[i]) {
+          groups.unconstructed.push(i);
+        } else if (selected(ants.node[i], nodes)) {
+          groups.selected.push(i);
+        } else {
+          groups.other.push(i);
+        }
+      }
+      function pick(column, inds) {
+        return inds.map(function (i) {
+          return column[i];
+        });
+      }
+      function trace(inds, marker) {
+        return {
+          type: "scattergl",
+          mode: "markers",
+          x: pick(ants.x, inds),
+          y: pick(ants.y, inds),
+          marker: Object.assign({ size: 14, symbol: "hexagon" }, marker),
+          text: inds.map(function (i) {
+            return hoverText(ants.text[i], ants.hover[i], geometry.lines);
+          }),
+          hovertemplate: data.hovertemplate,
+        };
+      }
+      return {
+        data: [
+          trace(groups.unconstructed, {
+            color: pick(ants.color, groups.unconstructed),
+            coloraxis: "coloraxis2",
+            opacity: pick(ants.opacity, groups.unconstructed),
+          }),
+          trace(groups.selected, {
+            color: pick(ants.color, groups.selected),
+            coloraxis: "coloraxis",
+            opacity: pick(ants.opacity, groups.selected),
+          }),
+          trace(groups.other, {
+            color: "grey",
+            coloraxis: "coloraxis",
+            opacity: 0.5,
+          }),
+        ],
+        layout: data.layout,
+      };
+    },
+
+    // Build the node plot traces from the output of compact_df in node_plot,
+    // merged with the static marker data from compact_geometry.
+    node_figure: function (data, geometry) {
+      if (!data || !geometry || data.geometry !== geometry.key) {
+        // wait for the positions matching these values
+        throw window.dash_clientside.PreventUpdate;
+      }
+      return {
+        data: geometry.traces.map(function (position, i) {
+          return {
+            type: "scattergl",
+            mode: "markers",
+            x: position.x,
+            y: position.y,
+            marker: {
+              color: data.traces[i].color,
+              size: 14,
+              symbol: "hexagon",
+              coloraxis: "coloraxis",
+            },
+            text: position.text.map(function (text, j) {
+              return hoverText(text, data.traces[i].hover[j], geometry.lines);
+            }),
+            hovertemplate: data.hovertemplate,
+          };
+        }),
+        layout: data.layout,
+      };
+    },
+  };
+
+  window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    heranow: Object.assign({}, (window.dash_clientside || {}).heranow, filters),
+  });
+})();
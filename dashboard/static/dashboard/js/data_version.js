@@ -0,0 +1,93 @@
+// Track the ingest data versions pushed by the server over server-sent events.
+// Dash apps poll these versions client side and only ask the server for new
+// data when one of the sources they depend on has changed.
+//
+// A page opens a single event stream. Dash apps in frames of the page ask the
+// page for the versions, which it forwards to them with postMessage, so a
+// page embedding several apps does not hold a connection per app. Only apps
+// without an embedding page open the stream themselves.
+window.heranowDataVersions = window.heranowDataVersions || {};
+
+(function () {
+  if (window.heranowDataStream) {
+    // loaded by both the page and a Dash app rendered in it
+    return;
+  }
+  var stream = (window.heranowDataStream = {
+    events: null,
+    frames: [],
+    answered: false,
+  });
+  var origin = window.location.origin;
+  var inFrame = window.parent !== window;
+
+  // Send the versions to a frame, return false if the frame was removed.
+  function forward(frame) {
+    if (frame.closed) {
+      return false;
+    }
+    frame.postMessage({ heranowDataVersions: window.heranowDataVersions }, origin);
+    return true;
+  }
+
+  function open() {
+    if (stream.events !== null || !window.EventSource) {
+      return;
+    }
+    stream.events = new EventSource("/events/data_version");
+    stream.events.addEventListener("version", function (event) {
+      Object.assign(window.heranowDataVersions, JSON.parse(event.data));
+      stream.frames = stream.frames.filter(forward);
+    });
+  }
+
+  window.addEventListener("message", function (event) {
+    if (event.origin !== origin || !event.data) {
+      return;
+    }
+    if (event.data.heranowSubscribe && !inFrame) {
+      open();
+      if (stream.frames.indexOf(event.source) === -1) {
+        stream.frames.push(event.source);
+      }
+      forward(event.source);
+    } else if (event.data.heranowDataVersions && inFrame) {
+      stream.answered = true;
+      Object.assign(window.heranowDataVersions, event.data.heranowDataVersions);
+    }
+  });
+
+  // Called on every poll of the Dash apps until the versions arrive.
+  stream.connect = function () {
+    if (!inFrame) {
+      open();
+    } else if (!stream.answered) {
+      window.parent.postMessage({ heranowSubscribe: true }, origin);
+    }
+  };
+})();
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  heranow: Object.assign({}, (window.dash_clientside || {}).heranow, {
+    // Must produce the same string as dashboard.store.format_data_version
+    data_version: function (n_intervals, sources, current) {
+      window.heranowDataStream.connect();
+      var versions = window.heranowDataVersions;
+      var version;
+      if (Object.keys(versions).length === 0) {
+        // no event stream available, fall back to refreshing every minute
+        version = "minute:" + Math.floor(Date.now() / 60000);
+      } else {
+        version = sources
+          .map(function (source) {
+            return source + ":" + (versions[source] || 0);
+          })
+          .join("|");
+      }
+      if (version === current) {
+        throw window.dash_clientside.PreventUpdate;
+      }
+      return version;
+    },
+  }),
+});
@@ -0,0 +1,395 @@
+"""Access to the redis store shared by the web workers and celery tasks."""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import Counter
+from functools import lru_cache, wraps
+
+import redis
+from django.conf import settings
+
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSION_KEY = "heranow:data_versions"
+DATA_VERSION_TIME_KEY = "heranow:data_version_times"
+SINGLE_FLIGHT_STATS_KEY = "heranow:single_flight:stats"
+PRECOMPUTED_KEY = "heranow:precomputed"
+# largest pickled result single_flight passes between processes in redis
+MAX_SHARED_BYTES = 4 * 1024**2
+
+# The ingest sources whose updates trigger a dashboard refresh.
+DATA_SOURCES = [
+    "antennas",
+    "autospectra",
+    "antenna_status",
+    "apriori",
+    "snap_spectra",
+    "snap_status",
+    "hookup_notes",
+    "corr_map",
+]
+
+
+@lru_cache(maxsize=None)
+def _connection_pool():
+    return redis.ConnectionPool.from_url(settings.DASHBOARD_REDIS_URL)
+
+
+def get_redis():
+    """Return a redis client backed by the process-wide connection pool."""
+    return redis.Redis(connection_pool=_connection_pool())
+
+
+def publish_data_version(source):
+    """Increment the data version of an ingest source and notify subscribers.
+
+    The unix time of the update is kept alongside the version, see
+    get_data_version_times.
+
+    Parameters
+    ----------
+    source : str
+        Name of the ingest source, one of DATA_SOURCES.
+
+    Returns
+    -------
+    version : int or None
+        The new version number of the source, None if redis is unavailable.
+
+    """
+    rsession = get_redis()
+    try:
+        pipe = rsession.pipeline()
+        pipe.hincrby(DATA_VERSION_KEY, source, 1)
+        pipe.hset(DATA_VERSION_TIME_KEY, source, time.time())
+        version, _ = pipe.execute()
+        rsession.publish(settings.DATA_VERSION_CHANNEL, json.dumps({source: version}))
+    except redis.RedisError as err:
+        logger.warning(f"Unable to publish data version for {source}. {err}")
+        return None
+    return version
+
+
+def get_data_versions():
+    """Return the current version of every ingest source.
+
+    Returns
+    -------
+    versions : dict
+        Dictionary of integer versions keyed by source name.
+        Sources which have never been published are reported as 0.
+
+    """
+    try:
+        stored = get_redis().hgetall(DATA_VERSION_KEY)
+    except redis.RedisError:
+        stored = {}
+    versions = {source: 0 for source in DATA_SOURCES}
+    versions.update({key.decode(): int(val) for key, val in stored.items()})
+    return versions
+
+
+def get_data_version_times():
+    """Return the time every ingest source was last updated.
+
+    Returns
+    -------
+    times : dict
+        Unix times keyed by source name, sources which have never been
+        published are missing.
+
+    """
+    try:
+        stored = get_redis().hgetall(DATA_VERSION_TIME_KEY)
+    except redis.RedisError:
+        stored = {}
+    return {key.decode(): float(val) for key, val in stored.items()}
+
+
+def format_data_version(sources, versions=None):
+    """Combine the versions of several sources into a single version string.
+
+    The format must match the clientside function in
+    ``dashboard/static/dashboard/js/data_version.js``.
+
+    Parameters
+    ----------
+    sources : list of str
+        Ingest sources the caller depends on.
+    versions : dict, optional
+        Versions keyed by source name. Read from redis if not provided.
+
+    Returns
+    -------
+    str
+        Version string which changes whenever any of the sources change.
+
+    """
+    if versions is None:
+        versions = get_data_versions()
+    return "|".join(f"{source}:{versions.get(source, 0)}" for source in sources)
+
+
+class _Flight:
+    """An in-process computation other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+_local_stats = Counter()
+# result of _read_result when nothing is stored
+_MISSING = object()
+
+
+def _count(name, outcome):
+    _local_stats[f"{name}:{outcome}"] += 1
+    profiling.record_cache(outcome in ["hit", "wait", "local_wait"])
+    try:
+        get_redis().hincrby(SINGLE_FLIGHT_STATS_KEY, f"{name}:{outcome}", 1)
+    except redis.RedisError:
+        pass
+
+
+def _result_path(key):
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(settings.SHARED_SNAPSHOT_DIR, "single_flight", digest)
+
+
+def _write_result(key, pickled, ttl):
+    """Store a pickled result in a file, removing files older than ttl."""
+    path = _result_path(key)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as result_file:
+        result_file.write(pickled)
+    os.replace(tmp_path, path)
+
+    expired = time.time() - ttl
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # removed by another process
+            pass
+
+
+def _read_result(key):
+    """Return the result stored by _write_result, _MISSING if there is none."""
+    try:
+        with open(_result_path(key), "rb") as result_file:
+            return pickle.load(result_file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return _MISSING
+
+
+def _shared_call(name, key, func, args, kwargs, ttl, lock_timeout, poll, share):
+    """Compute func once at a time across processes using a redis lock.
+
+    The process holding the lock stores the pickled result, in redis if it
+    is shared and small enough, otherwise in a file under
+    settings.SHARED_SNAPSHOT_DIR, then marks the computation done in redis.
+    Other processes wait while the lock is held, then read the stored
+    result. They only build their own copy if the result could not be
+    stored or was removed.
+    """
+    rsession = get_redis()
+    result_key = f"heranow:single_flight:result:{key}"
+    done_key = f"heranow:single_flight:done:{key}"
+    lock = rsession.lock(f"heranow:single_flight:lock:{key}", timeout=lock_timeout)
+
+    deadline = time.monotonic() + lock_timeout
+    waited = False
+    while time.monotonic() < deadline:
+        if share:
+            cached = rsession.get(result_key)
+            if cached is not None:
+                _count(name, "wait" if waited else "hit")
+                return pickle.loads(cached)
+
+        if rsession.exists(done_key):
+            result = _read_result(key)
+            if result is not _MISSING:
+                _count(name, "wait" if waited else "hit")
+                return result
+            _count(name, "follow")
+            return func(*args, **kwargs)
+
+        if lock.acquire(blocking=False):
+            try:
+                result = func(*args, **kwargs)
+                _count(name, "compute")
+                try:
+                    pickled = pickle.dumps(result)
+                    pipe = rsession.pipeline()
+                    if share and len(pickled) <= MAX_SHARED_BYTES:
+                        pipe.set(result_key, pickled, ex=ttl)
+                    else:
+                        _write_result(key, pickled, ttl)
+                    pipe.set(done_key, 1, ex=ttl)
+                    pipe.execute()
+                except (OSError, pickle.PicklingError, redis.RedisError) as err:
+                    logger.warning(f"Unable to share result of {name}. {err}")
+            finally:
+                try:
+                    lock.release()
+                except redis.RedisError:
+                    # the lock expires on its own
+                    pass
+            return result
+
+        waited = True
+        time.sleep(poll)
+
+    # the lock holder is taking too long, do the work ourselves
+    _count(name, "timeout")
+    return func(*args, **kwargs)
+
+
+def single_flight(name, ttl=300, lock_timeout=120, poll=0.1, share=False):
+    """Coalesce identical concurrent calls of a data builder.
+
+    While one caller computes the result for a given set of arguments,
+    other threads in the same process wait for it and share it. Callers in
+    other processes wait on a lock in the shared redis store until the
+    lock holder is done, then read the result it stored, so the build runs
+    once for all processes. Results are passed through redis if ``share``
+    is set and they pickle to at most MAX_SHARED_BYTES, otherwise through
+    a file under settings.SHARED_SNAPSHOT_DIR.
+
+    Counters of how each call was resolved are kept per process and in
+    the shared store, see get_single_flight_stats.
+
+    Parameters
+    ----------
+    name : str
+        Name of the data builder, used in the shared keys and counters.
+    ttl : int
+        Seconds the completion marker and stored result are kept.
+    lock_timeout : int
+        Maximum seconds a computation may hold the shared lock.
+    poll : float
+        Seconds between checks for the result or marker while waiting.
+    share : bool
+        Whether to store small results in redis for the other processes.
+
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"{name}:{args!r}:{sorted(kwargs.items())!r}"
+            with _flights_lock:
+                flight = _flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _flights[key] = _Flight()
+
+            if not leader:
+                _count(name, "local_wait")
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+
+            try:
+                try:
+                    flight.result = _shared_call(
+                        name, key, func, args, kwargs, ttl, lock_timeout, poll, share
+                    )
+                except redis.RedisError as err:
+                    logger.warning(f"Shared store unavailable for {name}. {err}")
+                    _count(name, "compute")
+                    flight.result = func(*args, **kwargs)
+            except Exception as err:
+                flight.error = err
+                raise
+            finally:
+                with _flights_lock:
+                    del _flights[key]
+                flight.done.set()
+            return flight.result
+
+        return wrapper
+
+    return decorator
+
+
+def get_single_flight_stats():
+    """Return the single flight counters.
+
+    Returns
+    -------
+    shared : dict
+        Counters summed over every process, keyed by "name:outcome".
+    local : dict
+        Counters for this process only.
+
+    Outcomes are "compute" when the caller did the work holding the lock,
+    "hit" when the result was already stored, "wait" when the caller waited
+    on another process for the stored result, "follow" when it built its
+    own copy because another process was done but its result could not be
+    read, "local_wait"
+    when it waited on another thread and "timeout" when it gave up waiting
+    and did the work itself.
+
+    """
+    try:
+        stored = get_redis().hgetall(SINGLE_FLIGHT_STATS_KEY)
+    except redis.RedisError:
+        stored = {}
+    shared = {key.decode(): int(val) for key, val in stored.items()}
+    return shared, dict(_local_stats)
+
+
+def set_precomputed(app_name, payload, ttl=3600):
+    """Store the precomputed default view of a Dash app.
+
+    Parameters
+    ----------
+    app_name : str
+        Name of the DjangoDash app.
+    payload : dict
+        Data embedded in the app layout, must include a "data_version" key.
+    ttl : int
+        Seconds the payload is kept in redis.
+
+    """
+    get_redis().set(f"{PRECOMPUTED_KEY}:{app_name}", pickle.dumps(payload), ex=ttl)
+
+
+def get_precomputed(app_name):
+    """Return the precomputed default view of a Dash app.
+
+    Parameters
+    ----------
+    app_name : str
+        Name of the DjangoDash app.
+
+    Returns
+    -------
+    dict or None
+        The stored payload, None if nothing is stored or redis is unavailable.
+
+    """
+    try:
+        payload = get_redis().get(f"{PRECOMPUTED_KEY}:{app_name}")
+    except redis.RedisError:
+        return None
+    profiling.record_cache(payload is not None)
+    if payload is None:
+        return None
+    return pickle.loads(payload)
@@ -0,0 +1,604 @@
+"""Synthetic correlator output for benchmarks and load tests.
+
+SyntheticArray generates what the correlator publishes for an array of any
+size: autocorrelations, EQ coefficients, antenna, SNAP and SNAP input
+statuses and the correlator mappings. MemoryRedis, SyntheticCorrCM and
+SyntheticMCDB stand in for the redis client, HeraCorrCM and the M&C
+database, so the ingest tasks run against it without a correlator.
+"""
+
+import fnmatch
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+from astropy.time import Time
+
+from .models import ADC_HIST_BINS
+
+# three antennas, two polarizations each, per SNAP
+INPUTS_PER_SNAP = 6
+SNAPS_PER_NODE = 4
+# frequencies of the correlator channels the autocorrelations average over
+CORR_FREQS = np.linspace(0, 250e6, 8192 + 1)[1536 : 1536 + 6144]
+SNAP_NCHAN = 1024
+N_XENGS = 16
+# samples behind each ADC histogram
+HIST_SAMPLES = 1e6
+
+
+class SyntheticArray:
+    """Reproducible correlator output of a synthetic array.
+
+    Every antpol has a fixed gain, ADC level and SNAP input, the values
+    published at a time scatter around them.
+
+    Parameters
+    ----------
+    n_ants : int
+        Number of antennas, each with an e and n polarization.
+    nchan : int
+        Channels of the autocorrelations, a divisor of 6144.
+    seed : int
+        Seed of the random generator.
+
+    """
+
+    def __init__(self, n_ants=350, nchan=1536, seed=0):
+        self.n_ants = n_ants
+        self.nchan = nchan
+        self.rng = np.random.default_rng(seed)
+        self.antpols = [(ant, pol) for ant in range(n_ants) for pol in ["e", "n"]]
+
+        # inputs are assigned to the SNAPs in antpol order
+        self.inputs = {}
+        for index, antpol in enumerate(self.antpols):
+            snap_index = index // INPUTS_PER_SNAP
+            hostname = (
+                f"heraNode{snap_index // SNAPS_PER_NODE}"
+                f"Snap{snap_index % SNAPS_PER_NODE}"
+            )
+            self.inputs[antpol] = (hostname, index % INPUTS_PER_SNAP)
+        self.hostnames = list(dict.fromkeys(host for host, _ in self.inputs.values()))
+        self.serials = {
+            hostname: f"SNPC{index:06d}"
+            for index, hostname in enumerate(self.hostnames)
+        }
+
+        self.freqs = CORR_FREQS.reshape(nchan, -1).mean(axis=1)
+        x = (self.freqs - 150e6) / 60e6
+        self.bandpass = np.exp(-(x**2)) * (1 + 0.2 * np.cos(self.freqs / 4e6))
+        n_antpols = len(self.antpols)
+        self.gains = 10 ** self.rng.uniform(5, 7, n_antpols)
+        self.eq_gains = self.rng.uniform(500, 2000, n_antpols)
+        self.adc_rms = self.rng.uniform(5, 30, n_antpols)
+
+    def autos(self):
+        """Return the autocorrelation of every antpol.
+
+        Returns
+        -------
+        dict
+            float32 spectra keyed by (ant, pol).
+
+        """
+        noise = self.rng.normal(1, 0.01, (len(self.antpols), self.nchan))
+        spectra = (noise * self.gains[:, None] * self.bandpass).astype(np.float32)
+        return dict(zip(self.antpols, spectra))
+
+    def eq_coeffs(self, index, nchan=None):
+        """Return the EQ coefficients of the antpol at index."""
+        return np.full(nchan or self.nchan, self.eq_gains[index])
+
+    def histogram(self, rms):
+        """Return ADC histogram counts of Gaussian samples with rms."""
+        density = np.exp(-0.5 * (ADC_HIST_BINS / rms) ** 2)
+        return np.rint(HIST_SAMPLES * density / density.sum()).astype(int)
+
+    def ant_status(self, time):
+        """Return the antenna statuses as parsed by HeraCorrCM.get_ant_status.
+
+        Parameters
+        ----------
+        time : datetime
+            Time of the statuses, naive UTC.
+
+        Returns
+        -------
+        dict
+            Status dictionaries keyed by "ant:pol".
+
+        """
+        statuses = {}
+        for index, (ant, pol) in enumerate(self.antpols):
+            hostname, input_number = self.inputs[(ant, pol)]
+            rms = self.adc_rms[index] * self.rng.normal(1, 0.02)
+            statuses[f"{ant}:{pol}"] = {
+                "timestamp": time,
+                "f_host": hostname,
+                "host_ant_id": input_number,
+                "adc_mean": self.rng.normal(0, 0.05),
+                "adc_rms": rms,
+                "adc_power": rms**2,
+                "histogram": self.histogram(rms),
+                "eq_coeffs": self.eq_coeffs(index),
+                "fft_of": False,
+                "pam_atten": 8,
+                "pam_power": self.rng.normal(-10, 1),
+                "pam_voltage": self.rng.normal(5, 0.05),
+                "pam_current": self.rng.normal(0.3, 0.01),
+                "pam_id": [0, 0, 0, 0, 0, 0, index // 256, index % 256],
+                "fem_voltage": self.rng.normal(6, 0.05),
+                "fem_current": self.rng.normal(0.4, 0.01),
+                "fem_id": [0, 0, 0, 0, 0, 1, index // 256, index % 256],
+                "fem_switch": "antenna",
+                "fem_lna_power": True,
+                "fem_imu_theta": self.rng.normal(90, 1),
+                "fem_imu_phi": self.rng.normal(0, 1),
+                "fem_temp": self.rng.normal(25, 2),
+            }
+        return statuses
+
+    def snap_status(self, time):
+        """Return the SNAP statuses as parsed by HeraCorrCM.get_f_status.
+
+        Parameters
+        ----------
+        time : datetime
+            Time of the statuses, naive UTC.
+
+        Returns
+        -------
+        dict
+            Status dictionaries keyed by hostname.
+
+        """
+        programmed = time - timedelta(days=1)
+        uptime = (time - programmed).total_seconds()
+        return {
+            hostname: {
+                "timestamp": time,
+                "serial": self.serials[hostname],
+                "pmb_alert": False,
+                "pps_count": int(uptime),
+                "temp": self.rng.normal(60, 2),
+                # in multiples of 500e6 ADC clocks, one per second
+                "uptime": int(uptime),
+                "last_programmed": programmed,
+            }
+            for hostname in self.hostnames
+        }
+
+    def snaprf_status(self, time):
+        """Return the SNAP input statuses as parsed by HeraCorrCM.
+
+        Parameters
+        ----------
+        time : datetime
+            Time of the statuses, naive UTC.
+
+        Returns
+        -------
+        dict
+            Status dictionaries keyed by "hostname:input", like
+            HeraCorrCM.get_snaprf_status.
+
+        """
+        freqs = np.linspace(0, 250e6, SNAP_NCHAN, endpoint=False)
+        bandpass = np.exp(-(((freqs - 150e6) / 60e6) ** 2))
+        statuses = {}
+        for index, antpol in enumerate(self.antpols):
+            hostname, input_number = self.inputs[antpol]
+            noise = self.rng.normal(1, 0.01, SNAP_NCHAN)
+            statuses[f"{hostname}:{input_number}"] = {
+                "timestamp": time,
+                "autocorrelation": noise * bandpass * self.gains[index],
+                "histogram": self.histogram(self.adc_rms[index]),
+                "eq_coeffs": self.eq_coeffs(index, SNAP_NCHAN),
+            }
+        return statuses
+
+    def corr_hashes(self, time):
+        """Return the correlator mapping hashes.
+
+        Parameters
+        ----------
+        time : datetime
+            Update time of the mappings, naive UTC.
+
+        Returns
+        -------
+        dict
+            Field dictionaries of string values keyed by the redis key.
+
+        """
+        chans_per_xeng = CORR_FREQS.size // N_XENGS
+        ant_to_snap = {}
+        snap_to_ant = {
+            hostname: [None] * INPUTS_PER_SNAP for hostname in self.hostnames
+        }
+        snap_ants = {hostname: [None] * INPUTS_PER_SNAP for hostname in self.hostnames}
+        for (ant, pol), (hostname, input_number) in self.inputs.items():
+            ant_to_snap.setdefault(str(ant), {})[pol] = {
+                "host": hostname,
+                "channel": input_number,
+            }
+            snap_to_ant[hostname][input_number] = f"{ant}{pol}"
+            snap_ants[hostname][input_number] = ant
+        return {
+            "corr:xeng_chans": {
+                str(xeng): json.dumps(
+                    list(range(xeng * chans_per_xeng, (xeng + 1) * chans_per_xeng))
+                )
+                for xeng in range(N_XENGS)
+            },
+            "corr:map": {
+                "update_time": str(Time(time, scale="utc").unix),
+                "ant_to_snap": json.dumps(ant_to_snap),
+                "snap_to_ant": json.dumps(snap_to_ant),
+            },
+            "corr:snap_ants": {
+                hostname: json.dumps(inds) for hostname, inds in snap_ants.items()
+            },
+        }
+
+    def auto_keys(self, time, autos=None):
+        """Return the autocorrelation keys as written by the correlator.
+
+        Parameters
+        ----------
+        time : datetime
+            Time of the autocorrelations, naive UTC.
+        autos : dict, optional
+            Spectra keyed by (ant, pol), new ones from autos if None.
+
+        Returns
+        -------
+        strings : dict
+            Byte string values keyed by "auto:<ant><pol>" and "auto:timestamp".
+        hashes : dict
+            The "values" field of the EQ coefficients keyed by
+            "eq:ant:<ant>:<pol>".
+
+        """
+        if autos is None:
+            autos = self.autos()
+        strings = {
+            f"auto:{ant}{pol}": spectrum.tobytes()
+            for (ant, pol), spectrum in autos.items()
+        }
+        strings["auto:timestamp"] = np.array(
+            [Time(time, scale="utc").jd], dtype=np.float64
+        ).tobytes()
+        hashes = {
+            f"eq:ant:{ant}:{pol}": {
+                "values": json.dumps(self.eq_coeffs(index).tolist())
+            }
+            for index, (ant, pol) in enumerate(self.antpols)
+        }
+        return strings, hashes
+
+    def status_hashes(self, time):
+        """Return the status hashes HeraCorrCM reads the statuses from.
+
+        Parameters
+        ----------
+        time : datetime
+            Time of the statuses, naive UTC.
+
+        Returns
+        -------
+        dict
+            Field dictionaries of string values keyed by "status:ant:<ant>:<pol>",
+            "status:snap:<hostname>" and "status:snaprf:<hostname>:<input>".
+
+        """
+        hashes = {}
+        for prefix, statuses in [
+            ("status:ant", self.ant_status(time)),
+            ("status:snap", self.snap_status(time)),
+            ("status:snaprf", self.snaprf_status(time)),
+        ]:
+            for key, status in statuses.items():
+                hashes[f"{prefix}:{key}"] = {
+                    field: _status_field(value) for field, value in status.items()
+                }
+        return hashes
+
+
+def _status_field(value):
+    """Encode a status value the way the correlator stores it in a hash."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return "None"
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    return json.dumps(value)
+
+
+# malformed values published in place of good ones
+MALFORMED_FIELDS = ["None", "Exception: simulated failure", "nan", "", "[]", "{"]
+
+
+def malform(strings, hashes, fraction, rng):
+    """Replace a fraction of the published values with malformed ones.
+
+    Autocorrelations are truncated mid-sample, hash fields are replaced by
+    missing, exception or unparsable values and some fields are dropped.
+
+    Parameters
+    ----------
+    strings : dict
+        Byte string values keyed by redis key, modified in place.
+    hashes : dict
+        Field dictionaries keyed by redis key, modified in place.
+    fraction : float
+        Probability of every value to be malformed.
+    rng : numpy Generator
+        Source of the random choices.
+
+    Returns
+    -------
+    int
+        Number of values malformed.
+
+    """
+    malformed = 0
+    for key, value in strings.items():
+        if key != "auto:timestamp" and rng.random() < fraction:
+            strings[key] = value[: len(value) // 3 + 1]
+            malformed += 1
+    for fields in hashes.values():
+        for field in list(fields):
+            if rng.random() < fraction:
+                if rng.random() < 0.2:
+                    del fields[field]
+                else:
+                    fields[field] = rng.choice(MALFORMED_FIELDS)
+                malformed += 1
+    return malformed
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class MemoryRedis:
+    """An in-process stand-in for the part of the redis client used here.
+
+    Parameters
+    ----------
+    decode_responses : bool
+        Return values as str instead of bytes, like the redis client.
+
+    """
+
+    def __init__(self, decode_responses=False):
+        self.decode_responses = decode_responses
+        self._data = {}
+
+    def decoded(self):
+        """Return a view of the same data decoding responses to str."""
+        view = MemoryRedis(decode_responses=True)
+        view._data = self._data
+        return view
+
+    @staticmethod
+    def _name(name):
+        # redis treats str, bytes and number key and field names alike
+        return name.decode() if isinstance(name, bytes) else str(name)
+
+    def _decode(self, value):
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Nothing to close."""
+
+    def get(self, name):
+        """Return the value of a string key, None if missing."""
+        value = self._data.get(self._name(name))
+        return self._decode(value) if isinstance(value, bytes) else None
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def set(self, name, value, ex=None, **kwargs):
+        """Set a string key, expiry is ignored."""
+        self._data[self._name(name)] = _encode(value)
+        return True
+
+    def delete(self, *names):
+        """Remove keys, return the number removed."""
+        return sum(self._data.pop(self._name(name), None) is not None for name in names)
+
+    def exists(self, *names):
+        """Return the number of names which exist."""
+        return sum(self._name(name) in self._data for name in names)
+
+    def type(self, name):
+        """Return the type of a key, b"none" if missing."""
+        value = self._data.get(self._name(name))
+        if value is None:
+            key_type = b"none"
+        elif isinstance(value, dict):
+            key_type = b"hash"
+        else:
+            key_type = b"string"
+        return self._decode(key_type)
+
+    def keys(self, pattern="*"):
+        """Return the keys matching a glob pattern."""
+        return [
+            self._decode(_encode(name))
+            for name in list(self._data)
+            if fnmatch.fnmatchcase(name, pattern)
+        ]
+
+    def scan_iter(self, match="*", **kwargs):
+        """Iterate over the keys matching a glob pattern."""
+        return iter(self.keys(match))
+
+    def hget(self, name, key):
+        """Return a field of a hash, None if missing."""
+        value = self._data.get(self._name(name))
+        if not isinstance(value, dict):
+            return None
+        return self._decode(value.get(self._name(key)))
+
+    def hgetall(self, name):
+        """Return every field of a hash."""
+        value = self._data.get(self._name(name))
+        if not isinstance(value, dict):
+            return {}
+        return {
+            self._decode(_encode(key)): self._decode(field)
+            for key, field in value.items()
+        }
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        """Set fields of a hash, return the number of new fields."""
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        stored = self._data.setdefault(self._name(name), {})
+        added = sum(self._name(key) not in stored for key in fields)
+        stored.update(
+            {self._name(key): _encode(value) for key, value in fields.items()}
+        )
+        return added
+
+    def hincrby(self, name, key, amount=1):
+        """Increment an integer field of a hash."""
+        value = int(self.hget(name, key) or 0) + amount
+        self.hset(name, key, value)
+        return value
+
+    def hincrbyfloat(self, name, key, amount=1.0):
+        """Increment a float field of a hash."""
+        value = float(self.hget(name, key) or 0) + amount
+        self.hset(name, key, value)
+        return value
+
+    def publish(self, channel, message):
+        """Nobody listens, return the number of receivers."""
+        return 0
+
+    def pipeline(self, transaction=True):
+        """Return a pipeline running the queued commands on execute."""
+        return _Pipeline(self)
+
+    def lock(self, name, timeout=None, **kwargs):
+        """Return a lock, shared by the users of this instance."""
+        return _Lock(self, name)
+
+
+class _Pipeline:
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((getattr(self._client, name), args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+class _Lock:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def acquire(self, blocking=True, **kwargs):
+        # setdefault is atomic, so threads sharing the client race safely
+        token = f"{id(self)}:{threading.get_ident()}".encode()
+        return self._client._data.setdefault(self._name, token) is token
+
+    def release(self):
+        self._client._data.pop(self._name, None)
+
+
+class SyntheticCorrCM:
+    """A HeraCorrCM stand-in returning the statuses of a synthetic array.
+
+    Parameters
+    ----------
+    array : SyntheticArray
+        The array reported on.
+    time : datetime
+        Time of the statuses, naive UTC.
+    redis : MemoryRedis
+        Store holding the correlator mapping hashes, read through the
+        ``r`` attribute like the redis client of HeraCorrCM.
+
+    """
+
+    def __init__(self, array, time, redis):
+        self.array = array
+        self.time = time
+        self.r = redis.decoded()
+
+    def get_ant_status(self):
+        """Return the antenna statuses keyed by "ant:pol"."""
+        return self.array.ant_status(self.time)
+
+    def get_f_status(self):
+        """Return the SNAP statuses keyed by hostname."""
+        return self.array.snap_status(self.time)
+
+    def get_snaprf_status(self):
+        """Return the SNAP input statuses keyed by "hostname:input"."""
+        return self.array.snaprf_status(self.time)
+
+
+class SyntheticMCDB:
+    """An M&C database stand-in answering the SNAP lookups of the ingest tasks.
+
+    Parameters
+    ----------
+    array : SyntheticArray
+        The array whose SNAP serial numbers are looked up.
+
+    """
+
+    def __init__(self, array):
+        self._locations = {}
+        for hostname, serial in array.serials.items():
+            index = array.hostnames.index(hostname)
+            self._locations[serial] = (
+                index // SNAPS_PER_NODE,
+                index % SNAPS_PER_NODE,
+            )
+
+    @contextmanager
+    def sessionmaker(self):
+        """Yield a session, the database itself answers the lookups."""
+        yield self
+
+    def _get_node_snap_from_serial(self, serial):
+        """Return the node and SNAP location number of a SNAP serial number."""
+        return self._locations.get(serial, (None, None))
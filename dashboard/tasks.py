@@ -17,6 +17,7 @@ from astropy import coordinates
 from astropy.time import Time
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.db import transaction
 from django.utils import dateparse, timezone
 from hera_corr_cm import HeraCorrCM
 from hera_mc import cm_hookup, cm_partconnect, cm_sysdef, cm_sysutils, cm_utils, mc
@@ -26,30 +27,53 @@ from pyuvdata import get_telescope
 from sqlalchemy import and_, func, or_
 
 from dashboard.models import (
+    ADC_HIST_BINS,
     Antenna,
+    AntennaConfiguration,
+    AntennaMeasurement,
     AntennaStatus,
     AntToSnap,
     AprioriStatus,
     AutoSpectra,
     CommissioningIssue,
+    CorrMapping,
+    EqCoeffSet,
     HookupNotes,
     SnapSpectra,
     SnapStatus,
     SnapToAnt,
+    SpectraMetrics,
     XengChannels,
+    parse_snap_hostname,
 )
+from dashboard.dash_apps import adchists, autospectra, hex_plot, node_plot, snapspectra
+from dashboard.store import (
+    format_data_version,
+    get_precomputed,
+    get_redis,
+    publish_data_version,
+    set_precomputed,
+)
+from dashboard import metrics, rollups, shared_snapshot, waterfall
 from heranow import settings
 
 logger = get_task_logger(__name__)
 
+PRECOMPUTE_PENDING_KEY = "heranow:precompute:pending"
+PRECOMPUTE_LOCK_KEY = "heranow:precompute:lock"
+# seconds a scheduled precompute waits for the other ingest tasks of a minute
+PRECOMPUTE_DELAY = 10
+
 
 @shared_task
+@metrics.track_task
 def get_autospectra_from_redis():
     """Get autospectra from redis and add new correlations to database."""
     redis_pool = redis.ConnectionPool(host="redishost", port=6379)
     with redis.Redis(connection_pool=redis_pool) as rsession:
         for antenna in Antenna.objects.all():
-            d = rsession.get(f"auto:{antenna.ant_number:d}{antenna.polarization:s}")
+            with metrics.timed_redis():
+                d = rsession.get(f"auto:{antenna.ant_number:d}{antenna.polarization:s}")
             if d is not None:
                 auto = np.frombuffer(d, dtype=np.float32).copy()
                 break
@@ -65,14 +89,19 @@ def get_autospectra_from_redis():
         # average over channels
         freqs = frange.reshape(NCHANS, NCHAN_SUM).sum(axis=1) / NCHAN_SUM
 
-        timestamp = np.frombuffer(rsession["auto:timestamp"], dtype=np.float64)[0]
+        with metrics.timed_redis():
+            timestamp = rsession["auto:timestamp"]
+        timestamp = np.frombuffer(timestamp, dtype=np.float64)[0]
         timestamp = Time(timestamp, format="jd")
         timestamp = timezone.make_aware(timestamp.datetime)
         print(f"AUTOSPECTRA last timestamp: {timestamp}")
 
         spectra = []
+        spectra_eq_coeffs = []
+        spectra_autos = []
         for antenna in Antenna.objects.all():
-            d = rsession.get(f"auto:{antenna.ant_number:d}{antenna.polarization:s}")
+            with metrics.timed_redis():
+                d = rsession.get(f"auto:{antenna.ant_number:d}{antenna.polarization:s}")
             if d is not None:
                 auto = np.frombuffer(d, dtype=np.float32)[0:NCHANS].copy()
 
@@ -86,10 +115,11 @@ def get_autospectra_from_redis():
                     ),
                     350,
                 )
-                eq_coeffs = rsession.hget(
-                    f"eq:ant:{antenna.ant_number:d}:{antenna.polarization:s}",
-                    "values",
-                )
+                with metrics.timed_redis():
+                    eq_coeffs = rsession.hget(
+                        f"eq:ant:{antenna.ant_number:d}:{antenna.polarization:s}",
+                        "values",
+                    )
                 if eq_coeffs is not None:
                     eq_coeffs = np.fromstring(
                         eq_coeffs.decode("utf-8").strip("[]"), sep=","
@@ -104,36 +134,312 @@ def get_autospectra_from_redis():
                     spectra=auto.tolist(),
                     frequencies=freqs.tolist(),
                     time=timestamp,
-                    eq_coeffs=eq_coeffs.tolist(),
                     frequencies_downsampled=downsampled[:, 0].tolist(),
                     spectra_downsampled=downsampled[:, 1].tolist(),
                 )
                 spectra.append(auto_spectra)
-
-        AutoSpectra.objects.bulk_create(spectra, ignore_conflicts=True)
+                spectra_eq_coeffs.append(eq_coeffs)
+                spectra_autos.append(auto)
+
+        _assign_eq_coeff_sets(spectra, spectra_eq_coeffs)
+        metrics.bulk_create(AutoSpectra, spectra, ignore_conflicts=True)
+        metrics.bulk_create(
+            SpectraMetrics,
+            _spectra_metrics(spectra, spectra_autos, spectra_eq_coeffs, freqs),
+            ignore_conflicts=True,
+        )
+        try:
+            waterfall.append_spectra(
+                timestamp,
+                [
+                    f"{row.antenna.ant_number}{row.antenna.polarization}"
+                    for row in spectra
+                ],
+                spectra_autos,
+                freqs,
+                all_antpols=[
+                    f"{ant_number}{pol}"
+                    for ant_number, pol in Antenna.objects.values_list(
+                        "ant_number", "polarization"
+                    )
+                ],
+            )
+        except Exception as e:  # noqa
+            print(f"Unable to append autospectra to the waterfall buffer. {e}")
+            metrics.count_failure("waterfall")
+        try:
+            _publish_autospectra_snapshot(timestamp, spectra, spectra_autos, freqs)
+        except Exception as e:  # noqa
+            print(f"Unable to publish the shared autospectra snapshot. {e}")
+            metrics.count_failure("shared_snapshot")
+    publish_data_version("autospectra")
+    _schedule_precompute()
     return
 
 
+def _publish_autospectra_snapshot(timestamp, rows, autos, freqs):
+    """Share the latest autospectra with the web workers as mapped arrays.
+
+    The spectra are published as power in dB and 4-bit RMS, ready to plot.
+
+    Parameters
+    ----------
+    timestamp : datetime
+        Time of the autospectra.
+    rows : list
+        The AutoSpectra objects of the snapshot.
+    autos : list of numpy arrays
+        The autocorrelation of each row, all of the same length.
+    freqs : numpy array
+        Frequency of each channel in Hz.
+
+    """
+    if len(rows) == 0:
+        return
+    # converted once here instead of in every web worker
+    power, rms = autospectra.power_rms(autos)
+    d_power, d_rms = autospectra.power_rms([row.spectra_downsampled for row in rows])
+    shared_snapshot.publish_snapshot(
+        "autospectra",
+        {
+            "freqs_mhz": np.asarray(freqs, dtype=np.float64) / 1e6,
+            "power": power.astype(np.float32),
+            "rms": rms.astype(np.float32),
+            "freqs_downsampled_mhz": np.asarray(
+                [row.frequencies_downsampled for row in rows], dtype=np.float64
+            )
+            / 1e6,
+            "power_downsampled": d_power.astype(np.float32),
+            "rms_downsampled": d_rms.astype(np.float32),
+        },
+        {
+            "time": timestamp.isoformat(),
+            "antennas": [
+                [row.antenna_id, row.antenna.ant_number, row.antenna.polarization]
+                for row in rows
+            ],
+        },
+    )
+
+
+def _spectra_metrics(rows, autos, eq_coeffs, freqs):
+    """Compute the SpectraMetrics of a snapshot of autocorrelations.
+
+    The metrics of every antpol are computed together on the
+    (n_antpol, n_chan) matrix of spectra.
+
+    Parameters
+    ----------
+    rows : list
+        The AutoSpectra objects of the snapshot.
+    autos : list of numpy arrays
+        The autocorrelation of each row, all of the same length.
+    eq_coeffs : list of numpy arrays
+        The EQ coefficients of each row.
+    freqs : numpy array
+        Frequency of each channel in Hz, increasing.
+
+    Returns
+    -------
+    list
+        Unsaved SpectraMetrics objects, one per row.
+
+    """
+    if len(rows) == 0:
+        return []
+    median_eq = np.array([np.median(coeffs) for coeffs in eq_coeffs])
+    spectra = np.ma.masked_invalid(
+        np.asarray(autos, dtype=np.float64) / median_eq[:, None] ** 2
+    )
+
+    band_width = settings.SPECTRA_BAND_WIDTH_MHZ
+    freqs_mhz = np.asarray(freqs) / 1e6
+    band_start = np.floor(freqs_mhz[0] / band_width) * band_width
+    band_index = ((freqs_mhz - band_start) // band_width).astype(int)
+    # (n_chan, n_band) channel membership, sums over channels become a matmul
+    in_band = band_index[:, None] == np.arange(band_index[-1] + 1)
+    band_sum = spectra.filled(0) @ in_band
+    band_count = (~np.ma.getmaskarray(spectra)).astype(float) @ in_band
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_db = (10 * np.log10(spectra)).filled(-100).mean(axis=1)
+        band_power = 10 * np.log10(np.ma.masked_invalid(band_sum / band_count))
+
+    return [
+        SpectraMetrics(
+            antenna=row.antenna,
+            time=row.time,
+            mean_db=float(mean),
+            median_eq=float(median),
+            band_start=float(band_start),
+            band_width=float(band_width),
+            band_power=[
+                None if np.ma.is_masked(power) else float(power) for power in powers
+            ],
+        )
+        for row, mean, median, powers in zip(rows, mean_db, median_eq, band_power)
+    ]
+
+
+def _assign_eq_coeff_sets(rows, eq_coeffs):
+    """Point each row at the EqCoeffSet holding its EQ coefficients.
+
+    Coefficients are identified by their content hash, only sets which
+    are not in the database yet are inserted.
+
+    Parameters
+    ----------
+    rows : list
+        Unsaved AutoSpectra, AntennaMeasurement or SnapSpectra objects.
+    eq_coeffs : list
+        The EQ coefficients of each row, None where unknown.
+
+    """
+    new_sets = {}
+    for row, coeffs in zip(rows, eq_coeffs):
+        if coeffs is None:
+            row.eq_coeff_set_id = None
+            continue
+        content_hash = EqCoeffSet.hash_coeffs(coeffs)
+        row.eq_coeff_set_id = content_hash
+        eq_set = new_sets.get(content_hash)
+        if eq_set is None:
+            new_sets[content_hash] = EqCoeffSet(
+                content_hash=content_hash,
+                coeffs=np.asarray(coeffs, dtype=np.float64).tolist(),
+                first_seen=row.time,
+            )
+        elif row.time < eq_set.first_seen:
+            eq_set.first_seen = row.time
+
+    existing = EqCoeffSet.objects.filter(content_hash__in=list(new_sets)).values_list(
+        "content_hash", flat=True
+    )
+    for content_hash in existing:
+        del new_sets[content_hash]
+    metrics.bulk_create(EqCoeffSet, new_sets.values(), ignore_conflicts=True)
+
+
+def _assign_antenna_configurations(measurements, configurations):
+    """Point each measurement at the configuration interval it belongs to.
+
+    The latest interval of an antenna is extended to the measurement time
+    while its configuration is unchanged, otherwise a new interval starting
+    at the measurement time is inserted.
+
+    Parameters
+    ----------
+    measurements : list
+        Unsaved AntennaMeasurement objects.
+    configurations : list
+        Unsaved AntennaConfiguration objects with the configuration
+        reported alongside each measurement.
+
+    """
+    latest = {
+        config.antenna_id: config
+        for config in AntennaConfiguration.objects.filter(
+            antenna_id__in={config.antenna_id for config in configurations}
+        )
+        .order_by("antenna", "-valid_from")
+        .distinct("antenna")
+    }
+    extended = {}
+    new_configs = []
+    for measurement, config in zip(measurements, configurations):
+        current = latest.get(config.antenna_id)
+        if (
+            current is not None
+            and current.same_configuration(config)
+            and current.valid_from <= measurement.time
+        ):
+            if measurement.time > current.valid_to:
+                current.valid_to = measurement.time
+                extended[current.pk] = current
+            measurement.configuration_id = current.pk
+            continue
+        new_configs.append((measurement, config))
+
+    AntennaConfiguration.objects.bulk_update(extended.values(), ["valid_to"])
+    # postgres returns the primary keys of the created rows
+    metrics.bulk_create(AntennaConfiguration, [config for _, config in new_configs])
+    for measurement, config in new_configs:
+        measurement.configuration_id = config.pk
+
+
+def _assign_adc_health_stats(measurements):
+    """Derive the ADC health statistics of each measurement from its histogram.
+
+    The statistics of all inputs are computed together on the
+    (n_input, n_bin) matrix of histogram counts.
+
+    Parameters
+    ----------
+    measurements : list
+        Unsaved AntennaMeasurement objects, those without adc_hist_counts
+        are left unchanged.
+
+    """
+    with_hist = [row for row in measurements if row.adc_hist_counts is not None]
+    if len(with_hist) == 0:
+        return
+    counts = np.asarray([row.adc_hist_counts for row in with_hist], dtype=np.float64)
+    total = counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prob = counts / total[:, None]
+        # samples at the ends of the ADC range
+        clip_fraction = (counts[:, 0] + counts[:, -1]) / total
+        entropy = -np.where(prob > 0, prob * np.log2(prob), 0).sum(axis=1)
+        entropy[total == 0] = np.nan
+
+        mean = prob @ ADC_HIST_BINS
+        offsets = ADC_HIST_BINS[None, :] - mean[:, None]
+        variance = (prob * offsets**2).sum(axis=1)
+        skewness = (prob * offsets**3).sum(axis=1) / variance**1.5
+        kurtosis = (prob * offsets**4).sum(axis=1) / variance**2 - 3
+
+    for row, stats in zip(with_hist, zip(clip_fraction, entropy, kurtosis, skewness)):
+        stats = [float(stat) if np.isfinite(stat) else None for stat in stats]
+        (
+            row.adc_clip_fraction,
+            row.adc_effective_bits,
+            row.adc_kurtosis,
+            row.adc_asymmetry,
+        ) = stats
+
+
+def _adc_hist_counts(histogram):
+    """Reduce an ADC histogram from redis to its counts on ADC_HIST_BINS.
+
+    Histograms arrive either as counts only or as [bins, counts].
+    Returns None for histograms which do not match the standard bins.
+    """
+    if histogram is None:
+        return None
+    histogram = np.asarray(histogram)
+    if histogram.shape == ADC_HIST_BINS.shape:
+        return histogram.astype(int).tolist()
+    if histogram.shape == (2, ADC_HIST_BINS.size) and np.array_equal(
+        histogram[0], ADC_HIST_BINS
+    ):
+        return histogram[1].astype(int).tolist()
+    return None
+
+
 @shared_task
+@metrics.track_task
 def get_snap_spectra_from_redis():
     """Get snap spectra from redis and add to database."""
-    bins = np.arange(-128, 127)
     corr_cm = HeraCorrCM(redishost="redishost", logger=logger)
-    snap_spectra = corr_cm.get_snaprf_status()
+    with metrics.timed_redis():
+        snap_spectra = corr_cm.get_snaprf_status()
     spectra_list = []
+    spectra_eq_coeffs = []
     for snap_key, stats in snap_spectra.items():
         for key in stats:
             if isinstance(stats[key], np.ndarray):
                 stats[key] = stats[key].tolist()
             if stats[key] == "None":
                 stats[key] = None
-            if key == "histogram" and stats[key] is not None:
-                if np.size(stats[key]) == 255:
-                    stats[key] = np.asarray([bins, stats["histogram"]]).tolist()
-                elif np.shape(stats[key]) == 2 and len(stats[key][0]) != len(
-                    stats[key][1]
-                ):
-                    stats[key] = None
         hostname, input_number = snap_key.split(":")
 
         timestamp = stats["timestamp"]
@@ -146,29 +452,38 @@ def get_snap_spectra_from_redis():
             continue
 
         try:
+            node, snap = parse_snap_hostname(hostname)
             spectra = SnapSpectra(
                 hostname=hostname,
+                node=node,
+                snap=snap,
                 input_number=input_number,
                 time=timestamp,
                 spectra=stats["autocorrelation"],
-                eq_coeffs=stats["eq_coeffs"],
-                adc_hist=stats["histogram"],
+                adc_hist_counts=_adc_hist_counts(stats["histogram"]),
             )
         except:  # noqa
             print(f"Error processing Snap {snap_key}")
+            metrics.count_failure("snap_spectra")
             continue
         spectra_list.append(spectra)
+        spectra_eq_coeffs.append(stats["eq_coeffs"])
 
-    SnapSpectra.objects.bulk_create(spectra_list, ignore_conflicts=True)
+    _assign_eq_coeff_sets(spectra_list, spectra_eq_coeffs)
+    metrics.bulk_create(SnapSpectra, spectra_list, ignore_conflicts=True)
+    publish_data_version("snap_spectra")
+    _schedule_precompute()
     return
 
 
 @shared_task
+@metrics.track_task
 def get_snap_status_from_redis():
     """Get snap status from redis and add to database."""
     corr_cm = HeraCorrCM(redishost="redishost", logger=logger)
 
-    snap_status = corr_cm.get_f_status()
+    with metrics.timed_redis():
+        snap_status = corr_cm.get_f_status()
 
     db = mc.connect_to_mc_db(None)
 
@@ -218,14 +533,18 @@ def get_snap_status_from_redis():
                 )
             except Exception as err:
                 print(f"Error with snap {key}. {err}")
+                metrics.count_failure("snap_status")
                 continue
 
             snaps.append(snap)
-        SnapStatus.objects.bulk_create(snaps, ignore_conflicts=True)
+        metrics.bulk_create(SnapStatus, snaps, ignore_conflicts=True)
+    publish_data_version("snap_status")
+    _schedule_precompute()
     return
 
 
 @shared_task
+@metrics.track_task
 def update_hookup_notes():
     """Read hookup notes from M&C and add new notes to database."""
     db = mc.connect_to_mc_db(None)
@@ -268,17 +587,21 @@ def update_hookup_notes():
                         )
                     )
 
-        HookupNotes.objects.bulk_create(notes, ignore_conflicts=True)
+        metrics.bulk_create(HookupNotes, notes, ignore_conflicts=True)
+    publish_data_version("hookup_notes")
     return
 
 
 @shared_task
+@metrics.track_task
 def get_antenna_status_from_redis():
     """Get antenna status from redis and add new statuses to database."""
-    bins = np.arange(-128, 127)
     corr_cm = HeraCorrCM(redishost="redishost", logger=logger)
-    ant_stats = corr_cm.get_ant_status()
+    with metrics.timed_redis():
+        ant_stats = corr_cm.get_ant_status()
     bulk_add = []
+    bulk_configurations = []
+    bulk_eq_coeffs = []
     for antpol, stats in ant_stats.items():
         try:
             antenna = Antenna.objects.get(
@@ -295,13 +618,6 @@ def get_antenna_status_from_redis():
                     stats[key] = None
                 if isinstance(stats[key], np.ndarray):
                     stats[key] = stats[key].tolist()
-                if key == "histogram" and stats[key] is not None:
-                    if np.size(stats[key]) == 255:
-                        stats[key] = np.asarray([bins, stats["histogram"]]).tolist()
-                    elif np.shape(stats[key]) == 2 and len(stats[key][0]) != len(
-                        stats[key][1]
-                    ):
-                        stats[key] = None
                 if key == "fem_switch" and (
                     stats[key] == "null" or stats[key] == "Unknown mode"
                 ):
@@ -328,40 +644,56 @@ def get_antenna_status_from_redis():
             else:
                 timestamp = dateparse.parse_datetime(timestamp + "Z")
 
-            antenna_status = AntennaStatus(
+            measurement = AntennaMeasurement(
                 antenna=antenna,
                 time=timestamp,
-                snap_hostname=stats["f_host"],
-                snap_channel_number=stats["host_ant_id"],
                 adc_mean=stats["adc_mean"],
                 adc_rms=stats["adc_rms"],
                 adc_power=stats["adc_power"],
-                pam_atten=stats["pam_atten"],
                 pam_power=stats["pam_power"],
                 pam_voltage=stats["pam_voltage"],
                 pam_current=stats["pam_current"],
-                pam_id=pam_id,
                 fem_voltage=stats["fem_voltage"],
                 fem_current=stats["fem_current"],
-                fem_id=fem_id,
                 fem_imu=[stats["fem_imu_theta"], stats["fem_imu_phi"]],
                 fem_temp=stats["fem_temp"],
+                fft_overflow=stats["fft_of"],
+                adc_hist_counts=_adc_hist_counts(stats["histogram"]),
+            )
+            node, snap = parse_snap_hostname(stats["f_host"])
+            configuration = AntennaConfiguration(
+                antenna=antenna,
+                valid_from=timestamp,
+                valid_to=timestamp,
+                snap_hostname=stats["f_host"],
+                node=node,
+                snap=snap,
+                snap_channel_number=stats["host_ant_id"],
+                pam_atten=stats["pam_atten"],
+                pam_id=pam_id,
+                fem_id=fem_id,
                 fem_lna_power=stats["fem_lna_power"],
                 fem_switch=fem_switch,
-                fft_overflow=stats["fft_of"],
-                eq_coeffs=stats["eq_coeffs"],
-                adc_hist=stats["histogram"],
             )
         except Exception as e:  # noqa
             print(f"Error processing Antenna {antpol}. {e}")
+            metrics.count_failure("antenna_status")
             continue
-        bulk_add.append(antenna_status)
-
-    AntennaStatus.objects.bulk_create(bulk_add, ignore_conflicts=True)
+        bulk_add.append(measurement)
+        bulk_configurations.append(configuration)
+        bulk_eq_coeffs.append(stats["eq_coeffs"])
+
+    _assign_eq_coeff_sets(bulk_add, bulk_eq_coeffs)
+    _assign_antenna_configurations(bulk_add, bulk_configurations)
+    _assign_adc_health_stats(bulk_add)
+    metrics.bulk_create(AntennaMeasurement, bulk_add, ignore_conflicts=True)
+    publish_data_version("antenna_status")
+    _schedule_precompute()
     return
 
 
 @shared_task
+@metrics.track_task
 def update_constructed_antennas():
     """Check antennas marked as constructed and update database."""
     db = mc.connect_to_mc_db(None)
@@ -410,6 +742,68 @@ def update_constructed_antennas():
                 bulk_add.append(ant)
 
     Antenna.objects.bulk_update(bulk_add, ["constructed"])
+    publish_data_version("antennas")
+    _schedule_precompute()
+
+
+def _schedule_precompute():
+    """Schedule a precompute of the dashboards unless one is already pending.
+
+    Every ingest task schedules one after publishing its data, the run is
+    delayed by PRECOMPUTE_DELAY so the tasks of the same minute share it.
+    """
+    try:
+        pending = get_redis().set(
+            PRECOMPUTE_PENDING_KEY, 1, nx=True, ex=PRECOMPUTE_DELAY * 30
+        )
+    except redis.RedisError as err:
+        logger.warning(f"Unable to check for a pending precompute. {err}")
+        pending = True
+    if pending:
+        precompute_dashboards.apply_async(countdown=PRECOMPUTE_DELAY)
+
+
+@shared_task
+@metrics.track_task
+def precompute_dashboards():
+    """Precompute the default view of the dashboards after new data arrives.
+
+    The views are stored in the shared redis store and embedded directly in
+    the layout of each app, so the first paint of a page needs no database
+    work. Only one run at a time builds the views, a run scheduled while
+    another is in progress is postponed until it is done.
+    """
+    rsession = get_redis()
+    lock = rsession.lock(PRECOMPUTE_LOCK_KEY, timeout=600)
+    try:
+        if not lock.acquire(blocking=False):
+            precompute_dashboards.apply_async(countdown=PRECOMPUTE_DELAY)
+            return
+        # data published from now on needs another run
+        rsession.delete(PRECOMPUTE_PENDING_KEY)
+    except redis.RedisError as err:
+        logger.warning(f"Unable to lock the dashboard precompute. {err}")
+        lock = None
+
+    try:
+        for app in [autospectra, hex_plot, node_plot, adchists, snapspectra]:
+            data_version = format_data_version(app.data_sources)
+            precomputed = get_precomputed(app.app_name)
+            if precomputed is not None and precomputed["data_version"] == data_version:
+                continue
+            try:
+                set_precomputed(app.app_name, app.precompute(data_version))
+            except Exception as e:  # noqa
+                logger.exception(f"Error precomputing {app.app_name}. {e}")
+                metrics.count_failure("precompute")
+    finally:
+        if lock is not None:
+            try:
+                lock.release()
+            except redis.RedisError:
+                # the lock expires on its own
+                pass
+    return
 
 
 def get_mc_apriori(handling, antenna):
@@ -451,6 +845,7 @@ def get_mc_apriori(handling, antenna):
 
 
 @shared_task
+@metrics.track_task
 def update_apriori():
     """Get most recent Apriori status for each Antenna and update database."""
     db = mc.connect_to_mc_db(None)
@@ -488,11 +883,14 @@ def update_apriori():
                             ],
                         )
                     )
-        AprioriStatus.objects.bulk_create(a_stats, ignore_conflicts=True)
+        metrics.bulk_create(AprioriStatus, a_stats, ignore_conflicts=True)
+    publish_data_version("apriori")
+    _schedule_precompute()
     return
 
 
 @shared_task
+@metrics.track_task
 def update_issue_log():
     """Query Github for all Daily Log issues updated in the last 6 hours."""
     key = settings.GITHUB_APP_KEY
@@ -562,6 +960,7 @@ def update_issue_log():
 
 
 @shared_task
+@metrics.track_task
 def replot_radiosky():
     """Calculate current sidereal time and plot sky over HERA."""
     radio_map = healpy.read_map(os.path.join(settings.BASE_DIR, "test4.fits"))
@@ -667,6 +1066,7 @@ def replot_radiosky():
 
 
 @shared_task
+@metrics.track_task
 def update_hookup():
     """Get most recent hookup notes from M&C."""
     db = mc.connect_to_mc_db(None)
@@ -695,11 +1095,63 @@ def update_hookup():
         )
 
 
+def _store_corr_mapping(model, rows, update_time):
+    """Store a correlator mapping if it differs from the current one.
+
+    An unchanged mapping only moves the update_time of the current
+    CorrMapping version forward. A changed mapping closes the current
+    version and stores the rows under a new one.
+
+    Parameters
+    ----------
+    model : XengChannels, AntToSnap or SnapToAnt
+        The mapping model the rows belong to.
+    rows : list
+        Unsaved rows of the complete mapping read from redis.
+    update_time : datetime
+        Correlator update time of the mapping.
+
+    Returns
+    -------
+    bool
+        True if a new version was stored.
+
+    """
+    content_hash = CorrMapping.hash_content(row.content_key() for row in rows)
+    current = CorrMapping.objects.filter(
+        kind=model.mapping_kind, valid_to__isnull=True
+    ).first()
+    if current is not None and current.content_hash == content_hash:
+        if update_time > current.update_time:
+            current.update_time = update_time
+            current.save(update_fields=["update_time"])
+        return False
+
+    with transaction.atomic():
+        valid_from = update_time
+        if current is not None:
+            valid_from = max(update_time, current.valid_from)
+            current.valid_to = valid_from
+            current.save(update_fields=["valid_to"])
+        mapping = CorrMapping.objects.create(
+            kind=model.mapping_kind,
+            content_hash=content_hash,
+            update_time=update_time,
+            valid_from=valid_from,
+        )
+        for row in rows:
+            row.mapping = mapping
+        metrics.bulk_create(model, rows)
+    return True
+
+
 @shared_task
+@metrics.track_task
 def update_xengs():
     """Grab Xeng configuration from redis."""
     corr_cm = HeraCorrCM(redishost="redishost", logger=logger)
-    xeng_chan_mapping = corr_cm.r.hgetall("corr:xeng_chans")
+    with metrics.timed_redis():
+        xeng_chan_mapping = corr_cm.r.hgetall("corr:xeng_chans")
     bulk_objects = []
     xeng_time = timezone.make_aware(datetime.now())
     for xeng, chans in xeng_chan_mapping.items():
@@ -712,17 +1164,22 @@ def update_xengs():
                 chans=chans,
             )
         )
-    XengChannels.objects.bulk_create(bulk_objects, ignore_conflicts=True)
+    if _store_corr_mapping(XengChannels, bulk_objects, xeng_time):
+        publish_data_version("corr_map")
     return
 
 
 @shared_task
+@metrics.track_task
 def update_ant_to_snap():
     """Get ant to snap mapping from redis."""
     corr_cm = HeraCorrCM(redishost="redishost", logger=logger)
-    corr_map = corr_cm.r.hgetall("corr:map")
+    with metrics.timed_redis():
+        corr_map = corr_cm.r.hgetall("corr:map")
 
-    update_time = Time(float(corr_map["update_time"]), format="unix").datetime
+    update_time = timezone.make_aware(
+        Time(float(corr_map["update_time"]), format="unix").datetime
+    )
 
     ant_to_snap = json.loads(corr_map["ant_to_snap"])
     bulk_objects = []
@@ -736,26 +1193,32 @@ def update_ant_to_snap():
             antenna = Antenna.objects.get(ant_number=ant, polarization=p)
             bulk_objects.append(
                 AntToSnap(
-                    time=timezone.make_aware(update_time),
+                    time=update_time,
                     antenna=antenna,
                     snap_hostname=host,
                     chan=chan,
                 )
             )
-    AntToSnap.objects.bulk_create(bulk_objects, ignore_conflicts=True)
+    if _store_corr_mapping(AntToSnap, bulk_objects, update_time):
+        publish_data_version("corr_map")
     return
 
 
 @shared_task
+@metrics.track_task
 def update_snap_to_ant():
     """Get snap to ant mapping from redis."""
     corr_cm = HeraCorrCM(redishost="redishost", logger=logger)
-    corr_map = corr_cm.r.hgetall("corr:map")
+    with metrics.timed_redis():
+        corr_map = corr_cm.r.hgetall("corr:map")
 
-    update_time = Time(float(corr_map["update_time"]), format="unix").datetime
+    update_time = timezone.make_aware(
+        Time(float(corr_map["update_time"]), format="unix").datetime
+    )
 
     snap_to_ant = json.loads(corr_map["snap_to_ant"])
-    snap_to_ant_inds = corr_cm.r.hgetall("corr:snap_ants")
+    with metrics.timed_redis():
+        snap_to_ant_inds = corr_cm.r.hgetall("corr:snap_ants")
     bulk_objects = []
     for host in sorted(snap_to_ant):
         ants = [a or "N/A" for a in snap_to_ant[host]]
@@ -764,17 +1227,11 @@ def update_snap_to_ant():
         except KeyError:
             ant_inds = None
 
-        match = re.search(r"heraNode(?P<node>\d+)Snap(?P<snap>\d+)", host)
-        if match is not None:
-            node = int(match.group("node"))
-            snap = int(match.group("snap"))
-        else:
-            node = None
-            snap = None
+        node, snap = parse_snap_hostname(host)
 
         bulk_objects.append(
             SnapToAnt(
-                time=timezone.make_aware(update_time),
+                time=update_time,
                 snap_hostname=host,
                 node=node,
                 snap=snap,
@@ -783,11 +1240,13 @@ def update_snap_to_ant():
             )
         )
 
-    SnapToAnt.objects.bulk_create(bulk_objects, ignore_conflicts=True)
+    if _store_corr_mapping(SnapToAnt, bulk_objects, update_time):
+        publish_data_version("corr_map")
     return
 
 
 @shared_task
+@metrics.track_task
 def antenna_stats_to_csv():
     """Turn antenna stats to csv for hera lights board."""
     df = []
@@ -795,9 +1254,12 @@ def antenna_stats_to_csv():
     # a shorter variable to help with the text section
     last_spectra = AutoSpectra.objects.last()
     if last_spectra is not None:
-        all_spectra = AutoSpectra.objects.filter(time=last_spectra.time)
+        all_metrics = {
+            spectra_metrics.antenna_id: spectra_metrics
+            for spectra_metrics in SpectraMetrics.objects.filter(time=last_spectra.time)
+        }
     else:
-        all_spectra = None
+        all_metrics = {}
 
     for antenna in Antenna.objects.all():
         data = {
@@ -808,7 +1270,12 @@ def antenna_stats_to_csv():
             "fem_switch": "Unknown",
             "apriori": "Unknown",
         }
-        stat = AntennaStatus.objects.filter(antenna=antenna).order_by("time").last()
+        stat = (
+            AntennaStatus.objects.filter(antenna=antenna)
+            .select_related("eq_coeff_set")
+            .order_by("time")
+            .last()
+        )
         if stat is None:
             if antenna.constructed:
                 # They are actually constructed but with no status they are OFFLINE
@@ -816,10 +1283,7 @@ def antenna_stats_to_csv():
                 data["constructed"] = False
 
         else:
-            node = "Unknown"
-            match = re.search(r"heraNode(?P<node>\d+)Snap", stat.snap_hostname)
-            if match is not None:
-                node = int(match.group("node"))
+            node = stat.node if stat.node is not None else "Unknown"
 
             apriori = "Unknown"
             apriori_stat = (
@@ -829,27 +1293,8 @@ def antenna_stats_to_csv():
             )
             if apriori_stat is not None:
                 apriori = apriori_stat.get_apriori_status_display()
-            if all_spectra is not None:
-                try:
-                    auto = all_spectra.get(antenna=antenna)
-                except AutoSpectra.DoesNotExist:
-                    auto = None
-                if auto is not None:
-                    if auto.eq_coeffs is not None:
-                        spectra = (
-                            np.array(auto.spectra) / np.median(auto.eq_coeffs) ** 2
-                        )
-                    else:
-                        spectra = auto.spectra
-                    spectra = (
-                        (10 * np.log10(np.ma.masked_invalid(spectra)))
-                        .filled(-100)
-                        .mean()
-                    )
-                else:
-                    spectra = None
-            else:
-                spectra = None
+            spectra_metrics = all_metrics.get(antenna.id)
+            spectra = spectra_metrics.mean_db if spectra_metrics is not None else None
 
             adc_power = (
                 10 * np.log10(stat.adc_power) if stat.adc_power is not None else None
@@ -888,13 +1333,25 @@ def antenna_stats_to_csv():
 
 
 @shared_task
+@metrics.track_task
+def update_status_rollups():
+    """Aggregate the new status history into the time bucket rollups."""
+    try:
+        rollups.update_rollups()
+    except Exception as e:  # noqa
+        print(f"Error updating the status rollups: {e}")
+        metrics.count_failure("rollups")
+
+
+@shared_task
+@metrics.track_task
 def delete_old_data():
     """Remove data from bigger models older than a month."""
 
     # special handle auto spectra because of the time difference.
     # auto spectra are huge. only keep a week's worth of them.
     auto_time = datetime.now(tz=timezone.utc) - timedelta(weeks=1)
-    diff_filter = AutoSpectra.objects.order_by("antenna", "-time").distinct("antenna")
+    diff_filter = AutoSpectra.snapshot()
 
     # get everything older than the timeframe,
     # don't delete if it is the latest one though
@@ -904,22 +1361,18 @@ def delete_old_data():
 
     # delete anything older than 2 years
     old_time = datetime.now(tz=timezone.utc) - timedelta(weeks=8)
-    for model in [AntennaStatus, SnapStatus, SnapSpectra]:
+    for model in [AntennaMeasurement, SpectraMetrics, SnapStatus, SnapSpectra]:
         #  get the last distinct status for each model
         # and do not delete that
-        if model in [AntennaStatus]:
-            diff_filter = model.objects.order_by("antenna", "-time").distinct("antenna")
-        elif model in [SnapStatus]:
-            diff_filter = model.objects.order_by("hostname", "-time").distinct(
-                "hostname"
-            )
-        else:
-            diff_filter = model.objects.order_by(
-                "hostname", "input_number", "-time"
-            ).distinct("hostname", "input_number")
+        diff_filter = model.snapshot(bounded=False)
 
         # get everything older than the timeframe,
         # don't delete if it is the latest one though
         model.objects.filter(time__lte=old_time).exclude(
             pk__in=diff_filter.values_list("id", flat=True)
         ).delete()
+
+    # configuration intervals no measurement refers to anymore
+    AntennaConfiguration.objects.filter(
+        valid_to__lte=old_time, antennameasurement__isnull=True
+    ).delete()
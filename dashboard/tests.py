@@ -1,4 +1,1474 @@
 """Definion of unit tests."""
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import redis
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.http import http_date
+
+from . import (
+    api,
+    export,
+    metrics,
+    profiling,
+    recordings,
+    rollups,
+    shared_snapshot,
+    store,
+    tasks,
+    waterfall,
+)
+from .dash_apps import STATUS_HOVER_LINES, status_hover_values
+from .models import (
+    ADC_HIST_BINS,
+    Antenna,
+    AntennaConfiguration,
+    AntennaMeasurement,
+    AprioriStatus,
+    AutoSpectra,
+    EqCoeffSet,
+    SnapStatus,
+    parse_snap_hostname,
+)
+from .snapshots import (
+    HISTORY,
+    SETTLE,
+    parse_as_of,
+    resolve_as_of,
+    slider_as_of,
+    slider_range,
+    snapshot_time,
+    snapshot_version,
+)
+
+from .synthetic import MemoryRedis
+
+NOW = datetime(2021, 3, 5, 12, 3, 20, tzinfo=timezone.utc)
+
+
+class ResolveAsOfTests(SimpleTestCase):
+    """Rounding of requested times to snapshots."""
+
+    def test_none_is_latest(self):
+        """No requested time shows the latest data."""
+        self.assertIsNone(resolve_as_of(None, now=NOW))
+
+    def test_rounds_down_to_step(self):
+        """Times are rounded down to the start of their slider step."""
+        time = datetime(2021, 3, 4, 5, 7, 42, tzinfo=timezone.utc)
+        self.assertEqual(resolve_as_of(time, now=NOW), "2021-03-04T05:05:00+00:00")
+
+    def test_step_boundary(self):
+        """A time on a step boundary is its own snapshot."""
+        time = datetime(2021, 3, 4, 5, 10, tzinfo=timezone.utc)
+        self.assertEqual(resolve_as_of(time, now=NOW), "2021-03-04T05:10:00+00:00")
+
+    def test_naive_time_is_utc(self):
+        """Naive times are taken to be UTC."""
+        time = datetime(2021, 3, 4, 5, 7, 42)
+        self.assertEqual(resolve_as_of(time, now=NOW), "2021-03-04T05:05:00+00:00")
+
+    def test_other_timezone(self):
+        """Aware times are converted to UTC."""
+        time = datetime(2021, 3, 4, 7, 7, 42, tzinfo=timezone(timedelta(hours=2)))
+        self.assertEqual(resolve_as_of(time, now=NOW), "2021-03-04T05:05:00+00:00")
+
+    def test_settled_time(self):
+        """Times older than SETTLE are served from a snapshot."""
+        time = NOW - SETTLE - timedelta(seconds=1)
+        self.assertIsNotNone(resolve_as_of(time, now=NOW))
+
+    def test_unsettled_time_is_live(self):
+        """Times within SETTLE of now may still get data and are shown live."""
+        self.assertIsNone(resolve_as_of(NOW - SETTLE + timedelta(seconds=1), now=NOW))
+        self.assertIsNone(resolve_as_of(NOW + timedelta(hours=1), now=NOW))
+
+
+class ParseAsOfTests(SimpleTestCase):
+    """Reading the as_of parameter of a page."""
+
+    def test_valid_time(self):
+        """A valid time is parsed."""
+        self.assertEqual(
+            parse_as_of("?as_of=2021-03-04T05:00"), datetime(2021, 3, 4, 5, 0)
+        )
+
+    def test_with_other_parameters(self):
+        """Other query parameters are ignored."""
+        self.assertEqual(
+            parse_as_of("?ant=1&as_of=2021-03-04T05:00"), datetime(2021, 3, 4, 5, 0)
+        )
+
+    def test_missing(self):
+        """A missing query string or parameter is no time."""
+        for search in [None, "", "?", "?ant=1", "?as_of="]:
+            with self.subTest(search=search):
+                self.assertIsNone(parse_as_of(search))
+
+    def test_invalid(self):
+        """Malformed and out of range times are no time."""
+        for search in ["?as_of=yesterday", "?as_of=2021-13-40T05:00"]:
+            with self.subTest(search=search):
+                self.assertIsNone(parse_as_of(search))
+
+
+class SnapshotVersionTests(SimpleTestCase):
+    """Cache versions of snapshots."""
+
+    def test_latest_keeps_data_version(self):
+        """The latest data is cached under the data version."""
+        version = snapshot_version("autospectra:3", None)
+        self.assertEqual(version, "autospectra:3")
+        self.assertIsNone(snapshot_time(version))
+
+    def test_snapshot_round_trip(self):
+        """A snapshot version only depends on the time and gives it back."""
+        as_of = "2021-03-04T05:05:00+00:00"
+        version = snapshot_version("autospectra:3", as_of)
+        self.assertEqual(version, snapshot_version("autospectra:4", as_of))
+        self.assertEqual(
+            snapshot_time(version), datetime(2021, 3, 4, 5, 5, tzinfo=timezone.utc)
+        )
+
+
+class SliderRangeTests(SimpleTestCase):
+    """Range, marks and values of the time slider."""
+
+    def test_range(self):
+        """The slider ends at the current step and covers HISTORY."""
+        start, end, marks = slider_range(now=NOW)
+        self.assertEqual(
+            end, int(datetime(2021, 3, 5, 12, 0, tzinfo=timezone.utc).timestamp())
+        )
+        self.assertEqual(end - start, HISTORY.total_seconds())
+        self.assertEqual(marks[end], "Live")
+
+    def test_daily_marks(self):
+        """Midnights are marked, except within 12 hours of the live end."""
+        start, end, marks = slider_range(now=NOW)
+        labels = [marks[value] for value in sorted(marks)]
+        self.assertEqual(
+            labels,
+            ["Feb 27", "Feb 28", "Mar 01", "Mar 02", "Mar 03", "Mar 04", "Live"],
+        )
+        for value in marks:
+            self.assertTrue(start < value <= end)
+
+    def test_slider_as_of(self):
+        """The end of the slider is live, earlier values are snapshots."""
+        start, end, marks = slider_range(now=NOW)
+        self.assertIsNone(slider_as_of(None, end))
+        self.assertIsNone(slider_as_of(end, end))
+        self.assertEqual(
+            slider_as_of(start + 90, end),
+            datetime.fromtimestamp(start, tz=timezone.utc).isoformat(),
+        )
+
+
+class SnapshotMixinTests(TestCase):
+    """Latest row of every series at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Add apriori statuses of two antpols at different times."""
+        cls.ant1 = Antenna.objects.create(
+            ant_number=1, ant_name="HH1", polarization="e"
+        )
+        cls.ant2 = Antenna.objects.create(
+            ant_number=2, ant_name="HH2", polarization="e"
+        )
+        cls.t0 = datetime(2021, 3, 4, 5, 0, tzinfo=timezone.utc)
+        cls.t1 = cls.t0 + timedelta(hours=1)
+        cls.t2 = cls.t0 + timedelta(hours=2)
+        for antenna, stat_time, status in [
+            (cls.ant1, cls.t0, "DhM"),
+            (cls.ant1, cls.t1, "RFM"),
+            (cls.ant1, cls.t2, "RFO"),
+            (cls.ant2, cls.t0, "DhO"),
+        ]:
+            AprioriStatus.objects.create(
+                antenna=antenna, time=stat_time, apriori_status=status
+            )
+
+    def _statuses(self, time=None):
+        return {
+            stat.antenna_id: (stat.time, stat.apriori_status)
+            for stat in AprioriStatus.snapshot(time)
+        }
+
+    def test_latest(self):
+        """Without a time the latest row of every antpol is returned."""
+        self.assertEqual(
+            self._statuses(),
+            {self.ant1.id: (self.t2, "RFO"), self.ant2.id: (self.t0, "DhO")},
+        )
+
+    def test_at_time(self):
+        """Rows after the time are ignored."""
+        self.assertEqual(
+            self._statuses(self.t1 + timedelta(minutes=30)),
+            {self.ant1.id: (self.t1, "RFM"), self.ant2.id: (self.t0, "DhO")},
+        )
+
+    def test_at_row_time(self):
+        """A row at exactly the time is included."""
+        self.assertEqual(self._statuses(self.t1)[self.ant1.id], (self.t1, "RFM"))
+
+    def test_before_first_row(self):
+        """Antpols without rows before the time are missing."""
+        self.assertEqual(self._statuses(self.t0 - timedelta(seconds=1)), {})
+
+
+class SnapStatusSnapshotTests(TestCase):
+    """Latest row of series without a key table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Add statuses of a SNAP reporting and of one silent for days."""
+        cls.time = datetime(2021, 3, 4, 5, 0, tzinfo=timezone.utc)
+        for hostname, age in [
+            ("heraNode1Snap0", timedelta(minutes=2)),
+            ("heraNode1Snap0", timedelta(minutes=1)),
+            ("heraNode2Snap0", timedelta(days=3)),
+        ]:
+            SnapStatus.objects.create(hostname=hostname, time=cls.time - age)
+
+    def _latest(self, **kwargs):
+        return {
+            stat.hostname: stat.time
+            for stat in SnapStatus.snapshot(self.time, **kwargs)
+        }
+
+    def test_within_window(self):
+        """Only series with rows within snapshot_window are found."""
+        self.assertEqual(
+            self._latest(), {"heraNode1Snap0": self.time - timedelta(minutes=1)}
+        )
+
+    def test_unbounded(self):
+        """Unbounded lookups find every series."""
+        self.assertEqual(
+            self._latest(bounded=False),
+            {
+                "heraNode1Snap0": self.time - timedelta(minutes=1),
+                "heraNode2Snap0": self.time - timedelta(days=3),
+            },
+        )
+
+
+class _BrokenRedis:
+    """A redis client whose every command fails."""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.ConnectionError("redis is down")
+
+        return fail
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Coalescing of data builds within and across processes."""
+
+    def setUp(self):
+        """Run against an empty in-process redis and result directory."""
+        self.rsession = MemoryRedis()
+        patcher = mock.patch.object(store, "get_redis", return_value=self.rsession)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = override_settings(SHARED_SNAPSHOT_DIR=tmp_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.calls = []
+
+    def _builder(self, name, result="data", **kwargs):
+        @store.single_flight(name, **kwargs)
+        def build(arg):
+            self.calls.append(arg)
+            return result
+
+        return build
+
+    def _outcomes(self, name):
+        shared, local = store.get_single_flight_stats()
+        return {
+            key.split(":")[-1]: count
+            for key, count in shared.items()
+            if key.startswith(f"{name}:")
+        }
+
+    def test_compute_then_hit(self):
+        """Later processes read the result the first one stored in a file."""
+        build = self._builder("test_file")
+        self.assertEqual(build(1), "data")
+        self.assertEqual(build(1), "data")
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(self._outcomes("test_file"), {"compute": 1, "hit": 1})
+        self.assertEqual(self.rsession.keys("heranow:single_flight:result:*"), [])
+
+    def test_follow(self):
+        """A result which cannot be read is built again and is a miss."""
+        build = self._builder("test_follow")
+        build(1)
+        os.remove(store._result_path("test_follow:(1,):[]"))
+        profiling._local.profile = profile = {"cache_hits": 0, "cache_misses": 0}
+        self.addCleanup(setattr, profiling._local, "profile", None)
+        self.assertEqual(build(1), "data")
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual(self._outcomes("test_follow"), {"compute": 1, "follow": 1})
+        self.assertEqual(profile, {"cache_hits": 0, "cache_misses": 1})
+
+    def test_arguments_are_separate_flights(self):
+        """Calls with other arguments do not share results."""
+        build = self._builder("test_arguments")
+        build(1)
+        build(2)
+        self.assertEqual(self._outcomes("test_arguments"), {"compute": 2})
+
+    def test_shared_result(self):
+        """Small shared results are read from redis."""
+        build = self._builder("test_shared", share=True)
+        build(1)
+        self.assertEqual(build(1), "data")
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(self._outcomes("test_shared"), {"compute": 1, "hit": 1})
+        self.assertFalse(os.path.exists(store._result_path("test_shared:(1,):[]")))
+
+    def test_large_result_in_file(self):
+        """Results over MAX_SHARED_BYTES are passed through a file."""
+        build = self._builder("test_large", result="x" * 100, share=True)
+        with mock.patch.object(store, "MAX_SHARED_BYTES", 10):
+            build(1)
+            self.assertEqual(build(1), "x" * 100)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(self._outcomes("test_large"), {"compute": 1, "hit": 1})
+        self.assertEqual(self.rsession.keys("heranow:single_flight:result:*"), [])
+
+    def test_expired_files_removed(self):
+        """Storing a result removes the files older than ttl."""
+        build = self._builder("test_expired", ttl=60)
+        build(1)
+        old_path = store._result_path("test_expired:(1,):[]")
+        os.utime(old_path, (time.time() - 120, time.time() - 120))
+        build(2)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(store._result_path("test_expired:(2,):[]")))
+
+    def test_processes_build_once(self):
+        """Processes calling while one holds the lock all get its result."""
+        n_processes = 8
+        barrier = threading.Barrier(n_processes)
+
+        def build(arg):
+            self.calls.append(arg)
+            time.sleep(0.1)
+            return {"value": arg}
+
+        def process():
+            barrier.wait(5)
+            # every thread stands in for a process, skipping the
+            # coalescing of threads within a process
+            results.append(
+                store._shared_call(
+                    "test_processes",
+                    "test_processes:(1,):[]",
+                    build,
+                    (1,),
+                    {},
+                    ttl=60,
+                    lock_timeout=5,
+                    poll=0.01,
+                    share=False,
+                )
+            )
+
+        results = []
+        threads = [threading.Thread(target=process) for _ in range(n_processes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(results, [{"value": 1}] * n_processes)
+        self.assertEqual(
+            self._outcomes("test_processes"),
+            {"compute": 1, "wait": n_processes - 1},
+        )
+
+    def test_waits_for_lock_holder(self):
+        """Callers wait while another process holds the lock."""
+        build = self._builder("test_wait", share=True, poll=0.01)
+        key = "test_wait:(1,):[]"
+        self.rsession.lock(f"heranow:single_flight:lock:{key}").acquire()
+
+        def finish():
+            time.sleep(0.05)
+            self.rsession.set(
+                f"heranow:single_flight:result:{key}", pickle.dumps("other")
+            )
+
+        thread = threading.Thread(target=finish)
+        thread.start()
+        self.assertEqual(build(1), "other")
+        thread.join()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self._outcomes("test_wait"), {"wait": 1})
+
+    def test_lock_timeout(self):
+        """Callers build the result themselves if the lock is held too long."""
+        build = self._builder("test_timeout", lock_timeout=0.05, poll=0.01)
+        key = "test_timeout:(1,):[]"
+        self.rsession.lock(f"heranow:single_flight:lock:{key}").acquire()
+        self.assertEqual(build(1), "data")
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(self._outcomes("test_timeout"), {"timeout": 1})
+
+    def test_threads_share_build(self):
+        """Threads of a process wait for the build of the first one."""
+        started = threading.Event()
+        release = threading.Event()
+
+        @store.single_flight("test_threads")
+        def build(arg):
+            self.calls.append(arg)
+            started.set()
+            release.wait(5)
+            return "data"
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(build(1)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(build(1)))
+        second.start()
+        deadline = time.monotonic() + 5
+        while (
+            store._local_stats["test_threads:local_wait"] == 0
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(results, ["data", "data"])
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(
+            self._outcomes("test_threads"), {"compute": 1, "local_wait": 1}
+        )
+
+    def test_errors_reach_waiting_threads(self):
+        """An error of the build is raised in the threads waiting on it."""
+        started = threading.Event()
+        release = threading.Event()
+
+        @store.single_flight("test_errors")
+        def build(arg):
+            started.set()
+            release.wait(5)
+            raise ValueError("bad data")
+
+        errors = []
+
+        def call():
+            try:
+                build(1)
+            except ValueError as err:
+                errors.append(err)
+
+        first = threading.Thread(target=call)
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=call)
+        second.start()
+        deadline = time.monotonic() + 5
+        while (
+            store._local_stats["test_errors:local_wait"] == 0
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+
+    def test_redis_unavailable(self):
+        """Without redis every caller builds the result itself."""
+        build = self._builder("test_unavailable", share=True)
+        with mock.patch.object(
+            store, "get_redis", return_value=_BrokenRedis()
+        ), self.assertLogs("dashboard.store", "WARNING"):
+            self.assertEqual(build(1), "data")
+            self.assertEqual(build(1), "data")
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual(store._local_stats["test_unavailable:compute"], 2)
+
+
+class WaterfallTests(SimpleTestCase):
+    """Appending to and slicing the ring buffer of autocorrelations."""
+
+    FREQS = np.linspace(100e6, 200e6, 8)
+
+    def setUp(self):
+        """Use a buffer of four slots in a temporary directory."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = override_settings(WATERFALL_DIR=tmp_dir.name, WATERFALL_HOURS=4 / 60)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _append(self, minute, values, freqs=FREQS, all_antpols=()):
+        time = datetime(2021, 3, 4, 5, minute, tzinfo=timezone.utc)
+        waterfall.append_spectra(
+            time,
+            list(values),
+            [np.full(len(freqs), value) for value in values.values()],
+            freqs,
+            all_antpols=all_antpols,
+        )
+        return time.timestamp()
+
+    def test_empty(self):
+        """There is nothing to open before the first append."""
+        self.assertIsNone(waterfall.Waterfall.open())
+
+    def test_round_trip(self):
+        """Appended spectra are sliced back, NaN where an antpol is missing."""
+        t0 = self._append(0, {"1e": 1, "1n": 2}, all_antpols=["1e", "1n", "2e"])
+        t1 = self._append(1, {"1e": 3, "2e": 4})
+        buffer = waterfall.Waterfall.open()
+        self.assertEqual(buffer.antpols, ["1e", "1n", "2e"])
+        self.assertEqual(buffer.time_range(), (t0, t1))
+
+        times, freqs, spectra = buffer.slice("1e")
+        np.testing.assert_array_equal(times, [t0, t1])
+        np.testing.assert_array_equal(freqs, self.FREQS)
+        np.testing.assert_array_equal(spectra, [[1] * 8, [3] * 8])
+        times, freqs, spectra = buffer.slice("1n")
+        np.testing.assert_array_equal(spectra[0], [2] * 8)
+        self.assertTrue(np.all(np.isnan(spectra[1])))
+        with self.assertRaises(KeyError):
+            buffer.slice("3e")
+
+    def test_repeated_snapshot(self):
+        """Snapshots at or before the newest one are not appended again."""
+        t0 = self._append(1, {"1e": 1})
+        self._append(1, {"1e": 2})
+        self._append(0, {"1e": 3})
+        times, freqs, spectra = waterfall.Waterfall.open().slice("1e")
+        np.testing.assert_array_equal(times, [t0])
+        np.testing.assert_array_equal(spectra, [[1] * 8])
+
+    def test_wraps(self):
+        """The oldest snapshots are overwritten once every slot is used."""
+        stamps = [self._append(minute, {"1e": minute}) for minute in range(6)]
+        buffer = waterfall.Waterfall.open()
+        self.assertEqual(buffer.time_range(), (stamps[2], stamps[5]))
+        times, freqs, spectra = buffer.slice("1e")
+        np.testing.assert_array_equal(times, stamps[2:])
+        np.testing.assert_array_equal(spectra[:, 0], [2, 3, 4, 5])
+
+        times, freqs, spectra = buffer.slice("1e", start=stamps[3], end=stamps[4])
+        np.testing.assert_array_equal(times, stamps[3:5])
+
+    def test_decimation(self):
+        """Times and channels are averaged in blocks."""
+        stamps = [self._append(minute, {"1e": minute}) for minute in range(4)]
+        times, freqs, spectra = waterfall.Waterfall.open().slice(
+            "1e", max_times=2, max_chans=4
+        )
+        np.testing.assert_allclose(times, [np.mean(stamps[:2]), np.mean(stamps[2:])])
+        np.testing.assert_allclose(freqs, self.FREQS.reshape(4, 2).mean(axis=1))
+        np.testing.assert_array_equal(spectra, [[0.5] * 4, [2.5] * 4])
+
+    def test_new_antpol_keeps_history(self):
+        """Antpols added to the array take a spare row."""
+        t0 = self._append(0, {"1e": 1})
+        self._append(1, {"1e": 2, "5e": 7})
+        buffer = waterfall.Waterfall.open()
+        self.assertEqual(buffer.antpols, ["1e", "5e"])
+        times, freqs, spectra = buffer.slice("1e")
+        self.assertEqual(times[0], t0)
+        times, freqs, spectra = buffer.slice("5e")
+        self.assertTrue(np.all(np.isnan(spectra[0])))
+        np.testing.assert_array_equal(spectra[1], [7] * 8)
+
+    def test_recreated_without_spare_rows(self):
+        """The buffer is recreated when no spare row is left."""
+        with mock.patch.object(waterfall, "SPARE_ROWS", 0):
+            self._append(0, {"1e": 1})
+            t1 = self._append(1, {"1e": 2, "5e": 7})
+        buffer = waterfall.Waterfall.open()
+        self.assertEqual(buffer.antpols, ["1e", "5e"])
+        np.testing.assert_array_equal(buffer.slice("1e")[0], [t1])
+
+    def test_recreated_for_new_freqs(self):
+        """The buffer is recreated when the frequencies change."""
+        self._append(0, {"1e": 1})
+        freqs = np.linspace(100e6, 200e6, 4)
+        t1 = self._append(1, {"1e": 2}, freqs=freqs)
+        buffer = waterfall.Waterfall.open()
+        np.testing.assert_array_equal(buffer.freqs, freqs)
+        np.testing.assert_array_equal(buffer.slice("1e")[0], [t1])
+
+
+class SharedSnapshotTests(SimpleTestCase):
+    """Publishing and mapping the latest ingested arrays."""
+
+    def setUp(self):
+        """Publish to a temporary directory."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.directory = tmp_dir.name
+        settings = override_settings(SHARED_SNAPSHOT_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_nothing_published(self):
+        """Without a published snapshot there is no meta and no arrays."""
+        self.assertEqual(shared_snapshot.open_snapshot("autospectra"), (None, {}))
+
+    def test_round_trip(self):
+        """Published arrays are mapped read-only with their meta."""
+        power = np.arange(6, dtype=np.float32).reshape(2, 3)
+        shared_snapshot.publish_snapshot(
+            "autospectra", {"power": power}, {"time": "2021-03-04T05:00:00"}
+        )
+        meta, arrays = shared_snapshot.open_snapshot("autospectra")
+        self.assertEqual(meta, {"time": "2021-03-04T05:00:00"})
+        self.assertEqual(list(arrays), ["power"])
+        np.testing.assert_array_equal(arrays["power"], power)
+        self.assertEqual(arrays["power"].dtype, np.float32)
+        with self.assertRaises(ValueError):
+            arrays["power"][0, 0] = 1
+
+    def test_replaced(self):
+        """Readers see the new snapshot, mappings of the old one stay valid."""
+        shared_snapshot.publish_snapshot("autospectra", {"power": np.zeros(3)}, {})
+        old_meta, old = shared_snapshot.open_snapshot("autospectra")
+        for version in range(1, 5):
+            shared_snapshot.publish_snapshot(
+                "autospectra", {"power": np.full(3, version)}, {"version": version}
+            )
+        meta, arrays = shared_snapshot.open_snapshot("autospectra")
+        self.assertEqual(meta, {"version": 4})
+        np.testing.assert_array_equal(arrays["power"], [4, 4, 4])
+        np.testing.assert_array_equal(old["power"], [0, 0, 0])
+
+    def test_old_versions_removed(self):
+        """Only KEEP_VERSIONS replaced file sets are kept per name."""
+        for _ in range(5):
+            shared_snapshot.publish_snapshot("autospectra", {}, {})
+        shared_snapshot.publish_snapshot("snapspectra", {}, {})
+        entries = os.listdir(self.directory)
+        # the kept file sets, the current one and its link
+        self.assertEqual(
+            sum(entry.startswith("autospectra.") for entry in entries),
+            shared_snapshot.KEEP_VERSIONS + 2,
+        )
+        self.assertIn("snapspectra.current", entries)
+
+
+class ParseTimeRangeTests(SimpleTestCase):
+    """Bounds of an export."""
+
+    def test_bounds(self):
+        """Naive times are UTC, aware times are kept."""
+        start, end = export.parse_time_range(
+            "2021-03-04T05:00", "2021-03-04T07:00:00+02:00"
+        )
+        self.assertEqual(start, datetime(2021, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertEqual(end, datetime(2021, 3, 4, 5, tzinfo=timezone.utc))
+
+    def test_defaults(self):
+        """The range defaults to the day before end, end to now."""
+        start, end = export.parse_time_range(end="2021-03-04T05:00")
+        self.assertEqual(start, datetime(2021, 3, 3, 5, tzinfo=timezone.utc))
+        start, end = export.parse_time_range()
+        self.assertEqual(end - start, timedelta(days=1))
+
+    def test_invalid(self):
+        """Malformed times and reversed ranges are errors."""
+        for bounds in [
+            ("yesterday", None),
+            (None, "2021-13-40T05:00"),
+            ("2021-03-04T06:00", "2021-03-04T05:00"),
+        ]:
+            with self.subTest(bounds=bounds), self.assertRaises(ValueError):
+                export.parse_time_range(*bounds)
+
+
+class StreamExportTests(SimpleTestCase):
+    """Encoding record batches for a streaming response."""
+
+    def setUp(self):
+        """Make three batches of spectra."""
+        self.schema = pa.schema(
+            [
+                pa.field("ant", pa.int16(), nullable=False),
+                pa.field("spectra", pa.list_(pa.float32(), 2)),
+            ]
+        )
+        self.batches = [
+            pa.RecordBatch.from_arrays(
+                [
+                    pa.array([ant, ant + 1], type=pa.int16()),
+                    pa.FixedSizeListArray.from_arrays(
+                        pa.array(np.full(4, ant, dtype=np.float32)), 2
+                    ),
+                ],
+                schema=self.schema,
+            )
+            for ant in [0, 2, 4]
+        ]
+        self.expected = pa.Table.from_batches(self.batches)
+
+    def test_arrow(self):
+        """The chunks form an Arrow stream of every batch."""
+        chunks = list(export.stream_export(self.schema, iter(self.batches)))
+        # the schema and a chunk per batch, then the end of stream marker
+        self.assertEqual(len(chunks), 4)
+        table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+        self.assertTrue(table.equals(self.expected))
+
+    def test_parquet(self):
+        """The chunks form a Parquet file with a row group per batch."""
+        data = b"".join(
+            export.stream_export(self.schema, iter(self.batches), "parquet")
+        )
+        parquet = pq.ParquetFile(io.BytesIO(data))
+        self.assertEqual(parquet.num_row_groups, 3)
+        self.assertTrue(parquet.read().equals(self.expected))
+
+    def test_async(self):
+        """The asynchronous stream yields the same bytes."""
+
+        async def collect():
+            return [
+                chunk
+                async for chunk in export.astream_export(
+                    self.schema, iter(self.batches)
+                )
+            ]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual(
+            chunks, list(export.stream_export(self.schema, iter(self.batches)))
+        )
+
+
+class ParseSnapHostnameTests(SimpleTestCase):
+    """Node and SNAP numbers of SNAP hostnames."""
+
+    def test_hostname(self):
+        """The numbers are read from hostnames of the usual pattern."""
+        self.assertEqual(parse_snap_hostname("heraNode4Snap2"), (4, 2))
+        self.assertEqual(parse_snap_hostname("heraNode12Snap0"), (12, 0))
+
+    def test_unknown(self):
+        """Other and missing hostnames have no numbers."""
+        for hostname in [None, "", "unknown", "heraNode4"]:
+            with self.subTest(hostname=hostname):
+                self.assertEqual(parse_snap_hostname(hostname), (None, None))
+
+
+class RollupBucketTests(SimpleTestCase):
+    """Time buckets of the status rollups."""
+
+    def test_floor_time(self):
+        """Times are floored to the start of their bucket in UTC."""
+        time = datetime(2021, 3, 4, 5, 37, 42, tzinfo=timezone.utc)
+        self.assertEqual(
+            rollups.floor_time(time, 600),
+            datetime(2021, 3, 4, 5, 30, tzinfo=timezone.utc),
+        )
+        self.assertEqual(
+            rollups.floor_time(time, 86400),
+            datetime(2021, 3, 4, tzinfo=timezone.utc),
+        )
+        other = time.astimezone(timezone(timedelta(hours=-7)))
+        self.assertEqual(
+            rollups.floor_time(other, 3600), rollups.floor_time(time, 3600)
+        )
+
+    def test_choose_bucket(self):
+        """The shortest bucket giving at most max_points is picked."""
+        start = datetime(2021, 3, 4, tzinfo=timezone.utc)
+        for length, bucket in [
+            (timedelta(hours=1), 60),
+            (timedelta(hours=12), 120),
+            (timedelta(days=1), 300),
+            (timedelta(days=7), 3600),
+            (timedelta(days=365), 86400),
+            (timedelta(days=10000), 86400),
+        ]:
+            with self.subTest(length=length):
+                self.assertEqual(
+                    rollups.choose_bucket(start, start + length, 500), bucket
+                )
+
+    def test_buckets_nest(self):
+        """Every stored bucket is a multiple of the one before and of CHUNK."""
+        for shorter, longer in zip(rollups.BUCKETS, rollups.BUCKETS[1:]):
+            self.assertEqual(longer % shorter, 0)
+        for bucket in rollups.BUCKETS:
+            self.assertEqual(rollups.CHUNK.total_seconds() % bucket, 0)
+
+
+class RecordingTests(SimpleTestCase):
+    """Recording and replaying the correlator keys."""
+
+    def setUp(self):
+        """Record to a temporary directory."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.directory = tmp_dir.name
+        self.states = [
+            {"auto:1e": b"a0", "status:snap:1": {b"temp": b"40"}},
+            {"auto:1e": b"a1", "status:snap:1": {b"temp": b"40"}},
+            {"auto:1e": b"a2", "auto:1n": b"b2"},
+            {"auto:1e": b"a3", "auto:1n": b"b2"},
+            {"auto:1e": b"a4"},
+        ]
+
+    def _record(self, keyframe_every=3):
+        recorder = recordings.Recorder(self.directory, keyframe_every=keyframe_every)
+        return [
+            recorder.record(1000.0 + 60 * step, state)
+            for step, state in enumerate(self.states)
+        ]
+
+    def _replay(self, start=None, end=None):
+        state = {}
+        replayed = []
+        for recorded, changed, removed in recordings.iter_snapshots(
+            self.directory, start, end
+        ):
+            state.update(changed)
+            for key in removed:
+                state.pop(key)
+            replayed.append((recorded, dict(state)))
+        return replayed
+
+    def test_read_keys(self):
+        """String and hash keys matching the patterns are read."""
+        rsession = MemoryRedis()
+        rsession.set("auto:1e", b"a0")
+        rsession.hset("status:snap:1", "temp", 40)
+        rsession.set("other", b"x")
+        self.assertEqual(
+            recordings.read_keys(rsession),
+            {"auto:1e": b"a0", "status:snap:1": {b"temp": b"40"}},
+        )
+
+    def test_changes_only(self):
+        """Snapshots between keyframes only hold changed and removed keys."""
+        entries = self._record()
+        self.assertEqual(
+            [entry["keyframe"] for entry in entries], [True, False, False, True, False]
+        )
+        self.assertEqual([entry["changed"] for entry in entries], [2, 1, 2, 2, 1])
+        self.assertEqual([entry["removed"] for entry in entries], [0, 0, 1, 0, 1])
+        self.assertEqual(recordings.read_index(self.directory), entries)
+
+    def test_replay(self):
+        """Replaying the whole recording rebuilds every state."""
+        self._record()
+        self.assertEqual(
+            self._replay(),
+            [(1000.0 + 60 * step, state) for step, state in enumerate(self.states)],
+        )
+
+    def test_replay_range(self):
+        """The first snapshot of a range holds every key at its time."""
+        self._record()
+        self.assertEqual(
+            self._replay(start=1100, end=1200),
+            [(1120.0, self.states[2]), (1180.0, self.states[3])],
+        )
+        self.assertEqual(self._replay(start=2000), [])
+
+    def test_append(self):
+        """A new recorder appends to a recording, starting with a keyframe."""
+        self.states, later = self.states[:2], self.states[2:]
+        self._record()
+        recorder = recordings.Recorder(self.directory, keyframe_every=3)
+        entry = recorder.record(2000.0, later[0])
+        self.assertTrue(entry["keyframe"])
+        self.assertEqual(len(recordings.read_index(self.directory)), 3)
+        self.assertEqual(self._replay(start=2000), [(2000.0, later[0])])
+
+    def test_write_keys(self):
+        """Replayed snapshots are written back to redis."""
+        rsession = MemoryRedis()
+        rsession.set("auto:1n", b"old")
+        rsession.hset("status:snap:1", "uptime", 1)
+        recordings.write_keys(
+            rsession,
+            {"auto:1e": b"a0", "status:snap:1": {b"temp": b"40"}},
+            ["auto:1n"],
+        )
+        self.assertEqual(
+            recordings.read_keys(rsession),
+            {"auto:1e": b"a0", "status:snap:1": {b"temp": b"40"}},
+        )
+
+
+class TaskMetricsTests(SimpleTestCase):
+    """Metrics of the celery tasks."""
+
+    def setUp(self):
+        """Store the metrics in an empty in-process redis."""
+        patcher = mock.patch.object(store, "get_redis", return_value=MemoryRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _samples(self):
+        return dict(
+            line.rsplit(" ", 1)
+            for line in metrics.render_metrics().splitlines()
+            if not line.startswith("#")
+        )
+
+    def test_nothing_stored(self):
+        """Without stored metrics only an empty line is rendered."""
+        self.assertEqual(metrics.render_metrics(), "\n")
+
+    def test_runs(self):
+        """Runs are counted by outcome, failures by the kind of exception."""
+
+        @metrics.track_task
+        def ingest(fail=False):
+            metrics.count_failure("missing_snap")
+            with metrics.timed_redis():
+                pass
+            if fail:
+                raise ValueError("bad data")
+
+        ingest()
+        with self.assertRaises(ValueError):
+            ingest(fail=True)
+
+        samples = self._samples()
+        for name, value in [
+            ('heranow_task_runs_total{outcome="success",task="ingest"}', "1"),
+            ('heranow_task_runs_total{outcome="failure",task="ingest"}', "1"),
+            ('heranow_task_failures_total{kind="missing_snap",task="ingest"}', "2"),
+            ('heranow_task_failures_total{kind="ValueError",task="ingest"}', "1"),
+            ('heranow_task_redis_calls_total{task="ingest"}', "2"),
+            ('heranow_task_duration_seconds_count{task="ingest"}', "2"),
+            ('heranow_task_duration_seconds_bucket{le="0.5",task="ingest"}', "2"),
+            ('heranow_task_duration_seconds_bucket{le="+Inf",task="ingest"}', "2"),
+        ]:
+            with self.subTest(name=name):
+                self.assertEqual(samples[name], value)
+        self.assertIn('heranow_task_last_run_timestamp_seconds{task="ingest"}', samples)
+
+    def test_format(self):
+        """Families have HELP and TYPE lines, buckets are sorted by bound."""
+
+        @metrics.track_task
+        def ingest():
+            pass
+
+        ingest()
+        lines = metrics.render_metrics().splitlines()
+        self.assertIn("# TYPE heranow_task_duration_seconds histogram", lines)
+        self.assertIn("# TYPE heranow_task_runs_total counter", lines)
+        bounds = [
+            line.split('le="')[1].split('"')[0]
+            for line in lines
+            if line.startswith("heranow_task_duration_seconds_bucket")
+        ]
+        self.assertEqual(
+            bounds, [str(bound) for bound in metrics.DURATION_BUCKETS] + ["+Inf"]
+        )
+
+    def test_redis_unavailable(self):
+        """Tasks run and nothing is rendered without redis."""
+
+        @metrics.track_task
+        def ingest():
+            return "done"
+
+        with mock.patch.object(
+            store, "get_redis", return_value=_BrokenRedis()
+        ), self.assertLogs("dashboard.metrics", "WARNING"):
+            self.assertEqual(ingest(), "done")
+            self.assertEqual(metrics.render_metrics(), "\n")
+
+
+class CallbackProfileTests(SimpleTestCase):
+    """Profiles of the Dash callbacks."""
+
+    def _profile(self, callback, wall_ms, hits=0, misses=0):
+        return {
+            "app": "autospectra",
+            "callback": callback,
+            "wall_ms": wall_ms,
+            "queries": 2,
+            "db_ms": wall_ms / 2,
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "bytes": 1000,
+        }
+
+    def test_summarize(self):
+        """Profiles are aggregated per callback, slowest first."""
+        profiles = [self._profile("fast", 10, hits=1)] + [
+            self._profile("slow", wall_ms, misses=1) for wall_ms in range(1, 101)
+        ]
+        slow, fast = profiling.summarize(profiles)
+        self.assertEqual((slow["callback"], fast["callback"]), ("slow", "fast"))
+        self.assertEqual(slow["calls"], 100)
+        self.assertAlmostEqual(slow["p50_ms"], 50.5)
+        self.assertAlmostEqual(slow["p95_ms"], 95.05)
+        self.assertEqual(slow["max_ms"], 100)
+        self.assertEqual(slow["hit_rate"], 0)
+        self.assertEqual(fast["hit_rate"], 1)
+
+    def test_no_lookups(self):
+        """Callbacks without store lookups have no hit rate."""
+        (summary,) = profiling.summarize([self._profile("plain", 10)])
+        self.assertIsNone(summary["hit_rate"])
+
+    def test_record_cache(self):
+        """Store lookups are only counted while a callback is profiled."""
+        profiling.record_cache(True)
+        profiling._local.profile = profile = {"cache_hits": 0, "cache_misses": 0}
+        self.addCleanup(setattr, profiling._local, "profile", None)
+        profiling.record_cache(True)
+        profiling.record_cache(False)
+        profiling.record_cache(False)
+        self.assertEqual(profile, {"cache_hits": 1, "cache_misses": 2})
+
+
+class StatusHoverTests(SimpleTestCase):
+    """Values of the hover text of the hex and node plots."""
+
+    def test_values(self):
+        """Every hover line gets a value, Unknown where it is missing."""
+        stat = SimpleNamespace(
+            pam_power=-3.256,
+            adc_rms=None,
+            fem_imu=[1.5, None],
+            time=datetime.now(timezone.utc) - timedelta(hours=2),
+        )
+        values = status_hover_values(stat, 12.345, None, 0.5)
+        self.assertEqual(len(values), len(STATUS_HOVER_LINES))
+        self.assertEqual(
+            values,
+            ["12.35", "-3.26", "Unknown", "Unknown", "1.50", "Unknown", "0.5", "2.00"],
+        )
+
+
+class LatestJsonTests(SimpleTestCase):
+    """Conditional responses of the latest data endpoints."""
+
+    def setUp(self):
+        """Serve a counter of builds at fixed data versions."""
+        patcher = mock.patch.object(store, "get_redis", return_value=MemoryRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.versions = {"antennas": 3, "apriori": 7}
+        self.times = {"antennas": 1614834000.5, "apriori": 1614837600.25}
+        for name, value in [
+            ("get_data_versions", lambda: self.versions),
+            ("get_data_version_times", lambda: self.times),
+        ]:
+            patcher = mock.patch.object(api, name, side_effect=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.builds = 0
+
+        # a new name per test, the built JSON is cached per process
+        @api.latest_json(self.id(), ["antennas", "apriori"])
+        def view():
+            self.builds += 1
+            return [{"ant": 1, "builds": self.builds}]
+
+        self.view = view
+        self.factory = RequestFactory()
+
+    def _get(self, **headers):
+        return self.view(self.factory.get("/api/test", **headers))
+
+    def test_headers(self):
+        """Responses carry the ETag and time of the latest update."""
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Last-Modified"], http_date(1614837600))
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertTrue(response["ETag"].startswith('"'))
+        data = json.loads(response.content)
+        self.assertEqual(data["data_version"], "antennas:3|apriori:7")
+        self.assertEqual(data[self.id()], [{"ant": 1, "builds": 1}])
+
+    def test_built_once_per_version(self):
+        """The JSON is built again only when a source changes."""
+        first = self._get()
+        self.assertEqual(self._get().content, first.content)
+        self.assertEqual(self.builds, 1)
+        self.versions["apriori"] = 8
+        second = self._get()
+        self.assertEqual(self.builds, 2)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+
+    def test_if_none_match(self):
+        """Clients holding the current ETag get 304 without a build."""
+        etag = self._get()["ETag"]
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        self.versions["antennas"] = 4
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        """Clients with data from the latest update get 304."""
+        self._get()
+        since = http_date(1614837600)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+        self.times["antennas"] = 1614841200
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_no_update_times(self):
+        """Without update times there is no Last-Modified header."""
+        self.times.clear()
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_post(self):
+        """Only GET requests are served."""
+        response = self.view(self.factory.post("/api/test"))
+        self.assertEqual(response.status_code, 405)
+
+
+class AdcHealthStatsTests(SimpleTestCase):
+    """ADC health statistics derived from the histograms at ingest."""
+
+    def _stats(self, *histograms):
+        rows = [AntennaMeasurement(adc_hist_counts=counts) for counts in histograms]
+        tasks._assign_adc_health_stats(rows)
+        return [
+            (
+                row.adc_clip_fraction,
+                row.adc_effective_bits,
+                row.adc_kurtosis,
+                row.adc_asymmetry,
+            )
+            for row in rows
+        ]
+
+    def test_uniform(self):
+        """A uniform histogram uses every bit and is flat."""
+        n_bins = ADC_HIST_BINS.size
+        ((clip, bits, kurtosis, asymmetry),) = self._stats([1000] * n_bins)
+        self.assertAlmostEqual(clip, 2 / n_bins)
+        self.assertAlmostEqual(bits, np.log2(n_bins))
+        # excess kurtosis of a discrete uniform distribution
+        self.assertAlmostEqual(kurtosis, -6 / 5 * (n_bins**2 + 1) / (n_bins**2 - 1))
+        self.assertAlmostEqual(asymmetry, 0)
+
+    def test_gaussian(self):
+        """A Gaussian histogram has the entropy and moments of a Gaussian."""
+        sigma = 10
+        counts = np.round(1e6 * np.exp(-0.5 * (ADC_HIST_BINS / sigma) ** 2))
+        ((clip, bits, kurtosis, asymmetry),) = self._stats(counts.astype(int).tolist())
+        self.assertEqual(clip, 0)
+        self.assertAlmostEqual(
+            bits, np.log2(sigma * np.sqrt(2 * np.pi * np.e)), places=3
+        )
+        self.assertAlmostEqual(kurtosis, 0, places=3)
+        self.assertAlmostEqual(asymmetry, 0, places=3)
+
+    def test_clipped(self):
+        """Inputs at the ends of the ADC range are all clipped."""
+        counts = np.zeros(ADC_HIST_BINS.size, dtype=int)
+        counts[[0, -1]] = 500
+        ((clip, bits, kurtosis, asymmetry),) = self._stats(counts.tolist())
+        self.assertEqual(clip, 1)
+        self.assertAlmostEqual(bits, 1)
+        self.assertAlmostEqual(kurtosis, -2)
+        self.assertAlmostEqual(asymmetry, 0)
+
+    def test_degenerate(self):
+        """Statistics which are not defined are None."""
+        stuck = np.zeros(ADC_HIST_BINS.size, dtype=int)
+        stuck[0] = 1000
+        empty = [0] * ADC_HIST_BINS.size
+        self.assertEqual(
+            self._stats(stuck.tolist(), empty),
+            [(1, 0, None, None), (None, None, None, None)],
+        )
+
+    def test_without_histogram(self):
+        """Measurements without a histogram are left unchanged."""
+        row = AntennaMeasurement(adc_hist_counts=None, adc_kurtosis=1.5)
+        tasks._assign_adc_health_stats([row])
+        self.assertEqual(row.adc_kurtosis, 1.5)
+        self.assertIsNone(row.adc_clip_fraction)
+
+    def test_hist_counts(self):
+        """Counts are kept from either histogram form on the standard bins."""
+        counts = list(range(ADC_HIST_BINS.size))
+        self.assertEqual(tasks._adc_hist_counts(counts), counts)
+        self.assertEqual(
+            tasks._adc_hist_counts([ADC_HIST_BINS.tolist(), counts]), counts
+        )
+        self.assertIsNone(tasks._adc_hist_counts(None))
+        self.assertIsNone(tasks._adc_hist_counts(counts[:-1]))
+        self.assertIsNone(
+            tasks._adc_hist_counts([(ADC_HIST_BINS + 1).tolist(), counts])
+        )
+
+
+class SpectraMetricsTests(SimpleTestCase):
+    """Metrics of the autospectra computed at ingest."""
+
+    def _reference(self, auto, eq_coeffs, freqs, band_width):
+        """Compute the metrics of one spectrum channel by channel."""
+        median_eq = np.median(eq_coeffs)
+        spectrum = np.asarray(auto, dtype=np.float64) / median_eq**2
+        freqs_mhz = np.asarray(freqs) / 1e6
+        band_start = np.floor(freqs_mhz[0] / band_width) * band_width
+        db = []
+        for value in spectrum:
+            db.append(
+                10 * np.log10(value) if np.isfinite(value) and value > 0 else -100
+            )
+        powers = []
+        start = band_start
+        while start <= freqs_mhz[-1]:
+            values = [
+                value
+                for value, freq in zip(spectrum, freqs_mhz)
+                if start <= freq < start + band_width and np.isfinite(value)
+            ]
+            mean = np.mean(values) if values else np.nan
+            powers.append(10 * np.log10(mean) if mean > 0 else None)
+            start += band_width
+        return np.mean(db), median_eq, band_start, powers
+
+    @override_settings(SPECTRA_BAND_WIDTH_MHZ=5)
+    def test_matches_channel_loop(self):
+        """The matrix computation matches a loop over channels and bands."""
+        # 1.5 MHz channels from 47 MHz, the last band is partial
+        freqs = (47 + 1.5 * np.arange(20)) * 1e6
+        rng = np.random.default_rng(1)
+        autos = rng.uniform(1, 100, size=(4, freqs.size))
+        # a missing channel, a band without any valid channel, and a spectrum
+        # of zeros
+        autos[1, 3] = np.nan
+        autos[2, 6:9] = np.nan
+        autos[3] = 0
+        eq_coeffs = [np.full(8, 2.0), np.arange(1.0, 9.0), [0.5, 1.5], [1.0]]
+        antenna = Antenna(ant_number=1, ant_name="HH1", polarization="e")
+        rows = [AutoSpectra(antenna=antenna, time=NOW) for _ in autos]
+
+        spectra_metrics = tasks._spectra_metrics(rows, list(autos), eq_coeffs, freqs)
+        self.assertEqual(len(spectra_metrics), len(rows))
+        for metric, auto, coeffs in zip(spectra_metrics, autos, eq_coeffs):
+            mean_db, median_eq, band_start, powers = self._reference(
+                auto, coeffs, freqs, 5
+            )
+            self.assertIs(metric.antenna, antenna)
+            self.assertEqual(metric.time, NOW)
+            self.assertAlmostEqual(metric.mean_db, mean_db)
+            self.assertAlmostEqual(metric.median_eq, median_eq)
+            self.assertEqual((metric.band_start, metric.band_width), (45, 5))
+            self.assertEqual(len(metric.band_power), len(powers))
+            for power, expected in zip(metric.band_power, powers):
+                if expected is None:
+                    self.assertIsNone(power)
+                else:
+                    self.assertAlmostEqual(power, expected)
+        self.assertIsNone(spectra_metrics[2].band_power[2])
+        self.assertTrue(all(power is None for power in spectra_metrics[3].band_power))
+        self.assertEqual(spectra_metrics[3].mean_db, -100)
+
+    def test_no_rows(self):
+        """A snapshot without spectra has no metrics."""
+        self.assertEqual(tasks._spectra_metrics([], [], [], np.arange(3)), [])
+
+
+class AntennaConfigurationTests(TestCase):
+    """Configuration intervals of the antenna statuses."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Add two antpols."""
+        cls.ant1 = Antenna.objects.create(
+            ant_number=1, ant_name="HH1", polarization="e"
+        )
+        cls.ant2 = Antenna.objects.create(
+            ant_number=2, ant_name="HH2", polarization="e"
+        )
+        cls.t0 = datetime(2021, 3, 4, 5, 0, tzinfo=timezone.utc)
+
+    def _ingest(self, minute, antenna=None, **config):
+        """Assign the configuration reported with a measurement at a minute."""
+        measured = self.t0 + timedelta(minutes=minute)
+        antenna = antenna or self.ant1
+        measurement = AntennaMeasurement(antenna=antenna, time=measured)
+        configuration = AntennaConfiguration(
+            antenna=antenna,
+            valid_from=measured,
+            valid_to=measured,
+            **{
+                "snap_hostname": "heraNode1Snap0",
+                "snap_channel_number": 2,
+                "pam_atten": 4,
+                **config,
+            },
+        )
+        tasks._assign_antenna_configurations([measurement], [configuration])
+        measurement.save()
+        return measurement
+
+    def _intervals(self, antenna=None):
+        return list(
+            AntennaConfiguration.objects.filter(antenna=antenna or self.ant1)
+            .order_by("valid_from")
+            .values_list("valid_from", "valid_to", "pam_atten")
+        )
+
+    def test_first_status(self):
+        """The first status of an antenna opens an interval."""
+        measurement = self._ingest(0)
+        self.assertEqual(self._intervals(), [(self.t0, self.t0, 4)])
+        self.assertEqual(
+            measurement.configuration_id, AntennaConfiguration.objects.get().pk
+        )
+
+    def test_unchanged(self):
+        """Unchanged configurations extend the open interval."""
+        first = self._ingest(0)
+        second = self._ingest(1)
+        third = self._ingest(2)
+        self.assertEqual(
+            self._intervals(), [(self.t0, self.t0 + timedelta(minutes=2), 4)]
+        )
+        self.assertEqual(
+            {first.configuration_id, second.configuration_id},
+            {third.configuration_id},
+        )
+
+    def test_changed(self):
+        """A change closes the interval at the last status and opens a new one."""
+        first = self._ingest(0)
+        self._ingest(1)
+        changed = self._ingest(2, pam_atten=6)
+        self.assertEqual(
+            self._intervals(),
+            [
+                (self.t0, self.t0 + timedelta(minutes=1), 4),
+                (self.t0 + timedelta(minutes=2), self.t0 + timedelta(minutes=2), 6),
+            ],
+        )
+        self.assertNotEqual(changed.configuration_id, first.configuration_id)
+
+        # changing back opens a third interval instead of reusing the first
+        back = self._ingest(3)
+        self.assertEqual(len(self._intervals()), 3)
+        self.assertNotIn(
+            back.configuration_id, [first.configuration_id, changed.configuration_id]
+        )
+
+    def test_antennas_separate(self):
+        """Every antenna has its own intervals."""
+        self._ingest(0)
+        self._ingest(0, antenna=self.ant2)
+        self._ingest(1, antenna=self.ant2, pam_atten=6)
+        self._ingest(1)
+        self.assertEqual(
+            self._intervals(), [(self.t0, self.t0 + timedelta(minutes=1), 4)]
+        )
+        self.assertEqual(len(self._intervals(self.ant2)), 2)
+
+
+class EqCoeffHashTests(SimpleTestCase):
+    """Content hashes of EQ coefficient vectors."""
+
+    def test_stable_across_types(self):
+        """Equal coefficients hash alike whatever their type."""
+        coeffs = [0.5, 1.25, 2.0, 1024.0]
+        content_hash = EqCoeffSet.hash_coeffs(coeffs)
+        for same in [
+            np.asarray(coeffs, dtype=np.float32),
+            np.asarray(coeffs, dtype=np.float64),
+            tuple(coeffs),
+        ]:
+            with self.subTest(dtype=type(same)):
+                self.assertEqual(EqCoeffSet.hash_coeffs(same), content_hash)
+        self.assertEqual(
+            EqCoeffSet.hash_coeffs([1, 2]), EqCoeffSet.hash_coeffs([1.0, 2.0])
+        )
+
+    def test_different(self):
+        """Different coefficients, lengths and orders hash differently."""
+        hashes = {
+            EqCoeffSet.hash_coeffs(coeffs)
+            for coeffs in [[1.0, 2.0], [2.0, 1.0], [1.0, 2.0, 0.0], [1.0, 2.5]]
+        }
+        self.assertEqual(len(hashes), 4)
+
+
+class EqCoeffSetTests(TestCase):
+    """Storing each distinct EQ coefficient vector once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Add an antpol."""
+        cls.antenna = Antenna.objects.create(
+            ant_number=1, ant_name="HH1", polarization="e"
+        )
+
+    def _rows(self, *minutes):
+        return [
+            AutoSpectra(antenna=self.antenna, time=NOW + timedelta(minutes=minute))
+            for minute in minutes
+        ]
+
+    def test_shared_sets(self):
+        """Identical vectors share one set, different vectors do not."""
+        rows = self._rows(2, 1, 3, 4)
+        tasks._assign_eq_coeff_sets(
+            rows,
+            [[1.0, 2.0], np.array([1, 2], dtype=np.float32), [3.0, 4.0], None],
+        )
+        self.assertEqual(rows[0].eq_coeff_set_id, rows[1].eq_coeff_set_id)
+        self.assertNotEqual(rows[0].eq_coeff_set_id, rows[2].eq_coeff_set_id)
+        self.assertIsNone(rows[3].eq_coeff_set_id)
+        self.assertEqual(EqCoeffSet.objects.count(), 2)
+
+        eq_set = EqCoeffSet.objects.get(pk=rows[0].eq_coeff_set_id)
+        self.assertEqual(eq_set.coeffs, [1.0, 2.0])
+        # the earliest row using the coefficients
+        self.assertEqual(eq_set.first_seen, NOW + timedelta(minutes=1))
+
+    def test_existing_set(self):
+        """Sets already stored are reused and keep their first time."""
+        first = self._rows(0)
+        tasks._assign_eq_coeff_sets(first, [[1.0, 2.0]])
+        later = self._rows(5, 6)
+        tasks._assign_eq_coeff_sets(later, [[1.0, 2.0], [1.0, 2.0]])
+        self.assertEqual(
+            {row.eq_coeff_set_id for row in first + later}, {first[0].eq_coeff_set_id}
+        )
+        self.assertEqual(EqCoeffSet.objects.get().first_seen, NOW)
@@ -2,7 +2,7 @@
 
 from django.urls import include, path
 
-from . import views
+from . import api, views
 from .dash_apps import (
     adchists,
     autospectra,
@@ -12,6 +12,7 @@ from .dash_apps import (
     hookup_notes_table,
     node_plot,
     snapspectra,
+    waterfall,
 )
 
 app_name = "dashboard"
@@ -22,6 +23,7 @@ urlpatterns = [
     path("adchists", views.ADCHistograms.as_view(), name="adchists"),
     path("hex_stats", views.HexPlot.as_view(), name="hexplot"),
     path("node_stats", views.NodePlot.as_view(), name="nodeplot"),
+    path("waterfall", views.WaterfallPlot.as_view(), name="waterfall"),
     path("compute", views.CompterLoads.as_view(), name="compute"),
     path("librarian", views.LibrarianLogs.as_view(), name="librarian"),
     path(
@@ -40,4 +42,14 @@ urlpatterns = [
     path("issue_log", views.IssueLog.as_view(), name="issue_log"),
     path("lightning", views.Lightning.as_view(), name="lightning"),
     path("Help", views.Help.as_view(), name="help"),
+    path("callback_stats", views.CallbackStats.as_view(), name="callback_stats"),
+    path("api/export/<str:table>", api.export_history, name="export_history"),
+    path("api/antenna_status", api.latest_antenna_status, name="api_antenna_status"),
+    path("api/apriori", api.latest_apriori, name="api_apriori"),
+    path("api/snap_status", api.latest_snap_status, name="api_snap_status"),
+    path("api/mappings", api.latest_mappings, name="api_mappings"),
+    path("api/grafana/", api.grafana_test, name="grafana_test"),
+    path("api/grafana/search", api.grafana_search, name="grafana_search"),
+    path("api/grafana/query", api.grafana_query, name="grafana_query"),
+    path("metrics", api.task_metrics, name="metrics"),
 ]
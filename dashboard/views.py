@@ -3,9 +3,12 @@
 import logging
 import socket
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import redirect
+from django.utils.decorators import method_decorator
 from tabination.views import TabView
 
+from dashboard import profiling
 from dashboard.models import AntToSnap, SnapToAnt, XengChannels
 
 logger = logging.getLogger(__name__)
@@ -109,6 +112,14 @@ class NodePlot(DashChildTab):
     app_name = "dash_nodeplot"
 
 
+class WaterfallPlot(DashChildTab):
+    """Link to the waterfall of recent autospectra."""
+
+    tab_label = "Autospectra Waterfall"
+    tab_id = "waterfall"
+    app_name = "dash_waterfall"
+
+
 class LibrarianLogs(ExternalChildTab):
     """Link to Librarian Logs."""
 
@@ -179,6 +190,7 @@ class DetailedPages(BaseTab):
         "hex_stats",
         "node_stats",
         "spectra",
+        "waterfall",
         "adchists",
         "compute",
         "qm",
@@ -273,17 +285,39 @@ class SnapHookups(ChildTab):
     def get_context_data(self, **kwargs):
         """Add executing hostname to context."""
         context = super().get_context_data(**kwargs)
-        last_xeng_time = XengChannels.objects.last().time
-        last_mapping_time = AntToSnap.objects.last().time
-        context["xengs"] = XengChannels.objects.filter(time=last_xeng_time).order_by(
-            "number"
-        )
-        context["ants"] = AntToSnap.objects.filter(time=last_mapping_time).order_by(
-            "antenna__ant_number"
-        )
-        context["snaps"] = SnapToAnt.objects.filter(time=last_mapping_time).order_by(
-            "node", "snap"
+        context["xengs"] = XengChannels.current().order_by("number")
+        context["ants"] = (
+            AntToSnap.current()
+            .select_related("antenna")
+            .order_by("antenna__ant_number")
         )
+        context["snaps"] = SnapToAnt.current().order_by("node", "snap")
+        return context
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class CallbackStats(ChildTab):
+    """Timings of the Dash callbacks, for staff only."""
+
+    tab_label = "Callback Statistics"
+    tab_id = "callback_stats"
+    template_name = "callback_stats.html"
+
+    def get_context_data(self, **kwargs):
+        """Add the callback summaries and slowest queries to context."""
+        context = super().get_context_data(**kwargs)
+        profiles = profiling.get_profiles()
+        context["window"] = len(profiles)
+        context["callbacks"] = profiling.summarize(profiles)
+        context["slow_queries"] = sorted(
+            (
+                dict(query, app=profile["app"], callback=profile["callback"])
+                for profile in profiles
+                for query in profile["slow_queries"]
+            ),
+            key=lambda query: query["ms"],
+            reverse=True,
+        )[:20]
         return context
 
 
@@ -0,0 +1,295 @@
+"""Memory-mapped ring buffer of the recent autocorrelations.
+
+The autospectra ingest appends every snapshot of autocorrelations to
+files in settings.WATERFALL_DIR and the waterfall Dash app maps them
+read-only, so a time by frequency view of an antpol needs no database
+queries and no copy of the full history:
+
+spectra.npy
+    (n_times, n_rows, n_chan) float32 autocorrelations, NaN where an
+    antpol was missing from a snapshot. The rows past the known antpols
+    are spare rows for antpols added later.
+times.npy
+    (n_times,) float64 unix time of each slot, NaN for unused slots. The
+    spectra of unused slots are undefined.
+index.json
+    The antpol names of the rows in use, the frequencies of the buffer and
+    the next slot to write, replaced atomically after each append.
+
+Only the ingest task writes to the buffer.
+"""
+
+import json
+import logging
+import os
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# the autospectra ingest runs every minute, see heranow/celery.py
+SLOT_SECONDS = 60
+# rows allocated beyond the known antpols, for antennas added later
+SPARE_ROWS = 32
+
+
+def _path(name):
+    return os.path.join(settings.WATERFALL_DIR, name)
+
+
+def _write_index(index):
+    tmp_path = _path("index.json.tmp")
+    with open(tmp_path, "w") as index_file:
+        json.dump(index, index_file)
+    os.replace(tmp_path, _path("index.json"))
+
+
+class Waterfall:
+    """A read-only view of the ring buffer.
+
+    Parameters
+    ----------
+    spectra : numpy memmap
+        (n_times, n_rows, n_chan) autocorrelations.
+    times : numpy memmap
+        (n_times,) unix time of each slot.
+    index : dict
+        Contents of index.json.
+
+    """
+
+    def __init__(self, spectra, times, index):
+        self.spectra = spectra
+        self.times = times
+        self.antpols = index["antpols"]
+        self.freqs = np.asarray(index["freqs"])
+        self.head = index["head"]
+
+    @classmethod
+    def open(cls):
+        """Map the ring buffer read-only.
+
+        Returns
+        -------
+        Waterfall or None
+            None if no buffer has been written yet or it is being replaced.
+
+        """
+        try:
+            with open(_path("index.json")) as index_file:
+                index = json.load(index_file)
+            spectra = np.load(_path("spectra.npy"), mmap_mode="r")
+            times = np.load(_path("times.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if spectra.shape[::2] != (times.size, len(index["freqs"])) or spectra.shape[
+            1
+        ] < len(index["antpols"]):
+            return None
+        return cls(spectra, times, index)
+
+    def time_range(self):
+        """Return the unix times of the oldest and newest snapshot, or None."""
+        if np.all(np.isnan(self.times)):
+            return None
+        return float(np.nanmin(self.times)), float(np.nanmax(self.times))
+
+    def _segments(self):
+        # the slots from oldest to newest as at most two contiguous slices
+        return [slice(self.head, self.times.size), slice(0, self.head)]
+
+    def slice(
+        self,
+        antpol,
+        start=None,
+        end=None,
+        fmin=None,
+        fmax=None,
+        max_times=500,
+        max_chans=1000,
+    ):
+        """Return the decimated waterfall of one antpol.
+
+        Channels are averaged in blocks on views of the mapped buffer, so
+        only the decimated result is copied. Snapshots are then averaged in
+        blocks of consecutive times.
+
+        Parameters
+        ----------
+        antpol : str
+            Name of the antpol, e.g. "1e".
+        start, end : float, optional
+            Unix time range to include, everything if None.
+        fmin, fmax : float, optional
+            Frequency range in Hz to include, everything if None.
+        max_times : int
+            Maximum number of time samples returned.
+        max_chans : int
+            Maximum number of frequency channels returned.
+
+        Returns
+        -------
+        times : numpy array
+            Unix time of each row, the mean of each block.
+        freqs : numpy array
+            Frequency of each column, the mean of each block.
+        spectra : numpy array
+            (n_time, n_freq) autocorrelations, NaN where missing.
+
+        Raises
+        ------
+        KeyError
+            If the antpol is not in the buffer.
+
+        """
+        if antpol not in self.antpols:
+            raise KeyError(antpol)
+        ind = self.antpols.index(antpol)
+        lo = 0 if fmin is None else int(np.searchsorted(self.freqs, fmin))
+        lo = min(lo, self.freqs.size - 1)
+        hi = self.freqs.size if fmax is None else int(np.searchsorted(self.freqs, fmax))
+        hi = max(hi, lo + 1)
+        chan_block = int(np.ceil((hi - lo) / max_chans))
+        hi = lo + (hi - lo) // chan_block * chan_block
+        freqs = self.freqs[lo:hi].reshape(-1, chan_block).mean(axis=1)
+
+        times = []
+        rows = []
+        for segment in self._segments():
+            seg_times = np.asarray(self.times[segment])
+            keep = ~np.isnan(seg_times)
+            if start is not None:
+                keep &= seg_times >= start
+            if end is not None:
+                keep &= seg_times <= end
+            if not np.any(keep):
+                continue
+            first, last = np.flatnonzero(keep)[[0, -1]]
+            keep = keep[first : last + 1]
+            view = self.spectra[segment][first : last + 1, ind, lo:hi]
+            with warnings.catch_warnings():
+                # channel blocks of missing snapshots are all NaN
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                blocks = np.nanmean(view.reshape(view.shape[0], -1, chan_block), axis=2)
+            rows.append(blocks[keep])
+            times.append(seg_times[first : last + 1][keep])
+        if len(times) == 0:
+            return np.empty(0), freqs, np.empty((0, freqs.size), dtype=np.float32)
+
+        times = np.concatenate(times)
+        spectra = np.concatenate(rows)
+        time_block = int(np.ceil(times.size / max_times))
+        if time_block > 1:
+            edges = np.arange(0, times.size, time_block)
+            counts = np.add.reduceat(np.isfinite(spectra), edges, axis=0)
+            with np.errstate(invalid="ignore"):
+                spectra = (
+                    np.add.reduceat(np.nan_to_num(spectra), edges, axis=0) / counts
+                )
+            times = np.add.reduceat(times, edges) / np.diff(
+                np.append(edges, times.size)
+            )
+        return times, freqs, spectra
+
+
+def _create(antpols, freqs, n_times):
+    """Allocate a new empty ring buffer, replacing an existing one.
+
+    Only the slot times are filled, every append writes all rows of its
+    slot, so the spectra file is allocated without writing to it.
+    """
+    os.makedirs(settings.WATERFALL_DIR, exist_ok=True)
+    for name, shape, dtype in [
+        ("spectra", (n_times, len(antpols) + SPARE_ROWS, len(freqs)), np.float32),
+        ("times", (n_times,), np.float64),
+    ]:
+        # readers keep their mapping of a replaced file
+        tmp_path = _path(f"{name}.tmp.npy")
+        array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+        if name == "times":
+            array[:] = np.nan
+        array.flush()
+        del array
+        os.replace(tmp_path, _path(f"{name}.npy"))
+    index = {"antpols": list(antpols), "freqs": list(freqs), "head": 0}
+    _write_index(index)
+    return index
+
+
+def append_spectra(time, antpols, autos, freqs, all_antpols=()):
+    """Append a snapshot of autocorrelations to the ring buffer.
+
+    The buffer is created on first use with rows for all_antpols and
+    SPARE_ROWS more. Antpols new to the buffer take a spare row, it is only
+    recreated, dropping its history, when the spare rows run out or the
+    frequencies or length change.
+
+    Parameters
+    ----------
+    time : datetime
+        Time of the snapshot.
+    antpols : list of str
+        Name of each antpol in the snapshot, e.g. "1e".
+    autos : list of numpy arrays
+        The autocorrelation of each antpol, all of the same length as freqs.
+    freqs : numpy array
+        Frequency of each channel in Hz.
+    all_antpols : list of str
+        Names of every antpol of the array, including those missing from
+        the snapshot.
+
+    """
+    n_times = int(settings.WATERFALL_HOURS * 3600 // SLOT_SECONDS)
+    if n_times <= 0 or len(antpols) == 0:
+        return
+    timestamp = time.astimezone(timezone.utc).timestamp()
+
+    waterfall = Waterfall.open()
+    known = [] if waterfall is None else waterfall.antpols
+    new = sorted((set(all_antpols) | set(antpols)) - set(known))
+    if (
+        waterfall is None
+        or waterfall.times.size != n_times
+        or not np.array_equal(waterfall.freqs, freqs)
+        or len(known) + len(new) > waterfall.spectra.shape[1]
+    ):
+        all_rows = sorted(set(known) | set(new))
+        logger.info(f"Creating waterfall buffer of {n_times} x {len(all_rows)}.")
+        index = _create(all_rows, np.asarray(freqs).tolist(), n_times)
+    else:
+        index = {
+            "antpols": waterfall.antpols + new,
+            "freqs": waterfall.freqs.tolist(),
+            "head": waterfall.head,
+        }
+        newest = waterfall.time_range()
+        if newest is not None and timestamp <= newest[1]:
+            # this snapshot was already appended
+            return
+        del waterfall
+
+    spectra = np.load(_path("spectra.npy"), mmap_mode="r+")
+    times = np.load(_path("times.npy"), mmap_mode="r+")
+    head = index["head"]
+    inds = [index["antpols"].index(antpol) for antpol in antpols]
+    row = np.full(spectra.shape[1:], np.nan, dtype=np.float32)
+    row[inds] = np.asarray(autos, dtype=np.float32)
+    # mark the slot unused while it is overwritten
+    times[head] = np.nan
+    spectra[head] = row
+    times[head] = timestamp
+    spectra.flush()
+    times.flush()
+
+    index["head"] = (head + 1) % n_times
+    _write_index(index)
+
+
+def format_time(timestamp):
+    """Format a unix time of the buffer for display."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "heranow.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after django is set up so settings are available.
+from dashboard.events import EVENTS_PATH, data_version_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Route the data version event stream, pass everything else to django."""
+    if scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+        await data_version_events(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
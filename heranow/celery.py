@@ -90,6 +90,11 @@ app.conf.beat_schedule = {
         "schedule": crontab(minute="*/5"),
         "args": (),
     },
+    "update_status_rollups": {
+        "task": "dashboard.tasks.update_status_rollups",
+        "schedule": crontab(minute="*/10"),
+        "args": (),
+    },
     # delete data older than 2 months.
     "delete_old_data": {
         "task": "dashboard.tasks.delete_old_data",
@@ -79,6 +79,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_plotly_dash.middleware.ExternalRedirectionMiddleware",
     "django_plotly_dash.middleware.BaseMiddleware",
+    "dashboard.profiling.DashProfileMiddleware",
 ]
 
 ROOT_URLCONF = "heranow.urls"
@@ -198,3 +199,29 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 20
+
+# Shared redis store used to publish ingest data versions to the web workers
+DASHBOARD_REDIS_URL = env.str("DASHBOARD_REDIS_URL", default=CELERY_BROKER_URL)
+DATA_VERSION_CHANNEL = "heranow:data_version"
+
+# Profiles of the Dash callbacks kept in the shared redis store for the
+# callback stats page, and the duration in ms above which the callback
+# queries are explained, never if unset.
+DASH_PROFILE = env.bool("DASH_PROFILE", default=True)
+DASH_PROFILE_WINDOW = env.int("DASH_PROFILE_WINDOW", default=2000)
+DASH_PROFILE_EXPLAIN_MS = env.float("DASH_PROFILE_EXPLAIN_MS", default=None)
+
+# Width in MHz of the frequency bands of the autospectra band power metric
+SPECTRA_BAND_WIDTH_MHZ = env.float("SPECTRA_BAND_WIDTH_MHZ", default=10.0)
+
+# Memory-mapped ring buffer of recent autocorrelations for the waterfall app,
+# shared by the celery workers and the web workers. Twelve hours of 6144
+# channel spectra of 700 antpols take about 12 GB.
+WATERFALL_DIR = env.str("WATERFALL_DIR", default=str(BASE_DIR / "waterfall"))
+WATERFALL_HOURS = env.float("WATERFALL_HOURS", default=12.0)
+
+# Latest ingested arrays published by the celery workers and mapped read-only
+# by the web workers.
+SHARED_SNAPSHOT_DIR = env.str(
+    "SHARED_SNAPSHOT_DIR", default=str(BASE_DIR / "shared_snapshots")
+)